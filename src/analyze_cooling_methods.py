@@ -39,7 +39,7 @@ def analyze_cooling_tradeoff():
     # Power Grid (Fixed Power)
     p_dsp, p_tx, p_rx = 300.0, 50.0, 20.0
     # Scaled densities for model
-    power_grid_base = np.zeros((16, 16))
+    power_grid_base = np.zeros(layout.shape)
     power_grid_base[layout == 1] = p_dsp / 100.0
     power_grid_base[layout == 2] = p_tx / 10.0
     power_grid_base[layout == 3] = p_rx / 10.0
@@ -63,16 +63,20 @@ def analyze_cooling_tradeoff():
     # Physics Engine directly (The Teacher), OR retrain a "Parametric FNO" (Conditioned FNO).
     
     # Since we want accurate results fast, and we have the `PhysicsEngine` locally,
-    # we should use `ThermalSolver2D` directly for this study. 
+    # we should use the 3D voxel solver directly for this study. 
     # The FNO is a fast surrogate, but if it lacks the K_pkg input, it can't predict K_pkg changes.
     
     print("   -> Using Physics Engine (FDM) for high-fidelity material sweep...")
-    from src.physics_engine import ThermalSolver2D
+    from src.physics_engine import VoxelThermalSolver3D
+    from src.thermal_sweep import SweepContext
     
-    solver = ThermalSolver2D(size=16)
+    N = layout.shape[0]
+    # Harmonic-mean links: with the nodal-K default, layer-0 power only sees K_die,
+    # so K_pkg would have no effect. CG (not the spectral path) so x0 seeds each solve.
+    solver = VoxelThermalSolver3D(size=N, layers=5, symmetric=True, spectral=False, backend="iterative")
     
     # Actual Power Grid (mW) for Solver
-    phys_power_grid = np.zeros((16, 16))
+    phys_power_grid = np.zeros((N, N))
     # Correct normalization for solver (mW per node)
     # The solver takes raw mW array.
     # In generate_spatial_layout, we fill blocks.
@@ -86,24 +90,34 @@ def analyze_cooling_tradeoff():
     phys_power_grid[layout == 3] = p_rx / n_rx
     
     k_sub = 150.0 # Silicon
-    
-    for i, k in enumerate(k_vals):
-        for j, t_amb in enumerate(t_ambs):
-            # Solve Physics
-            temp_grid = solver.solve(phys_power_grid, k_sub, k)
-            
-            # Adjust for Ambient (Solver output is Delta T + 25 reference?)
-            # Solver `P = power + g_vert * 25.0`. It assumes ambient 25.
-            # If we change ambient, we change the boundary condition P vector.
-            # But `solver.solve` hardcodes `25.0`.
-            # Linear correction: T_new = T_solved - 25.0 + T_new_amb.
-            t_map = temp_grid - 25.0 + t_amb
-            
-            t_rx = t_map[layout == 3].mean()
-            
-            # Calc Margin at Year 10
-            m10 = calculate_margin(t_rx, bias_rx=25.0, hours=87600.0, loss=-20.0)
-            results_margin[i, j] = m10
+    p_vol = np.zeros((5, N, N))
+    p_vol[0] = phys_power_grid
+    
+    # One solve per K_pkg (T_amb is a shift, below), walked in proximity order
+    # and seeded from the previous fields
+    sweep = SweepContext(k_vals)
+    fields = sweep.run(lambda pt, x0: solver.solve(p_vol, [k_sub, 400.0, 60.0, pt[0], 0.5], x0=x0), solver)
+    
+    for i, j in np.ndindex(results_margin.shape):
+        t_amb = t_ambs[j]
+        temp_grid = fields[i][0]
+        
+        # Adjust for Ambient (Solver output is Delta T + 25 reference?)
+        # Solver `P = power + g_vert * 25.0`. It assumes ambient 25.
+        # If we change ambient, we change the boundary condition P vector.
+        # But `solver.solve` hardcodes `25.0`.
+        # Linear correction: T_new = T_solved - 25.0 + T_new_amb.
+        t_map = temp_grid - 25.0 + t_amb
+        
+        t_rx = t_map[layout == 3].mean()
+        
+        # Calc Margin at Year 10
+        m10 = calculate_margin(t_rx, bias_rx=25.0, hours=87600.0, loss=-20.0)
+        results_margin[i, j] = m10
+
+    stats = sweep.report()
+    print(f"   -> Warm-started CG sweep: {stats['iterations']} iterations over {stats['points']} solves, "
+          f"{stats['saved']} saved vs cold starts")
 
     # Plot Heatmap
     plt.figure(figsize=(10, 8))
@@ -36,7 +36,7 @@ def analyze_pvt():
     # We'll use the FDM solver here to be physically accurate.
     print("   -> Using FDM Solver for Process (Material) Sensitivity...")
     from src.physics_engine import VoxelThermalSolver3D
-    solver = VoxelThermalSolver3D(layers=5)
+    solver = VoxelThermalSolver3D(size=16, layers=5)
     k_base = [150.0, 400.0, 60.0, 10.0, 0.5]
     
     k_variations = np.linspace(0.5, 1.5, 10) # 50% to 150% conductivity
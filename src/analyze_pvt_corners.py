@@ -7,7 +7,8 @@ def analyze_corners():
     print("Corners Analysis: Simulating 7 Industry-Standard PVT Scenarios...")
     
     # Baseline Physics
-    solver = VoxelThermalSolver3D(layers=5)
+    # Same material stack across several corners -> factorization is cached
+    solver = VoxelThermalSolver3D(size=16, layers=5)
     k_base = np.array([150.0, 400.0, 60.0, 10.0, 0.5])
     
     # Baseline Power Grid (Layer 0)
@@ -2,32 +2,30 @@ import numpy as np
 import matplotlib.pyplot as plt
 import os
 from src.physics_engine_transient import TransientThermalSolver
+from src.power_schedule import PowerSchedule
+from src.transient_output import TransientRecorder
 
-def power_profile(t_ms):
+def burst_schedule():
     """
-    Defines the Power Map at time t.
+    DSP baseline load with a burst from 10ms to 30ms; TX/RX always active.
+    Blocks are unit-power maps scaled per segment (mW).
     """
-    p_vol = np.zeros((5, 16, 16))
-    
-    # Baseline DSP Load
-    p_dsp = 50.0 
-    
-    # Burst Mode (10ms to 30ms)
-    if 10.0 <= t_ms <= 30.0:
-        p_dsp = 800.0 # Massive Spike
-        
     # Place on grid (Layer 0, Top half)
-    p_vol[0, 0:6, :] = p_dsp / (6*16)
-    
-    # TX/RX always active
-    p_vol[0, 12:14, 2:4] = 20.0 / 4.0
-    
-    return p_vol
+    dsp = np.zeros((5, 16, 16))
+    dsp[0, 0:6, :] = 1.0 / (6*16)
+    txrx = np.zeros((5, 16, 16))
+    txrx[0, 12:14, 2:4] = 1.0 / 4.0
+
+    schedule = PowerSchedule({"dsp": dsp, "txrx": txrx})
+    schedule.at(0.0, dsp=50.0, txrx=20.0) # Baseline DSP Load
+    schedule.at(10.0, dsp=800.0) # Massive Spike
+    schedule.at(30.0, dsp=50.0)
+    return schedule
 
 def analyze_burst():
     print("⚡ Analyzing Transient Burst Mode (Turbo Boost)...")
     
-    solver = TransientThermalSolver()
+    solver = TransientThermalSolver(dt_ms=0.1, method="tr_bdf2")
     
     # Material Props
     # K (W/mK): [Die, Metal, C4, Pkg, Board]
@@ -35,12 +33,23 @@ def analyze_burst():
     # Cv (J/m3K): Silicon ~1.6e6, Copper ~3.4e6, Organic ~2e6
     cv_stack = [1.6e6, 3.4e6, 2.0e6, 2.0e6, 2.0e6]
     
-    times, temps = solver.solve_transient(
-        power_profile, k_stack, cv_stack, duration_ms=50
+    # Per-step RX / DSP probe traces, and the full field at the end of the burst
+    rx = np.zeros((5, 16, 16), dtype=bool)
+    rx[0, 12:14, 2:4] = True
+    dsp = np.zeros((5, 16, 16), dtype=bool)
+    dsp[0, 0:6, :] = True
+    recorder = TransientRecorder("data/transient/burst", probes={"rx": rx, "dsp": dsp}, snapshot_times_ms=[30.0])
+
+    # Error-controlled TR-BDF2: short steps at the burst edges (the schedule's
+    # breakpoints), long ones in between
+    times, temps = solver.solve_adaptive(
+        burst_schedule(), k_stack, cv_stack, duration_ms=50, rtol=1e-3, atol=1e-2, recorder=recorder
     )
     
     peak_t = max(temps)
     print(f"\n🔥 Peak Transient Temp: {peak_t:.1f} °C")
+    print(f"   RX max: {recorder.trace('rx_max').max():.1f} °C, DSP mean at burst end: "
+          f"{recorder.trace('dsp_mean')[np.searchsorted(times, 30.0)]:.1f} °C (outputs in {recorder.out_dir})")
     
     if peak_t > 105.0:
         print("Status: ❌ FAIL (Transient Overheat)")
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+from scipy.sparse import csr_matrix, linalg
+
+class ArtifactCache:
+    """
+    Content-addressed on-disk store for compiled artifacts (rasterized power
+    grids, k stacks, CSR operators, LU factors). Each entry is a directory
+    root/<key>/ of .npy arrays plus meta.json; get() maps the arrays read-only
+    instead of reading them. Entries are touched on every hit, and the least
+    recently used ones are deleted once the store exceeds max_bytes.
+    store_factors also persists LU factors (they are large: a 64x64x5 stack
+    factors to ~75 MB).
+    """
+    def __init__(self, root="data/artifacts", max_bytes=2 * 2**30, store_factors=False):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.store_factors = store_factors
+        self.hits = 0
+        self.misses = 0
+        self._digests = {} # (path, mtime, size) -> content hash
+
+    @staticmethod
+    def key(*parts):
+        return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+    def file_digest(self, path):
+        """Content hash of a file, or None if it does not exist; memoized per (mtime, size)."""
+        if not path or not os.path.exists(path):
+            return None
+        st = os.stat(path)
+        stamp = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+        if stamp not in self._digests:
+            h = hashlib.sha1()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(1 << 22), b""):
+                    h.update(chunk)
+            self._digests[stamp] = h.hexdigest()
+        return self._digests[stamp]
+
+    def get(self, key):
+        """(arrays, meta) of an entry, arrays memory-mapped; None on a miss."""
+        path = os.path.join(self.root, key)
+        try:
+            with open(os.path.join(path, "meta.json")) as f:
+                meta = json.load(f)
+            arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+                      for name in meta.pop("_arrays")}
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+        os.utime(path) # LRU order is the directory mtime
+        self.hits += 1
+        return arrays, meta
+
+    def put(self, key, arrays, meta=None):
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, key)
+        # Written aside and renamed into place, so readers never see half an entry
+        tmp = tempfile.mkdtemp(dir=self.root, prefix=".tmp-")
+        for name, arr in arrays.items():
+            np.save(os.path.join(tmp, f"{name}.npy"), np.ascontiguousarray(arr))
+        with open(os.path.join(tmp, "meta.json"), "w") as f:
+            json.dump(dict(meta or {}, _arrays=list(arrays)), f)
+        if os.path.exists(path):
+            shutil.rmtree(path, ignore_errors=True)
+        try:
+            os.rename(tmp, path)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True) # another process stored it first
+        self.evict()
+
+    def entries(self):
+        """[(mtime, nbytes, key)] of the stored entries, oldest first."""
+        if not os.path.isdir(self.root):
+            return []
+        found = []
+        for key in os.listdir(self.root):
+            path = os.path.join(self.root, key)
+            if key.startswith(".") or not os.path.isdir(path):
+                continue
+            nbytes = sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+            found.append((os.path.getmtime(path), nbytes, key))
+        return sorted(found)
+
+    def evict(self):
+        found = self.entries()
+        total = sum(nbytes for _, nbytes, _ in found)
+        for _, nbytes, key in found:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(os.path.join(self.root, key), ignore_errors=True)
+            total -= nbytes
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def info(self):
+        found = self.entries()
+        return {"entries": len(found), "nbytes": sum(n for _, n, _ in found),
+                "hits": self.hits, "misses": self.misses}
+
+    # --- Solver artifacts ---
+    def get_operator(self, key):
+        """(G [CSR], P_amb) stored under a FactorizationCache key, or None."""
+        entry = self.get(key + "-op")
+        if entry is None:
+            return None
+        arrays, _ = entry
+        G = csr_matrix((arrays["data"], arrays["indices"], arrays["indptr"]), shape=tuple(arrays["shape"]))
+        return G, arrays["P_amb"]
+
+    def put_operator(self, key, G, P_amb):
+        G = G.tocsr()
+        self.put(key + "-op", {"data": G.data, "indices": G.indices, "indptr": G.indptr,
+                               "shape": np.array(G.shape), "P_amb": P_amb})
+
+    def get_factors(self, key):
+        entry = self.get(key + "-lu") if self.store_factors else None
+        if entry is None:
+            return None
+        a, _ = entry
+        shape = tuple(a["shape"])
+        L = csr_matrix((a["L_data"], a["L_indices"], a["L_indptr"]), shape=shape)
+        U = csr_matrix((a["U_data"], a["U_indices"], a["U_indptr"]), shape=shape)
+        return StoredLU(L, U, a["perm_r"], a["perm_c"]), a["P_amb"]
+
+    def put_factors(self, key, lu, P_amb):
+        if not self.store_factors or not hasattr(lu, "perm_r"):
+            return # CHOLMOD factors are not exported
+        L, U = lu.L.tocsr(), lu.U.tocsr()
+        self.put(key + "-lu", {"L_data": L.data, "L_indices": L.indices, "L_indptr": L.indptr,
+                               "U_data": U.data, "U_indices": U.indices, "U_indptr": U.indptr,
+                               "perm_r": lu.perm_r, "perm_c": lu.perm_c,
+                               "shape": np.array(L.shape), "P_amb": P_amb})
+
+class StoredLU:
+    """
+    SuperLU factors read back from disk (Pr G Pc = L U). solve() follows
+    SuperLU.solve, with two sparse triangular sweeps in place of SuperLU's own
+    kernels: slower per solve than a fresh factor, far cheaper than refactoring.
+    """
+    def __init__(self, L, U, perm_r, perm_c):
+        self.L, self.U = L, U
+        self.perm_r, self.perm_c = np.asarray(perm_r), np.asarray(perm_c)
+        self.shape = L.shape
+        self.nnz = L.nnz + U.nnz
+
+    def solve(self, rhs, trans="N"):
+        b = np.asarray(rhs)
+        if trans == "N":
+            y = np.empty_like(b)
+            y[self.perm_r] = b
+            y = linalg.spsolve_triangular(self.L, y, lower=True, unit_diagonal=True)
+            return linalg.spsolve_triangular(self.U, y, lower=False)[self.perm_c]
+        # G^T = Pc U^T L^T Pr
+        y = np.empty_like(b)
+        y[self.perm_c] = b
+        y = linalg.spsolve_triangular(self.U.T.tocsr(), y, lower=True)
+        y = linalg.spsolve_triangular(self.L.T.tocsr(), y, lower=False, unit_diagonal=True)
+        return y[self.perm_r]
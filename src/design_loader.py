@@ -1,26 +1,28 @@
 import json
 import numpy as np
 import os
+from src.design_raster import BlockTable, InstanceTable, rasterize_rects
+from src.design_stream import (BatchSpill, StreamingDesignReader, is_columnar, load_columnar,
+                               save_columnar)
 from src.tech_loader import TechLoader
 
 class DesignLoader:
-    def __init__(self, grid_size=16):
+    def __init__(self, grid_size=16, stream_threshold_mb=64, artifacts=None, full_stack=False):
         self.N = grid_size
         self.tech_loader = TechLoader()
+        self.stream_threshold_mb = stream_threshold_mb # larger JSON files are streamed
+        self.artifacts = artifacts # ArtifactCache: compiled grids survive across runs
+        self._table = None # (file stamp, BlockTable / InstanceTable, metadata) of the last design
+        self.instances = None # InstanceTable of the last in-memory JSON design
+        self._tech_file = None
+        # full_stack: keep every physical layer instead of the 5 canonical ones
+        self.full_stack = full_stack
+        self.thickness_um = None # per-layer thickness of the last full-stack load
         
     def collapse_stack(self, raw_stack):
         """Compresses N-layer stack into 5 Canonical Layers using Thermal Resistance Rule."""
         if not raw_stack: return [150.0, 400.0, 60.0, 10.0, 0.5]
-        buckets = [[], [], [], [], []]
-        for layer in raw_stack:
-            l_type = layer.get("type", "pkg")
-            idx = 3 # Default pkg
-            if l_type == "die": idx = 0
-            elif l_type == "metal": idx = 1
-            elif l_type == "bump": idx = 2
-            elif l_type == "pkg": idx = 3
-            elif l_type == "board": idx = 4
-            buckets[idx].append(layer)
+        buckets = self._bucket_layers(raw_stack)
         k_canonical = []
         for i in range(5):
             layers = buckets[i]
@@ -32,51 +34,149 @@ class DesignLoader:
             k_canonical.append(t_total / r_total)
         return k_canonical
 
-    def _rasterize_recursive(self, blocks, power_grid, xmin, ymin, dx, dy, parent_x=0, parent_y=0):
-        """Recursively parses blocks and sub-blocks into the grid."""
-        for block in blocks:
-            # Absolute coordinates
-            abs_x = parent_x + block["x"]
-            abs_y = parent_y + block["y"]
-            w, h = block["w"], block["h"]
-            p = block.get("power_mw", 0)
+    @staticmethod
+    def _bucket_layers(raw_stack):
+        """Layers grouped die / metal / bump / pkg / board, in stack order within each group."""
+        buckets = [[], [], [], [], []]
+        for layer in raw_stack:
+            l_type = layer.get("type", "pkg")
+            idx = 3 # Default pkg
+            if l_type == "die": idx = 0
+            elif l_type == "metal": idx = 1
+            elif l_type == "bump": idx = 2
+            elif l_type == "pkg": idx = 3
+            elif l_type == "board": idx = 4
+            buckets[idx].append(layer)
+        return buckets
 
-            # Process Sub-blocks if they exist
-            if "sub_blocks" in block:
-                self._rasterize_recursive(block["sub_blocks"], power_grid, xmin, ymin, dx, dy, abs_x, abs_y)
-            
-            # Rasterize current block power
-            if p > 0:
-                rel_x, rel_y = max(0, abs_x - xmin), max(0, abs_y - ymin)
-                col_start, row_start = int(rel_x / dx), int(rel_y / dy)
-                col_end = int(min(self.N * dx, (abs_x + w - xmin)) / dx)
-                row_end = int(min(self.N * dy, (abs_y + h - ymin)) / dy)
-                
-                # Bounds check
-                if col_start >= self.N or row_start >= self.N or col_end < 0 or row_end < 0: continue
-                
-                col_start, row_start = max(0, col_start), max(0, row_start)
-                col_end, row_end = min(self.N, col_end + 1), min(self.N, row_end + 1)
-                
-                num_voxels = (col_end - col_start) * (row_end - row_start)
-                if num_voxels > 0:
-                    power_grid[row_start:row_end, col_start:col_end] += p / num_voxels
+    def physical_stack(self, raw_stack):
+        """
+        Every layer of the stack, die first and board (heat sink side) last:
+        (k per layer in W/mK, thickness per layer in um).
+        """
+        layers = [l for bucket in self._bucket_layers(raw_stack) for l in bucket]
+        return [float(l["k"]) for l in layers], [float(l["thickness"]) for l in layers]
 
-    def load_from_json(self, json_path, roi_bounds=None):
-        with open(json_path, 'r') as f:
-            design = json.load(f)
-        
-        if "tech_file" in design:
-            raw_stack = self.tech_loader.load_itf(design["tech_file"])
+    def _design_stack(self, meta):
+        self._tech_file = meta.get("tech_file")
+        if "tech_file" in meta:
+            raw_stack = self.tech_loader.load_itf(meta["tech_file"])
         else:
-            raw_stack = design.get("stackup", [])
-        k_layers = self.collapse_stack(raw_stack)
+            raw_stack = meta.get("stackup", [])
+        if self.full_stack and raw_stack:
+            k_layers, self.thickness_um = self.physical_stack(raw_stack)
+            return k_layers
+        self.thickness_um = None
+        return self.collapse_stack(raw_stack)
 
+    @staticmethod
+    def _design_extent(meta, roi_bounds):
         xmin, ymin = (roi_bounds[0], roi_bounds[1]) if roi_bounds else (0, 0)
-        xmax, ymax = (roi_bounds[2], roi_bounds[3]) if roi_bounds else (design.get("die_width_um", 1000), design.get("die_height_um", 1000))
-        
-        dx, dy = (xmax - xmin) / self.N, (ymax - ymin) / self.N
-        power_grid = np.zeros((self.N, self.N))
-        
-        self._rasterize_recursive(design["blocks"], power_grid, xmin, ymin, dx, dy)
+        xmax, ymax = (roi_bounds[2], roi_bounds[3]) if roi_bounds else (meta.get("die_width_um", 1000), meta.get("die_height_um", 1000))
+        return (xmin, ymin, xmax, ymax)
+
+    def block_table(self, path):
+        """
+        (table, metadata) of a design, rebuilt only when the file changes. JSON
+        designs keep their hierarchy as an InstanceTable (repeated sub-blocks
+        rasterized once per master); columnar files are already flat.
+        """
+        stamp = (os.path.abspath(path), os.path.getmtime(path))
+        if self._table is None or self._table[0] != stamp:
+            if is_columnar(path):
+                cols, meta = load_columnar(path)
+                table = BlockTable(*cols)
+            else:
+                with open(path, 'r') as f:
+                    meta = json.load(f)
+                table = InstanceTable.from_blocks(meta.pop("blocks"))
+            self._table = (stamp, table, meta)
+        return self._table[1], self._table[2]
+
+    def load(self, path, roi_bounds=None):
+        """
+        Loads a JSON design (streamed when large) or its columnar .npz / .parquet
+        form. With an artifact cache, an unchanged design (same file and tech
+        file contents, grid size and ROI) skips parsing and rasterization; the
+        InstanceTable of an in-memory JSON design is stored with it.
+        """
+        if self.artifacts is None:
+            return self._load(path, roi_bounds)
+        roi = None if roi_bounds is None else [float(v) for v in roi_bounds]
+        key = self.artifacts.key("design", self.artifacts.file_digest(path), self.N, roi, self.full_stack)
+        entry = self.artifacts.get(key)
+        if entry is not None:
+            arrays, meta = entry
+            if self.artifacts.file_digest(meta["tech_file"]) == meta["tech_digest"]:
+                inst = {name[5:]: a for name, a in arrays.items() if name.startswith("inst_")}
+                self.instances = InstanceTable.from_arrays(inst, meta["instance_keys"]) if inst else None
+                self.thickness_um = meta["thickness_um"]
+                self.extent = tuple(meta["extent"])
+                return np.array(arrays["power_grid"]), meta["k_layers"]
+
+        power_grid, k_layers = self._load(path, roi_bounds)
+        tech_file = self._tech_file
+        arrays, instance_keys = {"power_grid": power_grid}, None
+        if self.instances is not None:
+            inst, instance_keys = self.instances.to_arrays()
+            arrays.update({"inst_" + name: a for name, a in inst.items()})
+        self.artifacts.put(key, arrays,
+                           {"k_layers": [float(k) for k in k_layers], "extent": [float(v) for v in self.extent],
+                            "tech_file": tech_file, "tech_digest": self.artifacts.file_digest(tech_file),
+                            "thickness_um": self.thickness_um, "instance_keys": instance_keys})
         return power_grid, k_layers
+
+    def _load(self, path, roi_bounds=None):
+        if is_columnar(path):
+            table, meta = self.block_table(path)
+            self.instances = None
+            self.extent = self._design_extent(meta, roi_bounds)
+            return table.rasterize(self.N, self.extent), self._design_stack(meta)
+        return self.load_from_json(path, roi_bounds)
+
+    def load_from_json(self, json_path, roi_bounds=None):
+        if os.path.getsize(json_path) > self.stream_threshold_mb * 2**20:
+            return self.load_streaming(json_path, roi_bounds)
+        table, design = self.block_table(json_path)
+        self.instances = table
+        k_layers = self._design_stack(design)
+        self.extent = self._design_extent(design, roi_bounds)
+        # Area-weighted: each pixel gets the power of the block area it covers
+        power_grid = table.rasterize(self.N, self.extent)
+        return power_grid, k_layers
+
+    def load_streaming(self, json_path, roi_bounds=None):
+        """
+        Parses and rasterizes block by block with bounded memory. Batches that
+        arrive before the die size is known (blocks listed ahead of
+        die_width_um / die_height_um) wait in a temporary file.
+        """
+        reader = StreamingDesignReader(json_path)
+        self.instances = None
+        power_grid = np.zeros((self.N, self.N))
+        spill = BatchSpill()
+
+        def sink(batch):
+            if roi_bounds or ("die_width_um" in reader.meta and "die_height_um" in reader.meta):
+                power_grid[:] += rasterize_rects(*batch, self.N, self._design_extent(reader.meta, roi_bounds))
+            else:
+                spill.append(batch)
+
+        try:
+            meta = reader.read(sink)
+            self.extent = self._design_extent(meta, roi_bounds)
+            for batch in spill:
+                power_grid += rasterize_rects(*batch, self.N, self.extent)
+        finally:
+            spill.close()
+        return power_grid, self._design_stack(meta)
+
+    def convert_to_columnar(self, json_path, out_path):
+        """Streams a JSON design into its columnar form (out_path .npz or .parquet) for fast reloads."""
+        reader = StreamingDesignReader(json_path)
+        spill = BatchSpill()
+        try:
+            meta = reader.read(spill.append)
+            return save_columnar(out_path, spill, meta)
+        finally:
+            spill.close()
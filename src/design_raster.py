@@ -0,0 +1,272 @@
+import hashlib
+import json
+import numpy as np
+
+class BlockTable:
+    """
+    Flattened floorplan: every block of the hierarchy as one row of absolute
+    rectangles (x0, y0, x1, y1) in um with its own power_mw. Built once per
+    design, then rasterized / queried with array operations only.
+    """
+    def __init__(self, x0, y0, x1, y1, power, leaf_size=16):
+        self.x0, self.y0 = np.asarray(x0, dtype=float), np.asarray(y0, dtype=float)
+        self.x1, self.y1 = np.asarray(x1, dtype=float), np.asarray(y1, dtype=float)
+        self.power = np.asarray(power, dtype=float)
+        self.index = STRIndex(self.x0, self.y0, self.x1, self.y1, leaf_size) if len(self.power) else None
+
+    @classmethod
+    def from_blocks(cls, blocks):
+        """Walks the block / sub_blocks hierarchy once (child x, y are relative to the parent)."""
+        x0, y0, x1, y1, power = [], [], [], [], []
+        stack = [(blocks, 0.0, 0.0)]
+        while stack:
+            children, px, py = stack.pop()
+            for block in children:
+                abs_x = px + block["x"]
+                abs_y = py + block["y"]
+                if "sub_blocks" in block:
+                    stack.append((block["sub_blocks"], abs_x, abs_y))
+                p = block.get("power_mw", 0)
+                if p > 0:
+                    x0.append(abs_x); y0.append(abs_y)
+                    x1.append(abs_x + block["w"]); y1.append(abs_y + block["h"])
+                    power.append(p)
+        return cls(x0, y0, x1, y1, power)
+
+    def __len__(self):
+        return len(self.power)
+
+    def query(self, bounds):
+        """Indices of blocks intersecting bounds = (xmin, ymin, xmax, ymax)."""
+        if self.index is None:
+            return np.zeros(0, dtype=np.int64)
+        return self.index.query(bounds)
+
+    def rasterize(self, N, bounds, M=None):
+        """
+        (N, M) power grid over bounds (rows along y). Each block puts its power
+        density into every cell in proportion to the exact area it covers, so
+        sub-pixel blocks keep their power and blocks crossing the window edge
+        only contribute the part inside it.
+        """
+        return rasterize_rects(self.x0, self.y0, self.x1, self.y1, self.power, N, bounds, M, self.query(bounds))
+
+class InstanceTable:
+    """
+    Floorplan with repeated blocks factored out. Blocks whose content (size,
+    power and sub_blocks, ignoring names and their own offset) occurs more than
+    once become masters, keyed by content hash and flattened once in
+    master-relative coordinates; each occurrence is only an (x, y) offset. The
+    remaining blocks form the residual BlockTable. Only the outermost
+    repetition is factored, so a repeated lane containing repeated cells is
+    one master.
+    """
+    def __init__(self, masters, offsets, residual):
+        self.masters = masters # hash -> BlockTable relative to the master origin
+        self.offsets = offsets # hash -> (K, 2) absolute instance origins (x, y)
+        self.residual = residual
+
+    @classmethod
+    def from_blocks(cls, blocks, min_count=2):
+        hashes, counts = {}, {}
+        stack = [(b, False) for b in blocks]
+        while stack: # post-order, so children are hashed before their parent
+            block, ready = stack.pop()
+            subs = block.get("sub_blocks", [])
+            if not ready:
+                stack.append((block, True))
+                stack.extend((b, False) for b in subs)
+                continue
+            desc = [block["w"], block["h"], block.get("power_mw", 0),
+                    [(b["x"], b["y"], hashes[id(b)]) for b in subs]]
+            h = hashlib.sha1(json.dumps(desc).encode()).hexdigest()
+            hashes[id(block)] = h
+            counts[h] = counts.get(h, 0) + 1
+
+        masters, offsets, rest = {}, {}, []
+        stack = [(blocks, 0.0, 0.0)]
+        while stack:
+            children, px, py = stack.pop()
+            for block in children:
+                abs_x, abs_y = px + block["x"], py + block["y"]
+                h = hashes[id(block)]
+                if counts[h] >= min_count:
+                    if h not in masters:
+                        masters[h] = BlockTable.from_blocks([dict(block, x=0.0, y=0.0)])
+                        offsets[h] = []
+                    offsets[h].append((abs_x, abs_y))
+                    continue
+                if "sub_blocks" in block:
+                    stack.append((block["sub_blocks"], abs_x, abs_y))
+                if block.get("power_mw", 0) > 0:
+                    rest.append(dict(block, x=abs_x, y=abs_y, sub_blocks=[]))
+        # Unpowered masters have nothing to stamp
+        masters = {h: t for h, t in masters.items() if len(t)}
+        offsets = {h: np.array(offsets[h], dtype=float) for h in masters}
+        return cls(masters, offsets, BlockTable.from_blocks(rest))
+
+    def to_arrays(self):
+        """(arrays, master keys): flat arrays that from_arrays() turns back into the table."""
+        keys = list(self.masters)
+        rects = lambda t: np.stack([t.x0, t.y0, t.x1, t.y1, t.power])
+        arrays = {"residual": rects(self.residual),
+                  "master_rects": np.hstack([rects(self.masters[h]) for h in keys] or [np.zeros((5, 0))]),
+                  "master_rows": np.array([len(self.masters[h]) for h in keys], dtype=np.int64),
+                  "offsets": np.vstack([self.offsets[h] for h in keys] or [np.zeros((0, 2))]),
+                  "offset_rows": np.array([len(self.offsets[h]) for h in keys], dtype=np.int64)}
+        return arrays, keys
+
+    @classmethod
+    def from_arrays(cls, arrays, keys):
+        rects = np.split(np.asarray(arrays["master_rects"], dtype=float), np.cumsum(arrays["master_rows"])[:-1], axis=1)
+        offsets = np.split(np.asarray(arrays["offsets"], dtype=float), np.cumsum(arrays["offset_rows"])[:-1])
+        masters = {h: BlockTable(*r) for h, r in zip(keys, rects)}
+        return cls(masters, dict(zip(keys, offsets)), BlockTable(*np.asarray(arrays["residual"], dtype=float)))
+
+    def __len__(self):
+        return len(self.residual) + sum(len(t) * len(offsets) for t, offsets in zip(self.masters.values(), self.offsets.values()))
+
+    def stamps(self, N, bounds, M=None):
+        """
+        Rasterizes every master once per sub-pixel phase of its instances.
+        Returns the residual (N, M) grid and (key, stamp, row, col) for each
+        instance lying wholly inside bounds; instances cut by the window edge
+        are added to the residual grid clipped, which is exact since the
+        area-weighted cells are independent.
+        """
+        M = M or N
+        xmin, ymin, xmax, ymax = bounds
+        px, py = (xmax - xmin) / M, (ymax - ymin) / N
+        grid = self.residual.rasterize(N, bounds, M)
+        placed = []
+        for h, table in self.masters.items():
+            bx0, by0 = table.x0.min(), table.y0.min()
+            bx1, by1 = table.x1.max(), table.y1.max()
+            ox, oy = self.offsets[h].T
+            # Stamp window (rows r0 + ch, cols c0 + cw) and the master origin's phase inside it
+            c0 = np.floor((ox + bx0 - xmin) / px).astype(np.int64)
+            r0 = np.floor((oy + by0 - ymin) / py).astype(np.int64)
+            cw = np.maximum(np.ceil((ox + bx1 - xmin) / px).astype(np.int64) - c0, 1)
+            ch = np.maximum(np.ceil((oy + by1 - ymin) / py).astype(np.int64) - r0, 1)
+            fx, fy = (ox - xmin) / px - c0, (oy - ymin) / py - r0
+            hit = (c0 < M) & (c0 + cw > 0) & (r0 < N) & (r0 + ch > 0)
+
+            phases = np.stack([np.round(fx, 9), np.round(fy, 9), cw, ch], axis=1)[hit]
+            keys, first, inverse = np.unique(phases, axis=0, return_index=True, return_inverse=True)
+            stamp_list = []
+            for i, (_, _, w, n) in zip(np.flatnonzero(hit)[first], keys):
+                w, n = int(w), int(n)
+                window = (-fx[i] * px, -fy[i] * py, (w - fx[i]) * px, (n - fy[i]) * py)
+                stamp_list.append(table.rasterize(n, window, w))
+
+            for j, i in enumerate(np.flatnonzero(hit)):
+                stamp = stamp_list[inverse.ravel()[j]]
+                r, c = r0[i], c0[i]
+                n, w = stamp.shape
+                if r >= 0 and c >= 0 and r + n <= N and c + w <= M:
+                    placed.append(((h, inverse.ravel()[j]), stamp, int(r), int(c)))
+                else:
+                    rs, cs = max(r, 0), max(c, 0)
+                    re, ce = min(r + n, N), min(c + w, M)
+                    grid[rs:re, cs:ce] += stamp[rs - r:re - r, cs - c:ce - c]
+        return grid, placed
+
+    def rasterize(self, N, bounds, M=None):
+        """Same raster as the flat BlockTable, with each master rasterized once per phase."""
+        grid, placed = self.stamps(N, bounds, M)
+        for _, stamp, r, c in placed:
+            n, w = stamp.shape
+            grid[r:r + n, c:c + w] += stamp
+        return grid
+
+def rasterize_rects(x0, y0, x1, y1, power, N, bounds, M=None, idx=None):
+    """
+    Area-weighted (N, M) raster of absolute rectangles over bounds (see
+    BlockTable.rasterize); idx optionally restricts it to a subset of rows.
+    """
+    M = M or N
+    if idx is None:
+        xmin, ymin, xmax, ymax = bounds
+        idx = np.nonzero((x0 <= xmax) & (x1 >= xmin) & (y0 <= ymax) & (y1 >= ymin))[0]
+    if not len(idx):
+        return np.zeros((N, M))
+    xmin, ymin, xmax, ymax = bounds
+    cols, wx = _axis_corners(x0[idx], x1[idx], xmin, (xmax - xmin) / M, M)
+    rows, wy = _axis_corners(y0[idx], y1[idx], ymin, (ymax - ymin) / N, N)
+
+    # Separable coverage: 4 row corners x 4 column corners per block, scattered
+    # once and integrated back by a 2D prefix sum (summed-area table)
+    flat = (rows[:, :, None] * (M + 2) + cols[:, None, :]).ravel()
+    weights = (power[idx, None, None] * wy[:, :, None] * wx[:, None, :]).ravel()
+    grid = np.bincount(flat, weights=weights, minlength=(N + 2) * (M + 2)).reshape((N + 2, M + 2))
+    return grid.cumsum(axis=0).cumsum(axis=1)[:N, :M]
+
+def _axis_corners(a0, a1, origin, pitch, n):
+    """
+    Per-block corner positions (B, 4) and weights (B, 4) along one axis whose
+    prefix sum is the fraction of the block's extent in each cell.
+    """
+    u0 = np.clip((a0 - origin) / pitch, 0, n)
+    u1 = np.clip((a1 - origin) / pitch, 0, n)
+    length = (a1 - a0) / pitch
+    j0, j1 = np.floor(u0), np.floor(u1)
+    f0, f1 = u0 - j0, u1 - j1
+    pos = np.stack([j0, j0 + 1, j1, j1 + 1], axis=1).astype(np.int64)
+    w = np.stack([1 - f0, f0, f1 - 1, -f1], axis=1)
+
+    # Zero-extent (line / point) blocks: the whole share goes to their cell
+    thin = length <= 0
+    safe = np.where(thin, 1.0, length)
+    w = w / safe[:, None]
+    w[thin] = [1.0, -1.0, 0.0, 0.0]
+    inside = (a1 >= origin) & (a0 <= origin + n * pitch) & (~thin | (u0 < n))
+    w[~inside] = 0.0
+    return pos, w
+
+class STRIndex:
+    """
+    Static R-tree packed with Sort-Tile-Recursive: leaves of leaf_size boxes,
+    each level grouping leaf_size nodes of the level below. Nodes store the
+    contiguous child range they cover, so a query walks the levels top-down
+    with vectorized box tests and only expands intersecting nodes.
+    """
+    def __init__(self, x0, y0, x1, y1, leaf_size=16):
+        self.leaf_size = leaf_size
+        order = _str_order(x0, y0, x1, y1, np.arange(len(x0)), leaf_size)
+        self.order = order # level-0 position -> block id
+        boxes = np.stack([x0[order], y0[order], x1[order], y1[order]], axis=1)
+        self.levels = [(boxes, None, None)]
+        while len(boxes) > leaf_size:
+            starts = np.arange(0, len(boxes), leaf_size)
+            ends = np.minimum(starts + leaf_size, len(boxes))
+            parent = np.stack([np.minimum.reduceat(boxes[:, 0], starts), np.minimum.reduceat(boxes[:, 1], starts),
+                               np.maximum.reduceat(boxes[:, 2], starts), np.maximum.reduceat(boxes[:, 3], starts)], axis=1)
+            # Pack the parents themselves; their child ranges travel with them
+            p_order = _str_order(*parent.T, np.arange(len(parent)), leaf_size)
+            boxes = parent[p_order]
+            self.levels.append((boxes, starts[p_order], ends[p_order]))
+
+    def query(self, bounds):
+        xmin, ymin, xmax, ymax = bounds
+        cand = np.arange(len(self.levels[-1][0]))
+        for level in range(len(self.levels) - 1, -1, -1):
+            boxes, starts, ends = self.levels[level]
+            b = boxes[cand]
+            hit = cand[(b[:, 0] <= xmax) & (b[:, 2] >= xmin) & (b[:, 1] <= ymax) & (b[:, 3] >= ymin)]
+            if starts is None:
+                return np.sort(self.order[hit])
+            # Expand every hit node into its child range
+            lengths = ends[hit] - starts[hit]
+            offsets = np.repeat(starts[hit] - np.cumsum(lengths) + lengths, lengths)
+            cand = offsets + np.arange(lengths.sum())
+        return cand
+
+def _str_order(x0, y0, x1, y1, ids, leaf_size):
+    """Sort-Tile-Recursive order: vertical slices by x centre, each sorted by y centre."""
+    n = len(ids)
+    slices = int(np.ceil(np.sqrt(np.ceil(n / leaf_size))))
+    per_slice = slices * leaf_size
+    by_x = np.argsort(x0 + x1, kind="stable")
+    slice_id = np.empty(n, dtype=np.int64)
+    slice_id[by_x] = np.arange(n) // per_slice
+    return ids[np.lexsort(((y0 + y1), slice_id))]
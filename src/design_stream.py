@@ -0,0 +1,216 @@
+import json
+import os
+import tempfile
+import numpy as np
+
+COLUMNS = ("x", "y", "w", "h", "power_mw")
+
+class StreamingDesignReader:
+    """
+    Incremental reader for the hierarchical design JSON. The blocks /
+    sub_blocks arrays are parsed one block at a time from a fixed-size text
+    buffer and handed to `sink` as flat batches of absolute rectangles
+    (x0, y0, x1, y1, power), so memory stays bounded by chunk_size +
+    batch_size no matter how large the file is. All other top-level keys
+    (die size, tech_file, stackup, ...) end up in `meta`.
+    """
+    def __init__(self, path, chunk_size=1 << 20, batch_size=65536):
+        self.path = path
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+        self.meta = {}
+        self.blocks_read = 0
+        self._decoder = json.JSONDecoder()
+
+    def read(self, sink):
+        self._sink = sink
+        self._rows = ([], [], [], [], [])
+        with open(self.path, "r") as f:
+            self._file = f
+            self._buf, self._pos, self._eof = "", 0, False
+            self._expect("{")
+            for key in self._members():
+                if key == "blocks":
+                    self._blocks(0.0, 0.0)
+                else:
+                    self.meta[key] = self._value()
+        self._flush()
+        return self.meta
+
+    # --- Tokenizer over the sliding buffer ---
+    def _fill(self):
+        chunk = self._file.read(self.chunk_size)
+        self._buf = self._buf[self._pos:] + chunk # drop what is already parsed
+        self._pos = 0
+        self._eof = not chunk
+        return bool(chunk)
+
+    def _peek(self):
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in " \t\r\n":
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                raise ValueError(f"{self.path}: unexpected end of design file")
+
+    def _expect(self, char):
+        if self._peek() != char:
+            raise ValueError(f"{self.path}: expected '{char}' at offset {self._pos}")
+        self._pos += 1
+
+    def _value(self):
+        """Decodes one complete JSON value, reading more text while it is cut off."""
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+                # A number cut at the buffer end ("4." / "1e") may continue in the next chunk
+                if self._eof or not isinstance(value, (int, float)) or (end < len(self._buf) and self._buf[end] not in ".eE+-"):
+                    self._pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self._eof:
+                    raise
+            self._fill()
+
+    def _members(self):
+        """Yields the keys of the current object; the caller consumes each value."""
+        if self._peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            key = self._value()
+            self._expect(":")
+            yield key
+            char = self._peek()
+            self._pos += 1
+            if char == "}":
+                return
+            if char != ",":
+                raise ValueError(f"{self.path}: expected ',' or '}}' at offset {self._pos}")
+
+    # --- Schema: blocks arrays and block objects ---
+    def _blocks(self, px, py):
+        self._expect("[")
+        if self._peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            self._peek()
+            try:
+                # Whole block in the buffer: one C-level decode instead of token by token
+                block, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                # Cut off by the buffer end (or larger than it): descend key by key
+                self._block(px, py)
+            else:
+                self._pos = end
+                self._walk([block], px, py)
+            char = self._peek()
+            self._pos += 1
+            if char == "]":
+                return
+            if char != ",":
+                raise ValueError(f"{self.path}: expected ',' or ']' at offset {self._pos}")
+
+    def _block(self, px, py):
+        self._expect("{")
+        block, deferred = {}, None
+        for key in self._members():
+            if key == "sub_blocks":
+                if "x" in block and "y" in block:
+                    self._blocks(px + block["x"], py + block["y"])
+                else:
+                    # Offset not known yet: keep this subtree until the block closes
+                    deferred = self._value()
+            elif key in ("x", "y", "w", "h", "power_mw"):
+                block[key] = self._value()
+            else:
+                self._value()
+        self.blocks_read += 1
+
+        abs_x, abs_y = px + block["x"], py + block["y"]
+        p = block.get("power_mw", 0)
+        if p > 0:
+            self._emit(abs_x, abs_y, block["w"], block["h"], p)
+        if deferred:
+            self._walk(deferred, abs_x, abs_y)
+
+    def _walk(self, blocks, px, py):
+        """Emits already-decoded blocks and their sub_blocks."""
+        stack = [(blocks, px, py)]
+        while stack:
+            children, cx, cy = stack.pop()
+            for child in children:
+                self.blocks_read += 1
+                x, y = cx + child["x"], cy + child["y"]
+                if "sub_blocks" in child:
+                    stack.append((child["sub_blocks"], x, y))
+                if child.get("power_mw", 0) > 0:
+                    self._emit(x, y, child["w"], child["h"], child["power_mw"])
+
+    def _emit(self, x, y, w, h, p):
+        for col, v in zip(self._rows, (x, y, x + w, y + h, p)):
+            col.append(v)
+        if len(self._rows[0]) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        if self._rows[0]:
+            self._sink(tuple(np.array(col, dtype=float) for col in self._rows))
+        self._rows = ([], [], [], [], [])
+
+class BatchSpill:
+    """Disk-backed list of row batches, for blocks that arrive before the die size."""
+    def __init__(self):
+        self.file = tempfile.TemporaryFile()
+        self.count = 0
+
+    def append(self, batch):
+        np.save(self.file, np.stack(batch))
+        self.count += 1
+
+    def __iter__(self):
+        self.file.seek(0)
+        for _ in range(self.count):
+            yield tuple(np.load(self.file))
+
+    def close(self):
+        self.file.close()
+
+def save_columnar(path, batches, meta):
+    """
+    Writes the flattened design (absolute x, y, w, h, power_mw columns plus
+    the top-level metadata) as .npz, or as .parquet through pyarrow
+    (one row group per batch, so conversion memory stays bounded).
+    """
+    if path.endswith(".parquet"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        schema = pa.schema([(c, pa.float64()) for c in COLUMNS], metadata={"design": json.dumps(meta)})
+        with pq.ParquetWriter(path, schema) as writer:
+            for x0, y0, x1, y1, p in batches:
+                writer.write_table(pa.table(dict(zip(COLUMNS, (x0, y0, x1 - x0, y1 - y0, p)))), schema=schema)
+        return path
+    cols = [np.concatenate(c) if c else np.zeros(0) for c in zip(*batches)] or [np.zeros(0)] * 5
+    x0, y0, x1, y1, p = cols
+    np.savez(path, x=x0, y=y0, w=x1 - x0, h=y1 - y0, power_mw=p, meta=json.dumps(meta))
+    return path
+
+def load_columnar(path):
+    """Returns ((x0, y0, x1, y1, power) arrays, meta) from a .npz / .parquet design."""
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        table = pq.read_table(path)
+        cols = {c: table.column(c).to_numpy() for c in COLUMNS}
+        meta = json.loads((table.schema.metadata or {}).get(b"design", b"{}"))
+    else:
+        with np.load(path) as data:
+            cols = {c: data[c] for c in COLUMNS}
+            meta = json.loads(str(data["meta"])) if "meta" in data else {}
+    x, y = cols["x"], cols["y"]
+    return (x, y, x + cols["w"], y + cols["h"], cols["power_mw"]), meta
+
+def is_columnar(path):
+    return os.path.splitext(path)[1] in (".npz", ".parquet")
@@ -4,61 +4,104 @@ import torch
 import os
 from src.physics_engine import VoxelThermalSolver3D, generate_spatial_layout
 
-def generate_parametric_dataset(samples=1000):
-    print(f"🏭 Physics Factory: Generating {samples} Parametric Material samples...")
-    solver = VoxelThermalSolver3D(layers=5)
+# Per-layer K range (W/mK): die, metal (Cu vs Al vs Ru), C4, package (plastic vs ceramic), board
+K_BOUNDS = [(150.0, 150.0), (200.0, 400.0), (20.0, 80.0), (1.0, 20.0), (0.5, 0.5)]
+
+def _random_block_maps(N):
+    """Random DSP/TX/RX floorplan as three unit-power (1 mW total) maps."""
+    a_tx = np.random.uniform(1000, 5000)
+    a_rx = np.random.uniform(1000, 5000)
+    a_dsp = np.random.uniform(5000, 20000)
+    dist = np.random.uniform(10, 500)
+    layout = generate_spatial_layout(a_tx, a_rx, a_dsp, dist)
+
+    maps = np.zeros((3, N, N))
+    for m, block in enumerate((1, 2, 3)): # DSP, TX, RX
+        mask = (layout == block)
+        if mask.any(): maps[m][mask] = 1.0 / mask.sum()
+    return maps
+
+def _random_block_powers():
+    return np.array([np.random.uniform(50, 200), np.random.uniform(50, 150), np.random.uniform(20, 50)])
+
+def generate_parametric_dataset(samples=1000, maps_per_stack=1, precision="float32", engine="fdm",
+                                stacks_per_map=25, rom_tol=1e-3):
+    """
+    engine "fdm" (default): maps_per_stack random floorplans per random stack,
+    one batched solve. The default draws a fresh stack for every sample, as the
+    original generator did. maps_per_stack=k shares one factorization between
+    k floorplans (up to k times faster), but leaves only samples / k distinct
+    material stacks in the training set.
+    engine "rom" (opt-in): one ReducedThermalModel over K_BOUNDS per random
+    floorplan, then stacks_per_map random stacks and block powers evaluated
+    online. Fields are approximate: each carries the model's relative error
+    estimate (2-norm, below rom_tol over its training set, not a pointwise
+    bound), and only the default nodal-K stencil is supported.
+    """
+    if engine not in ("fdm", "rom"):
+        raise ValueError(f"Unknown engine '{engine}' (expected 'fdm' or 'rom').")
+    # The surrogate trains on float32 tensors, so single precision loses nothing downstream
+    print(f"🏭 Physics Factory: Generating {samples} Parametric Material samples ({precision}, {engine})...")
+    solver = VoxelThermalSolver3D(layers=5, precision=precision)
+    N = solver.N
     
     x_data = [] 
     y_data = [] 
     
-    for i in range(samples):
-        # 1. Randomize Materials (The "Parametric" part)
-        k_die = 150.0
-        k_metal = np.random.uniform(200, 400) # Cu vs Al vs Ru
-        k_c4 = np.random.uniform(20, 80)
-        k_pkg = np.random.uniform(1, 20)      # Plastic vs Ceramic
-        k_board = 0.5
-        
-        # Create Material Volume (L, 16, 16) - Homogeneous per layer for now
-        k_vol = np.zeros((5, 16, 16))
-        k_vol[0] = k_die
-        k_vol[1] = k_metal
-        k_vol[2] = k_c4
-        k_vol[3] = k_pkg
-        k_vol[4] = k_board
-        
-        # 2. Randomize Power (As before)
-        p_vol = np.zeros((5, 16, 16))
-        a_tx = np.random.uniform(1000, 5000)
-        a_rx = np.random.uniform(1000, 5000)
-        a_dsp = np.random.uniform(5000, 20000)
-        dist = np.random.uniform(10, 500)
-        layout = generate_spatial_layout(a_tx, a_rx, a_dsp, dist)
-        
-        p_dsp_val = np.random.uniform(50, 200)
-        p_tx_val = np.random.uniform(50, 150)
-        p_rx_val = np.random.uniform(20, 50)
-        
-        mask_dsp = (layout == 1)
-        if mask_dsp.any(): p_vol[0][mask_dsp] = p_dsp_val / mask_dsp.sum()
-        mask_tx = (layout == 2)
-        if mask_tx.any(): p_vol[0][mask_tx] = p_tx_val / mask_tx.sum()
-        mask_rx = (layout == 3)
-        if mask_rx.any(): p_vol[0][mask_rx] = p_rx_val / mask_rx.sum()
-        
-        # 3. Solve
-        t_vol = solver.solve(p_vol, k_vol)
+    done = 0
+    worst = 0.0
+    while done < samples:
+        if engine == "rom":
+            from src.physics_engine_rom import ReducedThermalModel
+            batch = min(stacks_per_map, samples - done)
+            units = np.zeros((3, 5, N, N))
+            units[:, 0] = _random_block_maps(N)
+            # Truth solves in float64: the greedy error estimate cannot resolve below them
+            rom = ReducedThermalModel(VoxelThermalSolver3D(layers=5), units, K_BOUNDS, tol=rom_tol)
+            k_vols, p_vols, t_vols = [], [], []
+            for b in range(batch):
+                k_layers = np.array([lo if lo == hi else np.random.uniform(lo, hi) for lo, hi in K_BOUNDS])
+                powers = _random_block_powers()
+                k_vols.append(np.broadcast_to(k_layers[:, None, None], (5, N, N)))
+                p_vols.append(np.tensordot(powers, units, axes=1))
+                t_vols.append(rom.evaluate(k_layers, powers))
+                worst = max(worst, float(np.max(rom.last_error)))
+        else:
+            batch = min(maps_per_stack, samples - done)
+            # 1. Randomize Materials (The "Parametric" part)
+            # Create Material Volume (L, N, N) - Homogeneous per layer for now
+            k_layers = np.array([lo if lo == hi else np.random.uniform(lo, hi) for lo, hi in K_BOUNDS])
+            k_vol = np.broadcast_to(k_layers[:, None, None], (5, N, N))
+
+            # 2. Randomize Power (As before), several maps per material stack
+            p_vols = np.zeros((batch, 5, N, N))
+            for b in range(batch):
+                maps = _random_block_maps(N)
+                p_vols[b, 0] = np.tensordot(_random_block_powers(), maps, axes=1)
+
+            # 3. Solve (one factorization, one multi-RHS substitution)
+            t_vols = solver.solve_batch(p_vols, k_vol)
+            if done == 0 and precision != "float64":
+                report = solver.precision_report(p_vols[0], k_vol)
+                print(f"   {precision} vs float64: max err {report['max_abs_err']:.2e} C "
+                      f"({report['max_rel_err']:.1e} of peak rise)")
+            k_vols = [k_vol] * batch
         
         # 4. Construct Input Tensor: Stack Power and K
-        # X shape: (10, 16, 16) -> First 5 are Power, Next 5 are K
+        # X shape: (10, N, N) -> First 5 are Power, Next 5 are K
         # Normalize K (Divide by 400.0 max)
-        x_sample = np.concatenate([p_vol / 50.0, k_vol / 400.0], axis=0)
-        
-        x_data.append(x_sample)
-        y_data.append(t_vol / 125.0)
+        for p_vol, k_vol, t_vol in zip(p_vols, k_vols, t_vols):
+            x_sample = np.concatenate([p_vol / 50.0, k_vol / 400.0], axis=0)
+            x_data.append(x_sample)
+            y_data.append(t_vol / 125.0)
         
-        if (i+1) % 200 == 0:
-            print(f"   ... {i+1} samples.")
+        prev = done
+        done += batch
+        if done // 200 > prev // 200:
+            print(f"   ... {done} samples.")
+
+    if engine == "rom":
+        print(f"   ROM: worst relative error estimate {worst:.1e} (tol {rom_tol:g})")
 
     os.makedirs("data", exist_ok=True)
     torch.save(torch.tensor(np.array(x_data)).float(), "data/x_parametric.pt")
@@ -1,36 +1,79 @@
 import argparse
 import numpy as np
 import matplotlib.pyplot as plt
+from src.artifact_cache import ArtifactCache
 from src.design_loader import DesignLoader
 from src.bridge import OptimizerBridge
+from src.physics_engine import VoxelThermalSolver3D
+from src.physics_engine_adaptive import AdaptiveThermalSolver
 
 def evaluate_user_design():
     parser = argparse.ArgumentParser(description="AI Thermal Evaluation for User Designs")
-    parser.add_argument("design_file", type=str, help="Path to JSON design file")
+    parser.add_argument("design_file", type=str, help="Path to JSON design file (or its columnar .npz / .parquet form)")
     parser.add_argument("--roi", type=str, default=None, help="ROI 'xmin,ymin,xmax,ymax'")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="Physics solve on a hotspot-refined quadtree (512x512 equivalent) instead of AI inference")
+    parser.add_argument("--full-stack", action="store_true",
+                        help="Physics solve with every stackup / ITF layer at its real thickness instead of AI inference")
+    parser.add_argument("--cache", action="store_true",
+                        help="Reuse (and store) parsed, rasterized designs in data/artifacts")
     args = parser.parse_args()
     
-    loader = DesignLoader()
+    artifacts = ArtifactCache() if args.cache else None
+    loader = DesignLoader(grid_size=64 if args.full_stack else 16, artifacts=artifacts, full_stack=args.full_stack)
     roi = [float(x) for x in args.roi.split(',')] if args.roi else None
     
     print(f"📂 Loading Design: {args.design_file}...")
     try:
         # Load Power and Material Properties
-        power_grid_l0, k_layers = loader.load_from_json(args.design_file, roi_bounds=roi)
+        power_grid_l0, k_layers = loader.load(args.design_file, roi_bounds=roi)
     except Exception as e:
         print(f"❌ Error loading design: {e}")
         return
 
-    # Run AI Inference
-    print("🧠 Running Parametric Physics-NeMo Inference...")
-    bridge = OptimizerBridge()
-    temp_vol = bridge.predict_thermal_volume(power_grid_l0, k_layers)
+    if args.adaptive:
+        # Rasterize finely, then let the quadtree keep resolution only at hotspots
+        print("🔬 Running Adaptive Quadtree Physics Solve...")
+        fine_loader = DesignLoader(grid_size=512, artifacts=artifacts)
+        power_fine, _ = fine_loader.load(args.design_file, roi_bounds=roi)
+        xmin, ymin, xmax, ymax = fine_loader.extent
+        # Full stack: every physical layer at its own thickness, as in the voxel solve below
+        solver = AdaptiveThermalSolver(die_um=(xmax - xmin, ymax - ymin), layers=len(k_layers),
+                                       z_pitch_um=loader.thickness_um or 20)
+        mesh, t_leaves = solver.solve(power_fine, k_layers)
+        temp_vol = solver.to_uniform(mesh, t_leaves, size=64)
+        info = solver.last_info
+        print(f"   -> {info['unknowns']} unknowns ({100.0 * info['unknowns'] / info['uniform_unknowns']:.1f}% of uniform 512x512)")
+        peak_t = t_leaves[0].max()
+        source = "ADAPTIVE FDM"
+    elif args.full_stack:
+        # Spectral / layered solvers scale linearly with the layer count (nodal-K stencil)
+        print(f"🧱 Running Full-Stack Physics Solve ({len(k_layers)} layers)...")
+        xmin, ymin, xmax, ymax = loader.extent
+        # The voxel solvers take one lateral pitch for both axes
+        if not np.isclose(xmax - xmin, ymax - ymin, rtol=1e-6):
+            print(f"❌ Error: --full-stack needs a square ROI, got {xmax - xmin:g} x {ymax - ymin:g} um "
+                  f"(use --adaptive for rectangular regions)")
+            return
+        solver = VoxelThermalSolver3D(size=loader.N, layers=len(k_layers), pitch_um=(xmax - xmin) / loader.N,
+                                      z_pitch_um=loader.thickness_um or 20)
+        p_vol = np.zeros((len(k_layers), loader.N, loader.N))
+        p_vol[0] = power_grid_l0
+        temp_vol = solver.solve(p_vol, k_layers)
+        peak_t = temp_vol[0].max()
+        source = "FULL-STACK FDM"
+    else:
+        # Run AI Inference
+        print("🧠 Running Parametric Physics-NeMo Inference...")
+        bridge = OptimizerBridge()
+        temp_vol = bridge.predict_thermal_volume(power_grid_l0, k_layers)
+        peak_t = temp_vol[0].max()
+        source = "AI PREDICTED"
     
-    peak_t = temp_vol[0].max()
     avg_t = temp_vol[0].mean()
     
     print("\n" + "="*40)
-    print(f"🏆 THERMAL AUDIT REPORT (AI PREDICTED)")
+    print(f"🏆 THERMAL AUDIT REPORT ({source})")
     print("="*40)
     print(f"Peak Die Temp    : {peak_t:.1f} °C")
     print(f"Average Die Temp : {avg_t:.1f} °C")
@@ -45,7 +88,7 @@ def evaluate_user_design():
     plt.figure(figsize=(10, 8))
     plt.imshow(temp_vol[0], cmap='inferno', interpolation='nearest')
     plt.colorbar(label='Temperature (°C)')
-    plt.title(f"AI Thermal Map: {args.design_file}")
+    plt.title(f"{'Adaptive' if args.adaptive else 'Full-Stack' if args.full_stack else 'AI'} Thermal Map: {args.design_file}")
     plt.savefig("plots/user_design_thermal.png")
     print("✅ Heatmap saved to plots/user_design_thermal.png")
 
@@ -1,96 +1,526 @@
+import hashlib
+from collections import OrderedDict
 import numpy as np
-from scipy.sparse import lil_matrix, linalg
+from scipy.sparse import coo_matrix, linalg
+
+K_CONV = 1e-3       # W/mK -> mW/(um*K)
+T_AMB = 25.0        # Ambient (Heat Sink) Temperature
+G_AMB_FACTOR = 10.0 # Top-layer sink conductance relative to g_vert
+KRYLOV_BACKENDS = ("iterative", "matrix_free", "layered", "dd")
+
+def conductivity_volume(k_vol, L, N, dtype=float):
+    """Broadcasts per-layer K (list / 1D array) to a (L, N, N) volume in mW/(um*K)."""
+    k_arr = np.asarray(k_vol, dtype=dtype)
+    if k_arr.ndim == 1:
+        k_arr = np.broadcast_to(k_arr[:, None, None], (L, N, N))
+    return k_arr * K_CONV
+
+def _link_slices(axis):
+    lo = [slice(None)] * 3
+    hi = [slice(None)] * 3
+    lo[axis] = slice(None, -1)
+    hi[axis] = slice(1, None)
+    return tuple(lo), tuple(hi)
+
+def stencil_links(K, dx, dz, symmetric=False):
+    """
+    Link conductances of the 7-point stencil, one entry per neighbour pair.
+    Returns [(axis, g_lo, g_hi)] where g_lo is the conductance seen from the
+    lower-index cell's row and g_hi from the upper-index cell's row.
+    Nodal K dominance: each row uses its own voxel's K.
+    symmetric=True instead puts the two half cells in series (harmonic mean
+    of K at the interface), so g_lo == g_hi and G is SPD.
+    dz is one z pitch or a per-layer thickness (L,); a vertical link then
+    spans half of each layer it joins.
+    """
+    if symmetric:
+        links = []
+        for axis, r_lo, r_hi in link_resistances(K, dx, dz):
+            g = 1.0 / (r_lo + r_hi)
+            links.append((axis, g, g))
+        return links
+
+    if np.ndim(dz) == 0:
+        g_lat = K * dz
+        g_vert = K * (dx**2) / dz
+        links = []
+        for axis, g in ((1, g_lat), (2, g_lat), (0, g_vert)):
+            lo, hi = _link_slices(axis)
+            links.append((axis, g[lo], g[hi]))
+        return links
+
+    dz = np.asarray(dz, dtype=K.dtype)[:, None, None]
+    g_lat = K * dz
+    h = (dz[:-1] + dz[1:]) / 2
+    links = []
+    for axis in (1, 2):
+        lo, hi = _link_slices(axis)
+        links.append((axis, g_lat[lo], g_lat[hi]))
+    links.append((0, K[:-1] * (dx**2) / h, K[1:] * (dx**2) / h))
+    return links
+
+def link_resistances(K, dx, dz):
+    """Half-cell thermal resistances [(axis, r_lo, r_hi)] of every link, lower and upper side."""
+    dz = dz if np.ndim(dz) == 0 else np.asarray(dz, dtype=K.dtype)[:, None, None]
+    r_lat = 1.0 / (2 * K * dz)
+    r_vert = dz / (2 * K * dx**2)
+    links = []
+    for axis, r in ((1, r_lat), (2, r_lat), (0, r_vert)):
+        lo, hi = _link_slices(axis)
+        links.append((axis, r[lo], r[hi]))
+    return links
+
+def ambient_conductance(K, dx, dz):
+    """(N, N) sink conductance attached to the top layer."""
+    return K[-1] * (dx**2) / float(np.ravel(dz)[-1]) * G_AMB_FACTOR
+
+def assemble_conductance(K, dx, dz, symmetric=False):
+    """
+    Vectorized assembly of the 3D conductance matrix.
+    K: (L, N, N) conductivity in mW/(um*K) (rectangular (L, Ny, Nx) tiles also work)
+    symmetric: harmonic-mean interface conductances (SPD G), see stencil_links
+    Returns (G [CSR], P_amb) where P_amb is the ambient injection vector.
+    """
+    n = K.size
+    idx = np.arange(n).reshape(K.shape)
+    diag = np.zeros(K.shape, dtype=K.dtype)
+    rows, cols, vals = [], [], []
+
+    for axis, g_lo, g_hi in stencil_links(K, dx, dz, symmetric):
+        lo, hi = _link_slices(axis)
+        i_lo, i_hi = idx[lo].ravel(), idx[hi].ravel()
+
+        # Upper cell -> lower neighbour, then lower cell -> upper neighbour
+        # (same accumulation order as the original per-voxel loop)
+        rows += [i_hi, i_lo]
+        cols += [i_lo, i_hi]
+        vals += [-g_hi.ravel(), -g_lo.ravel()]
+        diag[hi] += g_hi
+        diag[lo] += g_lo
+
+    # Ambient BC (Top Layer)
+    g_amb = ambient_conductance(K, dx, dz)
+    diag[-1] += g_amb
+    P_amb = np.zeros(K.shape, dtype=K.dtype)
+    P_amb[-1] = g_amb * T_AMB
+
+    rows.append(idx.ravel())
+    cols.append(idx.ravel())
+    vals.append(diag.ravel())
+
+    G = coo_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))), shape=(n, n))
+    return G.tocsr(), P_amb.ravel()
+
+class StencilOperator(linalg.LinearOperator):
+    """
+    Matrix-free application of the voxel conductance operator (G + diag(shift)).
+    Stores only the per-voxel link conductances, so memory is O(voxels) and
+    independent of the number of matrix nonzeros. Works in K's dtype.
+    """
+    def __init__(self, K, dx, dz, shift=None, symmetric=False):
+        L, N, _ = K.shape
+        n = L * N * N
+        super().__init__(dtype=K.dtype, shape=(n, n))
+        self.grid = (L, N, N)
+        self.links = stencil_links(K, dx, dz, symmetric)
+        self.diag = np.zeros((L, N, N), dtype=K.dtype)
+        for axis, g_lo, g_hi in self.links:
+            lo, hi = _link_slices(axis)
+            self.diag[hi] += g_hi
+            self.diag[lo] += g_lo
+        g_amb = ambient_conductance(K, dx, dz)
+        self.diag[-1] += g_amb
+        if shift is not None:
+            self.diag += shift
+        self.P_amb = np.zeros((L, N, N), dtype=K.dtype)
+        self.P_amb[-1] = g_amb * T_AMB
+
+    def _matvec(self, x):
+        x = x.reshape(self.grid)
+        y = self.diag * x
+        for axis, g_lo, g_hi in self.links:
+            lo, hi = _link_slices(axis)
+            y[lo] -= g_lo * x[hi]
+            y[hi] -= g_hi * x[lo]
+        return y.ravel()
+
+    def _rmatvec(self, x):
+        # Transpose: each link's coefficient moves to the mirrored position
+        x = x.reshape(self.grid)
+        y = self.diag * x
+        for axis, g_lo, g_hi in self.links:
+            lo, hi = _link_slices(axis)
+            y[hi] -= g_lo * x[lo]
+            y[lo] -= g_hi * x[hi]
+        return y.ravel()
+
+    def vertical_bands(self):
+        """(diag, lower, upper) of each z column, shaped (L, N*N)."""
+        L, N, _ = self.grid
+        lower = np.zeros((L, N * N), dtype=self.dtype)
+        upper = np.zeros((L, N * N), dtype=self.dtype)
+        for axis, g_lo, g_hi in self.links:
+            if axis == 0:
+                upper[:-1] = -g_lo.reshape((L - 1, -1))
+                lower[1:] = -g_hi.reshape((L - 1, -1))
+        return self.diag.reshape((L, -1)), lower, upper
+
+class FactorizationCache:
+    """
+    LRU cache of sparse LU factorizations keyed by material stack + grid geometry.
+    Entries are evicted oldest-first once the summed factor size exceeds max_bytes.
+    """
+    def __init__(self, max_bytes=512 * 2**20):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict() # key -> (factor, P_amb, nbytes)
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(K, dx, dz, symmetric=False):
+        h = hashlib.sha1(np.ascontiguousarray(K)) # hashes the buffer without a copy
+        h.update(repr((K.shape, K.dtype.str, float(dx), tuple(np.ravel(dz).tolist()) if np.ndim(dz) else float(dz))).encode())
+        return h.hexdigest() + ("-spd" if symmetric else "")
+
+    @staticmethod
+    def factor_nbytes(lu):
+        if hasattr(lu, "nbytes"):
+            return lu.nbytes # Multigrid hierarchies report their own size
+        # data (float64) + indices (int32) for both triangular factors
+        return lu.nnz * 12
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0], entry[1]
+
+    def put(self, key, lu, P_amb, nbytes=None):
+        if nbytes is None:
+            nbytes = self.factor_nbytes(lu)
+        if nbytes > self.max_bytes:
+            return # Too large to keep; caller still uses it for this solve
+        if key in self.entries:
+            self.nbytes -= self.entries.pop(key)[2]
+        self.entries[key] = (lu, P_amb, nbytes)
+        self.nbytes += nbytes
+        while self.nbytes > self.max_bytes:
+            _, (_, _, freed) = self.entries.popitem(last=False)
+            self.nbytes -= freed
+
+    def clear(self):
+        self.entries.clear()
+        self.nbytes = 0
+
+    def info(self):
+        return {"entries": len(self.entries), "nbytes": self.nbytes,
+                "hits": self.hits, "misses": self.misses}
+
+class CholeskyFactor:
+    """CHOLMOD factor of an SPD G behind the SuperLU solve(rhs, trans) interface."""
+    def __init__(self, factor):
+        self.factor = factor
+        self.nnz = factor.L().nnz
+
+    def solve(self, rhs, trans="N"):
+        return self.factor(rhs) # G^T == G
+
+def cholesky_factor(G):
+    """
+    Factors an SPD conductance matrix: CHOLMOD Cholesky when scikit-sparse is
+    installed, otherwise SuperLU in symmetric mode (minimum degree on A^T+A,
+    diagonal pivots), about half the fill and time of the general LU.
+    """
+    try:
+        from sksparse.cholmod import cholesky
+    except ImportError:
+        return linalg.splu(G.tocsc(), permc_spec="MMD_AT_PLUS_A", diag_pivot_thresh=0.0,
+                           options={"SymmetricMode": True})
+    return CholeskyFactor(cholesky(G.tocsc()))
 
 class VoxelThermalSolver3D:
-    def __init__(self, size=64, layers=5, pitch_um=31.25, z_pitch_um=20):
+    """
+    backend: "direct" (cached sparse LU), "iterative" (BiCGSTAB preconditioned
+    by a geometric multigrid V-cycle, for grids where LU fill-in is too large)
+    or "matrix_free" (same Krylov/multigrid path, but G is never assembled)
+    or "layered" (matrix-free Krylov preconditioned by the spectral solve of
+    the layer-mean stack, for deep stacks; exact, hence linear in the layer
+    count, for the default stencil, approximate with symmetric=True)
+    or "dd" (matrix-free BiCGSTAB preconditioned by overlapping Schwarz tiles
+    factored in `workers` processes, for grids too large for one LU; the
+    workers stay up until close()).
+    z_pitch_um is one pitch or the per-layer thicknesses of a full stack.
+    symmetric=True assembles harmonic-mean interface conductances: G is SPD,
+    so the direct backend factors it as Cholesky (CHOLMOD when scikit-sparse
+    is installed, else SuperLU in symmetric mode) and Krylov backends use CG.
+    With spectral=True, layer-uniform conductivities (one K per layer) are
+    routed to the DCT-based SpectralThermalSolver regardless of backend.
+    precision: "float64" (default), "float32" (operators, factors and fields
+    in single precision: half the memory and traffic) or "mixed" (float32
+    solves corrected by float64 iterative refinement down to tol).
+    tol / maxiter apply to the iterative backend and to mixed refinement;
+    `last_info` records the iteration count and relative residual of the
+    most recent solve. artifacts (an ArtifactCache) persists assembled
+    operators, and LU factors if enabled, across runs.
+    """
+    def __init__(self, size=64, layers=5, pitch_um=31.25, z_pitch_um=20, cache=None,
+                 backend="direct", tol=1e-8, maxiter=500, spectral=True, precision="float64",
+                 refine_steps=10, artifacts=None, symmetric=False, workers=None):
         self.N = size
         self.L = layers
         self.dx = pitch_um # 2000um / 64 = 31.25um
         self.dz = z_pitch_um
+        # Factorizations are reused whenever only the power map changes
+        self.cache = cache if cache is not None else FactorizationCache()
+        self.backend = backend
+        self.tol = tol
+        self.maxiter = maxiter
+        self.spectral = spectral
+        self.precision = precision
+        self.refine_steps = refine_steps
+        self.artifacts = artifacts
+        self.symmetric = symmetric
+        self.workers = workers
+        self._dd = None
+        self.last_info = {}
+
+    @property
+    def dtype(self):
+        """Working precision of operators and factors (mixed works in float32)."""
+        return np.dtype(np.float64 if self.precision == "float64" else np.float32)
+
+    @property
+    def krylov_method(self):
+        # Restricted Schwarz is not symmetric, so "dd" stays on BiCGSTAB
+        return "cg" if self.symmetric and self.backend != "dd" else "bicgstab"
+
+    def domain_decomposition(self):
+        """The DomainDecompositionSolver (worker pool) behind backend="dd"."""
+        if self._dd is None:
+            from src.physics_engine_dd import DomainDecompositionSolver
+            self._dd = DomainDecompositionSolver(self.N, self.L, self.dx, self.dz, workers=self.workers,
+                                                 tol=self.tol, maxiter=self.maxiter, symmetric=self.symmetric)
+        return self._dd
+
+    def close(self):
+        """Stops the "dd" worker processes; the solver restarts them if used again."""
+        if self._dd is not None:
+            self._dd.close()
+
+    def build_operator(self, k_vol):
+        """Returns (G, P_amb) for a conductivity map (per-layer list or (L, N, N) volume)."""
+        K = conductivity_volume(k_vol, self.L, self.N, self.dtype)
+        return assemble_conductance(K, self.dx, self.dz, self.symmetric)
         
-    def solve(self, power_vol, k_vol):
+    def solve(self, power_vol, k_vol, x0=None):
         """
         Solves 3D Poisson with Heterogeneous Materials.
         power_vol: (L, N, N) Power Map
         k_vol: (L, N, N) Conductivity Map (Voxel-wise K)
+        x0: optional (L, N, N) initial guess (iterative backends only)
         """
         N, L = self.N, self.L
-        num_voxels = L * N * N
-        
-        G = lil_matrix((num_voxels, num_voxels))
-        P = power_vol.flatten()
-        k_conv = 1e-3
-        
-        # Helper to get voxel index
-        def idx(l, r, c): return (l * N * N) + (r * N) + c
-        
-        # Flattened K array for fast access
-        if isinstance(k_vol, list):
-            # Broadcast list to (L, N, N)
-            k_arr = np.zeros((L, N, N))
-            for l in range(L):
-                k_arr[l, :, :] = k_vol[l]
-            K = k_arr * k_conv
-        else:
-            K = k_vol * k_conv
-        
-        for l in range(L):
-            for r in range(N):
-                for c in range(N):
-                    curr = idx(l, r, c)
-                    k_curr = K[l, r, c]
-                    
-                    # Conductances derived from Local K
-                    g_lat = k_curr * self.dz
-                    g_vert = k_curr * (self.dx**2) / self.dz
-                    
-                    diag_sum = 0.0
-                    
-                    # Neighbors (6-direction)
-                    # For a simplified symmetric solver, we use harmonic mean at interfaces
-                    # But for speed, we stick to Nodal K dominance (valid for regular grids)
-                    
-                    # Lateral
-                    if r > 0: 
-                        n_idx = idx(l, r-1, c)
-                        G[curr, n_idx] = -g_lat
-                        diag_sum += g_lat
-                    if r < N-1: 
-                        n_idx = idx(l, r+1, c)
-                        G[curr, n_idx] = -g_lat
-                        diag_sum += g_lat
-                    if c > 0: 
-                        n_idx = idx(l, r, c-1)
-                        G[curr, n_idx] = -g_lat
-                        diag_sum += g_lat
-                    if c < N-1: 
-                        n_idx = idx(l, r, c+1)
-                        G[curr, n_idx] = -g_lat
-                        diag_sum += g_lat
-                        
-                    # Vertical
-                    if l > 0:
-                        n_idx = idx(l-1, r, c)
-                        G[curr, n_idx] = -g_vert
-                        diag_sum += g_vert
-                    if l < L-1:
-                        n_idx = idx(l+1, r, c)
-                        G[curr, n_idx] = -g_vert
-                        diag_sum += g_vert
-                        
-                    # Ambient BC (Top Layer)
-                    if l == L-1:
-                        g_amb = g_vert * 10.0
-                        diag_sum += g_amb
-                        P[curr] += g_amb * 25.0
-                        
-                    G[curr, curr] = diag_sum
-                    
+        if self.precision == "mixed":
+            return self._solve_mixed(np.asarray(power_vol, dtype=float)[None], k_vol)[0]
+        if self.backend in KRYLOV_BACKENDS and not self._use_spectral(k_vol):
+            return self._solve_iterative(power_vol, k_vol, x0)
         try:
-            T_flat = linalg.spsolve(G.tocsr(), P)
+            if self._use_spectral(k_vol):
+                return self._solve_spectral(power_vol, k_vol)
+            lu, P_amb = self.factorize(k_vol)
+            T_flat = lu.solve((power_vol.flatten() + P_amb).astype(self.dtype))
+            self.last_info = {"backend": "direct"}
             return T_flat.reshape((L, N, N))
-        except:
-            return np.full((L, N, N), 25.0)
+        except (np.linalg.LinAlgError, RuntimeError) as e:
+            # Singular stack (e.g. zero K): report ambient, but only for linear-solve failures
+            print(f"⚠️ Thermal solve failed ({e}); returning ambient field.")
+            return np.full((L, N, N), T_AMB)
+
+    def _use_spectral(self, k_vol):
+        if not self.spectral:
+            return False
+        from src.physics_engine_spectral import is_layer_uniform
+        return is_layer_uniform(k_vol)
+
+    def _solve_spectral(self, power_vol, k_vol, t_amb=T_AMB):
+        from src.physics_engine_spectral import SpectralThermalSolver, layer_values
+        spectral = SpectralThermalSolver(self.N, self.L, self.dx, self.dz, dtype=self.dtype, symmetric=self.symmetric)
+        self.last_info = {"backend": "spectral"}
+        return spectral.solve(power_vol, layer_values(k_vol), t_amb=t_amb)
+
+    def _iterative_system(self, k_vol):
+        """
+        (G, P_amb, preconditioner) of the Krylov backends: multigrid, the
+        layered spectral preconditioner or the Schwarz tiles; cached per stack.
+        """
+        from src.physics_engine_multigrid import GeometricMultigrid
+        from src.physics_engine_spectral import LayeredPreconditioner
+        matrix_free = self.backend in ("matrix_free", "layered", "dd")
+        K = conductivity_volume(k_vol, self.L, self.N, self.dtype)
+        if matrix_free:
+            G = StencilOperator(K, self.dx, self.dz, symmetric=self.symmetric)
+            P_amb = G.P_amb.ravel()
+        else:
+            G, P_amb = self._assembled(K)
+
+        suffix = {"iterative": ":mg", "matrix_free": ":mg-mf", "layered": ":layered", "dd": ":dd"}[self.backend]
+        key = FactorizationCache.make_key(K, self.dx, self.dz, self.symmetric) + suffix
+        entry = self.cache.get(key)
+        if entry is None:
+            if self.backend == "layered":
+                mg = LayeredPreconditioner(K, self.dx, self.dz, dtype=self.dtype, symmetric=self.symmetric)
+            elif self.backend == "dd":
+                mg = self.domain_decomposition().preconditioner(K)
+            else:
+                mg = GeometricMultigrid(K, self.dx, self.dz, A=G, matrix_free=matrix_free,
+                                        symmetric=self.symmetric)
+            self.cache.put(key, mg, P_amb)
+        else:
+            mg = entry[0]
+        return G, P_amb, mg
+
+    def _solve_iterative(self, power_vol, k_vol, x0=None):
+        from src.physics_engine_multigrid import krylov_solve
+        N, L = self.N, self.L
+        G, P_amb, mg = self._iterative_system(k_vol)
+        T_flat, info = krylov_solve(G, (power_vol.flatten() + P_amb).astype(self.dtype),
+                                    M=mg.as_preconditioner(),
+                                    x0=None if x0 is None else np.ravel(x0).astype(self.dtype),
+                                    tol=self.tol, maxiter=self.maxiter, method=self.krylov_method)
+        self.last_info = dict(info, backend=self.backend)
+        if not info["converged"]:
+            print(f"⚠️ Iterative solve stopped at residual {info['residual']:.2e} after {info['iterations']} iterations.")
+        return T_flat.reshape((L, N, N))
+
+    def _correction_solver(self, k_vol):
+        """
+        float32 solve of G d = r for (B, L*N*N) residual batches, on the path
+        the stack would take anyway (DCT, cached LU or multigrid-Krylov).
+        """
+        from src.physics_engine_multigrid import krylov_solve
+        shape = (self.L, self.N, self.N)
+        if self._use_spectral(k_vol):
+            # t_amb=0 turns the spectral solve into the plain linear solve G^-1 r
+            return lambda R: self._solve_spectral(R.reshape((-1,) + shape), k_vol, t_amb=0.0).reshape(R.shape), "spectral"
+        if self.backend in KRYLOV_BACKENDS:
+            G, _, mg = self._iterative_system(k_vol)
+            M = mg.as_preconditioner()
+            # float32 Krylov cannot go much below 1e-6; refinement supplies the rest
+            inner_tol = max(self.tol, 1e-5)
+            def solve_iterative(R):
+                return np.array([krylov_solve(G, r, M=M, tol=inner_tol, maxiter=self.maxiter,
+                                              method=self.krylov_method)[0] for r in R])
+            return solve_iterative, self.backend
+        lu, _ = self.factorize(k_vol)
+        return lambda R: lu.solve(np.asfortranarray(R.T)).T, "direct"
+
+    def _solve_mixed(self, power_vols, k_vol):
+        """
+        Iterative refinement: residuals in float64 (matrix-free, O(voxels)),
+        corrections from the float32 path, until the relative residual of
+        every map in the (B, L, N, N) batch is below tol.
+        """
+        G = StencilOperator(conductivity_volume(k_vol, self.L, self.N), self.dx, self.dz, symmetric=self.symmetric)
+        B = power_vols.shape[0]
+        b = power_vols.reshape((B, -1)) + G.P_amb.ravel()
+        b_norm = np.linalg.norm(b, axis=1)
+        correct, backend = self._correction_solver(k_vol)
+
+        T = np.zeros_like(b)
+        r = b
+        for step in range(1, self.refine_steps + 1):
+            T += correct(r.astype(np.float32))
+            r = b - np.array([G @ t for t in T])
+            residual = float((np.linalg.norm(r, axis=1) / b_norm).max())
+            if residual <= self.tol:
+                break
+        self.last_info = {"backend": backend, "precision": "mixed", "refinement_steps": step,
+                          "residual": residual, "converged": residual <= self.tol}
+        return T.reshape(power_vols.shape)
+
+    def solve_batch(self, power_vols, k_vol):
+        """
+        Solves many power maps that share one material stack.
+        power_vols: (B, L, N, N) Power Maps
+        k_vol: (L, N, N) Conductivity Map (or per-layer list)
+        Returns (B, L, N, N) temperatures from a single factorization and
+        one multi-column triangular solve.
+        """
+        N, L = self.N, self.L
+        power_vols = np.asarray(power_vols, dtype=float)
+        B = power_vols.shape[0]
+        if self.precision == "mixed":
+            return self._solve_mixed(power_vols, k_vol)
+        if self.backend in KRYLOV_BACKENDS and not self._use_spectral(k_vol):
+            iterations = 0
+            T = np.empty((B, L, N, N), dtype=self.dtype)
+            for b in range(B):
+                T[b] = self._solve_iterative(power_vols[b], k_vol)
+                iterations += self.last_info["iterations"]
+            self.last_info = dict(self.last_info, iterations=iterations)
+            return T
+        try:
+            if self._use_spectral(k_vol):
+                return self._solve_spectral(power_vols, k_vol)
+            lu, P_amb = self.factorize(k_vol)
+            rhs = (power_vols.reshape((B, -1)) + P_amb).astype(self.dtype)
+            T_flat = lu.solve(np.asfortranarray(rhs.T))
+            return T_flat.T.reshape((B, L, N, N))
+        except (np.linalg.LinAlgError, RuntimeError) as e:
+            print(f"⚠️ Batch thermal solve failed ({e}); returning ambient fields.")
+            return np.full((B, L, N, N), T_AMB)
+
+    def factorize(self, k_vol):
+        """Returns (LU, P_amb) for the stack, from the cache when the same K was seen before."""
+        K = conductivity_volume(k_vol, self.L, self.N, self.dtype)
+        key = FactorizationCache.make_key(K, self.dx, self.dz, self.symmetric)
+        entry = self.cache.get(key)
+        if entry is not None:
+            return entry
+        entry = self.artifacts.get_factors(key) if self.artifacts is not None else None
+        if entry is not None:
+            self.cache.put(key, *entry)
+            return entry
+        G, P_amb = self._assembled(K, key)
+        if self.symmetric:
+            lu = cholesky_factor(G)
+        else:
+            lu = linalg.splu(G.tocsc())
+        self.cache.put(key, lu, P_amb, nbytes=lu.nnz * (K.itemsize + 4))
+        if self.artifacts is not None:
+            self.artifacts.put_factors(key, lu, P_amb)
+        return lu, P_amb
+
+    def _assembled(self, K, key=None):
+        """(G, P_amb) of a conductivity volume, from the artifact store when one is attached."""
+        if self.artifacts is None:
+            return assemble_conductance(K, self.dx, self.dz, self.symmetric)
+        key = key or FactorizationCache.make_key(K, self.dx, self.dz, self.symmetric)
+        entry = self.artifacts.get_operator(key)
+        if entry is None:
+            entry = assemble_conductance(K, self.dx, self.dz, self.symmetric)
+            self.artifacts.put_operator(key, *entry)
+        return entry
+
+    def precision_report(self, power_vol, k_vol):
+        """
+        Error of this solver's precision against a float64 solve of the same case.
+        Returns max / RMS absolute error (C) and the max error relative to the peak rise.
+        """
+        reference = VoxelThermalSolver3D(self.N, self.L, self.dx, self.dz, cache=self.cache,
+                                         backend=self.backend, tol=min(self.tol, 1e-10),
+                                         maxiter=self.maxiter, spectral=self.spectral,
+                                         symmetric=self.symmetric)
+        T_ref = reference.solve(power_vol, k_vol)
+        T = self.solve(power_vol, k_vol)
+        err = np.abs(T.astype(float) - T_ref)
+        rise = max(float(T_ref.max()) - T_AMB, 1e-30)
+        return {"precision": self.precision, "max_abs_err": float(err.max()),
+                "rms_err": float(np.sqrt(np.mean(err**2))), "max_rel_err": float(err.max()) / rise}
 
 def generate_spatial_layout(a_tx, a_rx, a_dsp, dist_um):
     N = 64
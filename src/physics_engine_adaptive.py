@@ -0,0 +1,312 @@
+import numpy as np
+from scipy.sparse import coo_matrix, csr_matrix, diags, identity, kron, linalg
+from src.physics_engine import G_AMB_FACTOR, K_CONV, T_AMB
+from src.physics_engine_multigrid import GeometricMultigrid, krylov_solve
+
+class QuadMesh:
+    """
+    Lateral quadtree leaves over an (M, M) fine pixel raster. Every leaf is a
+    square column (r0, c0, s) in fine pixels and carries all L layers.
+    id_map[r, c] is the leaf covering fine pixel (r, c).
+    """
+    def __init__(self, r0, c0, s, M):
+        self.r0, self.c0, self.s = r0, c0, s
+        self.M = M
+        self.id_map = np.empty((M, M), dtype=np.int64)
+        ids = np.arange(len(s))
+        for w in np.unique(s):
+            # Paint every leaf of this size at once through a blocked view
+            sel = s == w
+            blocks = self.id_map.reshape((M // w, w, M // w, w))
+            blocks[r0[sel] // w, :, c0[sel] // w, :] = ids[sel][:, None, None]
+
+    @property
+    def n(self):
+        return len(self.s)
+
+    def adjacency(self, axis=None):
+        """
+        Unique lateral leaf pairs (a, b) and their shared edge length in fine
+        pixels; axis 1 keeps neighbours across columns (x), 0 across rows (y).
+        """
+        n = self.n
+        a, b = [], []
+        if axis in (None, 1):
+            a.append(self.id_map[:, :-1].ravel())
+            b.append(self.id_map[:, 1:].ravel())
+        if axis in (None, 0):
+            a.append(self.id_map[:-1, :].ravel())
+            b.append(self.id_map[1:, :].ravel())
+        a, b = np.concatenate(a), np.concatenate(b)
+        cross = a != b
+        pair, count = np.unique(a[cross] * n + b[cross], return_counts=True)
+        return pair // n, pair % n, count
+
+    def split(self, leaves):
+        """Returns a new mesh with the given leaves replaced by their 4 children."""
+        keep = np.ones(self.n, dtype=bool)
+        keep[leaves] = False
+        h = self.s[leaves] // 2
+        r = self.r0[leaves]
+        c = self.c0[leaves]
+        return QuadMesh(np.concatenate([self.r0[keep], r, r, r + h, r + h]),
+                        np.concatenate([self.c0[keep], c, c + h, c, c + h]),
+                        np.concatenate([self.s[keep], h, h, h, h]), self.M)
+
+    def refine_to(self, target):
+        """Splits leaves until none is larger than the (M, M) target size (fine pixels) anywhere under it."""
+        mesh = self
+        while True:
+            need = np.full(mesh.n, mesh.M)
+            np.minimum.at(need, mesh.id_map.ravel(), target.ravel())
+            leaves = np.flatnonzero(mesh.s > need)
+            if not len(leaves):
+                return mesh
+            mesh = mesh.split(leaves)
+
+    def balance(self):
+        """
+        2:1 balance: splits leaves until face neighbours differ by at most one
+        level, so every coarse face meets at most two fine ones.
+        """
+        mesh = self
+        while True:
+            a, b, _ = mesh.adjacency()
+            big = np.concatenate([a[mesh.s[a] > 2 * mesh.s[b]], b[mesh.s[b] > 2 * mesh.s[a]]])
+            if not len(big):
+                return mesh
+            mesh = mesh.split(np.unique(big))
+
+    def gradients(self, T):
+        """
+        Per-leaf lateral slopes (gr, gc) of T (..., n) in K per fine pixel: the
+        edge-weighted mean of the difference quotients to the face neighbours
+        along each axis. A die edge counts as a neighbour with zero slope
+        (adiabatic rim).
+        """
+        grads = []
+        centre = (self.r0 + self.s / 2, self.c0 + self.s / 2)
+        for axis, pos in ((0, centre[0]), (1, centre[1])):
+            a, b, count = self.adjacency(axis)
+            slope = (T[..., b] - T[..., a]) / (pos[b] - pos[a]) * count
+            start = pos - self.s / 2
+            rim = self.s * ((start == 0).astype(float) + (start + self.s == self.M))
+            weight = np.bincount(a, count, self.n) + np.bincount(b, count, self.n) + rim
+            total = np.zeros(T.shape)
+            np.add.at(total, (..., a), slope)
+            np.add.at(total, (..., b), slope)
+            grads.append(total / weight)
+        return grads
+
+class QuadtreeMultigrid(GeometricMultigrid):
+    """
+    V-cycle preconditioner for an SPD system on a QuadMesh (layer-major,
+    L x n_leaves). Level l merges the leaves inside each aligned 2^l pixel
+    block (larger leaves stay alone), coarse operators are Galerkin P^T A P
+    with piecewise-constant P, and the smoother is GeometricMultigrid's z-line
+    Jacobi. Same pre/post smoothing and R = P^T, so it can precondition CG.
+    """
+    def __init__(self, A, mesh, L, min_leaves=256, smooth_steps=1, omega=0.8):
+        self.smooth_steps = smooth_steps
+        self.omega = omega
+        self.levels = [self._make_level(csr_matrix(A), L, None)]
+        self.transfers = []
+
+        M = mesh.M
+        r0, c0, s = mesh.r0, mesh.c0, mesh.s
+        w = 1
+        while len(s) > min_leaves and w < M:
+            w *= 2
+            block = (r0 // w) * (M // w) + c0 // w
+            blocks, agg = np.unique(block, return_inverse=True)
+            if len(blocks) == len(s):
+                continue
+            P = kron(identity(L, format="csr"),
+                     csr_matrix((np.ones(len(s)), (np.arange(len(s)), agg)), shape=(len(s), len(blocks))),
+                     format="csr")
+            self.levels.append(self._make_level((P.T @ self.levels[-1]["A"] @ P).tocsr(), L, None))
+            self.transfers.append(P)
+            s_agg = np.zeros(len(blocks), dtype=s.dtype)
+            np.maximum.at(s_agg, agg, np.maximum(s, w))
+            r0, c0, s = (blocks // (M // w)) * w, (blocks % (M // w)) * w, s_agg
+
+        self.coarse_lu = linalg.splu(self.levels[-1]["A"].tocsc())
+
+    def vcycle(self, b, depth=0):
+        if depth == len(self.levels) - 1:
+            return self.coarse_lu.solve(b)
+        lvl = self.levels[depth]
+        P = self.transfers[depth]
+        x = self._smooth(lvl, np.zeros_like(b), b)
+        x = x + P @ self.vcycle(P.T @ (b - lvl["A"] @ x), depth + 1)
+        return self._smooth(lvl, x, b)
+
+class AdaptiveThermalSolver:
+    """
+    Finite-volume thermal solve on a quadtree that is refined only where it
+    matters: cells whose footprint contains a power-density edge (block
+    boundaries), then cells across which the die temperature still jumps by
+    more than temp_tol times the peak rise after a solve, split as many levels
+    as the jump asks for. The mesh is kept 2:1 balanced, so the two-point flux
+    across every coarse/fine face uses the shared edge and the normal centre
+    distance of cells one level apart. Same physics as VoxelThermalSolver3D
+    (per-layer K, ambient sink on the top layer) on a non-uniform lateral mesh.
+    die_um is the die edge, or (width, height) for a rectangular die: the
+    raster is still M x M, with pixels of width / M by height / M.
+    z_pitch_um is one layer thickness or one per layer (L,), as in stencil_links.
+    """
+    def __init__(self, die_um=2000.0, layers=5, z_pitch_um=20, base_size=16,
+                 power_tol=0.05, temp_tol=0.02, refine_passes=8, tol=1e-10):
+        self.die_um = die_um
+        self.L = layers
+        self.dz = z_pitch_um
+        self.base_size = base_size
+        self.power_tol = power_tol
+        self.temp_tol = temp_tol
+        self.refine_passes = refine_passes
+        self.tol = tol
+        self.last_info = {}
+
+    def build_mesh(self, power_grid):
+        """Refines from base_size cells down to single pixels at power-density edges."""
+        M = power_grid.shape[0]
+        if M % self.base_size:
+            raise ValueError(f"Power raster {M} must be a multiple of base_size {self.base_size}.")
+
+        # Max/min pyramids of the pixel power for aligned square footprints
+        pmax, pmin = {1: power_grid}, {1: power_grid}
+        s = 1
+        while s < M // self.base_size:
+            pmax[2 * s] = pmax[s].reshape(M // (2 * s), 2, M // (2 * s), 2).max(axis=(1, 3))
+            pmin[2 * s] = pmin[s].reshape(M // (2 * s), 2, M // (2 * s), 2).min(axis=(1, 3))
+            s *= 2
+        threshold = self.power_tol * max(power_grid.max(), 1e-30)
+
+        s = M // self.base_size
+        grid = np.arange(self.base_size) * s
+        r0, c0 = [a.ravel() for a in np.meshgrid(grid, grid, indexing="ij")]
+        leaves = ([], [], [])
+        while len(r0):
+            refine = (pmax[s][r0 // s, c0 // s] - pmin[s][r0 // s, c0 // s]) > threshold
+            if s == 1:
+                refine[:] = False
+            for out, arr in zip(leaves, (r0[~refine], c0[~refine], np.full((~refine).sum(), s))):
+                out.append(arr)
+            r, c = r0[refine], c0[refine]
+            s //= 2
+            r0 = np.concatenate([r, r, r + s, r + s])
+            c0 = np.concatenate([c, c + s, c, c + s])
+        return QuadMesh(*(np.concatenate(x) for x in leaves), M).balance()
+
+    def assemble(self, mesh, k_layers):
+        """Conductance matrix (L * n_leaves) and ambient injection on the leaf mesh."""
+        L, n = self.L, mesh.n
+        width, height = np.broadcast_to(np.asarray(self.die_um, dtype=float), (2,))
+        hx, hy = width / mesh.M, height / mesh.M # fine pixel pitch (um)
+        k = np.asarray(k_layers, dtype=float) * K_CONV
+        # Lateral link: k * dz * shared_edge / centre_distance, per direction
+        a, b, geo = [], [], []
+        for axis, edge, step in ((1, hy, hx), (0, hx, hy)):
+            a_ax, b_ax, count = mesh.adjacency(axis)
+            a.append(a_ax)
+            b.append(b_ax)
+            geo.append(count * edge / (0.5 * (mesh.s[a_ax] + mesh.s[b_ax]) * step))
+        a, b, geo = np.concatenate(a), np.concatenate(b), np.concatenate(geo)
+        area = mesh.s**2 * hx * hy
+        dz = np.broadcast_to(np.asarray(self.dz, dtype=float), (L,))
+        h = (dz[:-1] + dz[1:]) / 2 # centre distance of adjacent layers
+
+        rows, cols, vals = [], [], []
+        diag = np.zeros((L, n))
+        for l in range(L):
+            g_lat = k[l] * dz[l] * geo
+            rows += [l * n + a, l * n + b]
+            cols += [l * n + b, l * n + a]
+            vals += [-g_lat, -g_lat]
+            np.add.at(diag[l], a, g_lat)
+            np.add.at(diag[l], b, g_lat)
+            if l > 0:
+                g_vert = k[l] * area / h[l - 1]
+                rows.append(l * n + np.arange(n)); cols.append((l - 1) * n + np.arange(n)); vals.append(-g_vert)
+                diag[l] += g_vert
+            if l < L - 1:
+                g_vert = k[l] * area / h[l]
+                rows.append(l * n + np.arange(n)); cols.append((l + 1) * n + np.arange(n)); vals.append(-g_vert)
+                diag[l] += g_vert
+
+        g_amb = k[-1] * area / dz[-1] * G_AMB_FACTOR
+        diag[-1] += g_amb
+        P_amb = np.zeros((L, n))
+        P_amb[-1] = g_amb * T_AMB
+
+        idx = np.arange(L * n)
+        rows.append(idx); cols.append(idx); vals.append(diag.ravel())
+        G = coo_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))), shape=(L * n, L * n))
+        return G.tocsc(), P_amb.ravel()
+
+    def _solve_mesh(self, mesh, power_grid, k_layers, source_layer, x0=None):
+        G, P_amb = self.assemble(mesh, k_layers)
+        P = np.zeros((self.L, mesh.n))
+        P[source_layer] = np.bincount(mesh.id_map.ravel(), weights=power_grid.ravel(), minlength=mesh.n)
+        # Nodal K: G = diag(k per row) S with S symmetric, so CG runs on S
+        d = np.repeat(np.asarray(k_layers, dtype=float) * K_CONV, mesh.n)
+        S = diags(1.0 / d) @ G
+        S = ((S + S.T) / 2).tocsr() # drop the roundoff of the row scaling
+        M = QuadtreeMultigrid(S, mesh, self.L).as_preconditioner()
+        T, info = krylov_solve(S, (P.ravel() + P_amb) / d, M=M, x0=None if x0 is None else x0.ravel(),
+                               tol=self.tol, method="cg")
+        self.iterations += info["iterations"]
+        return T.reshape((self.L, mesh.n))
+
+    def solve(self, power_grid, k_layers, source_layer=0):
+        """
+        power_grid: (M, M) pixel power (mW) on source_layer, M a power of two
+        k_layers: per-layer K (W/mK)
+        Returns (mesh, T) with T shaped (L, n_leaves).
+        """
+        power_grid = np.asarray(power_grid, dtype=float)
+        self.iterations = 0
+        mesh = self.build_mesh(power_grid)
+        T = self._solve_mesh(mesh, power_grid, k_layers, source_layer)
+        passes = 0
+        for passes in range(1, self.refine_passes + 1):
+            threshold = self.temp_tol * max(T[source_layer].max() - T_AMB, 1e-12)
+            a, b, _ = mesh.adjacency()
+            jump = np.abs(T[source_layer, a] - T[source_layer, b])
+            hot = jump > threshold
+            # The jump scales with the cell size: halve the coarser side (both if equal)
+            # once per factor of two it is over
+            levels = np.ceil(np.log2(jump[hot] / threshold)).astype(np.int64)
+            a, b = a[hot], b[hot]
+            target = np.full(mesh.n, mesh.M)
+            for side, other in ((a, b), (b, a)):
+                coarse = mesh.s[side] >= mesh.s[other]
+                np.minimum.at(target, side[coarse], np.maximum(1, mesh.s[side[coarse]] >> levels[coarse]))
+            if not np.any(target < mesh.s):
+                break
+            fine = mesh.refine_to(target[mesh.id_map]).balance()
+            # Children start from their parent's temperature
+            x0 = T[:, mesh.id_map[fine.r0, fine.c0]]
+            mesh = fine
+            T = self._solve_mesh(mesh, power_grid, k_layers, source_layer, x0)
+
+        self.last_info = {"unknowns": self.L * mesh.n, "leaves": mesh.n, "passes": passes,
+                          "iterations": self.iterations, "uniform_unknowns": self.L * mesh.M**2}
+        return mesh, T
+
+    @staticmethod
+    def to_uniform(mesh, T, size=None):
+        """
+        Maps leaf temperatures to an (L, size, size) uniform grid: each leaf
+        is reconstructed linearly from its value and gradients() on the fine
+        raster, then block averaged when size < M.
+        """
+        gr, gc = mesh.gradients(T)
+        leaf = mesh.id_map
+        pix = np.arange(mesh.M) + 0.5
+        dr = pix[:, None] - (mesh.r0 + mesh.s / 2)[leaf]
+        dc = pix[None, :] - (mesh.c0 + mesh.s / 2)[leaf]
+        fine = T[:, leaf] + gr[:, leaf] * dr + gc[:, leaf] * dc
+        size = size or mesh.M
+        f = mesh.M // size
+        return fine.reshape((T.shape[0], size, f, size, f)).mean(axis=(2, 4))
@@ -0,0 +1,137 @@
+import numpy as np
+from scipy.sparse import linalg
+from src.physics_engine import (K_CONV, KRYLOV_BACKENDS, T_AMB, VoxelThermalSolver3D, _link_slices,
+                                ambient_conductance, conductivity_volume, link_resistances, stencil_links)
+from src.physics_engine_multigrid import krylov_solve
+
+class MaskMean:
+    """Mean temperature over a boolean (N, N) mask on one layer (e.g. the RX block)."""
+    def __init__(self, mask, layer=0):
+        self.mask = np.asarray(mask, dtype=bool)
+        self.layer = layer
+
+    def __call__(self, T):
+        J = T[self.layer][self.mask].mean()
+        dJ = np.zeros_like(T)
+        dJ[self.layer][self.mask] = 1.0 / self.mask.sum()
+        return J, dJ
+
+class PeakTemperature:
+    """Peak Tj on one layer (or the whole volume); the gradient is taken at the argmax voxel."""
+    def __init__(self, layer=0):
+        self.layer = layer
+
+    def __call__(self, T):
+        region = T if self.layer is None else T[self.layer]
+        idx = np.unravel_index(np.argmax(region), region.shape)
+        dJ = np.zeros_like(T)
+        if self.layer is None:
+            dJ[idx] = 1.0
+        else:
+            dJ[self.layer][idx] = 1.0
+        return region[idx], dJ
+
+class SoftMaxTemperature:
+    """
+    Smooth hotspot metric (1/beta) * log(sum exp(beta * T)) on one layer.
+    Approaches the peak as beta grows, but unlike it spreads the gradient over
+    every near-peak voxel.
+    """
+    def __init__(self, beta=1.0, layer=0):
+        self.beta = beta
+        self.layer = layer
+
+    def __call__(self, T):
+        region = T if self.layer is None else T[self.layer]
+        z = self.beta * (region - region.max())
+        w = np.exp(z)
+        J = region.max() + np.log(w.sum()) / self.beta
+        dJ = np.zeros_like(T)
+        if self.layer is None:
+            dJ[:] = w / w.sum()
+        else:
+            dJ[self.layer] = w / w.sum()
+        return J, dJ
+
+class AdjointThermalSolver:
+    """
+    Gradients of a scalar objective J(T) with respect to every power voxel and
+    every conductivity (per voxel and per layer) at the cost of one extra solve.
+    Forward: G(K) T = P + P_amb(K). Adjoint: G^T lam = dJ/dT, then
+    dJ/dP = lam and dJ/dK = -lam^T d(G T - P_amb)/dK, taken link by link.
+    The direct backend reuses the cached LU (transpose substitution); the
+    iterative ones run a Krylov solve on G^T with the cached multigrid.
+    """
+    def __init__(self, solver=None):
+        self.solver = solver or VoxelThermalSolver3D()
+
+    def gradient(self, power_vol, k_vol, objective):
+        """
+        power_vol: (L, N, N) Power Map; k_vol: per-layer list or (L, N, N) K (W/mK)
+        objective: callable T -> (J, dJ/dT), e.g. MaskMean / PeakTemperature
+        Returns (J, grads) with grads "T", "dP" (C/mW), "dK" (C per W/mK, per voxel)
+        and "dk_layers" (the same summed per layer).
+        """
+        s = self.solver
+        shape = (s.L, s.N, s.N)
+        P = np.asarray(power_vol, dtype=float).ravel()
+        K = conductivity_volume(k_vol, s.L, s.N)
+
+        T, lam = self._solve_pair(P, k_vol, K, objective)
+        J, _ = objective(T.reshape(shape))
+        dK = conductance_gradient(K, s.dx, s.dz, T.reshape(shape), lam.reshape(shape), s.symmetric) * K_CONV
+        return J, {"T": T.reshape(shape), "dP": lam.reshape(shape), "dK": dK,
+                   "dk_layers": dK.sum(axis=(1, 2))}
+
+    def _solve_pair(self, P, k_vol, K, objective):
+        s = self.solver
+        shape = (s.L, s.N, s.N)
+        if s.backend in KRYLOV_BACKENDS:
+            G, P_amb, mg = s._iterative_system(k_vol)
+            M = mg.as_preconditioner()
+            method = s.krylov_method
+            T, _ = krylov_solve(G, P + P_amb, M=M, tol=s.tol, maxiter=s.maxiter, method=method)
+            _, dJ = objective(T.reshape(shape))
+            if s.symmetric:
+                # G^T == G: the adjoint is one more forward solve
+                lam, _ = krylov_solve(G, dJ.ravel(), M=M, tol=s.tol, maxiter=s.maxiter, method=method)
+                return T, lam
+            # Nodal K: G = D G_1 with G_1 symmetric, so G^T = D^-1 G D and the
+            # forward preconditioner carries over through the same similarity
+            d = K.ravel()
+            M_T = linalg.LinearOperator(G.shape, matvec=lambda x: M @ (d * x) / d, dtype=float)
+            lam, _ = krylov_solve(G.T, dJ.ravel(), M=M_T, tol=s.tol, maxiter=s.maxiter)
+            return T, lam
+
+        lu, P_amb = s.factorize(k_vol)
+        T = lu.solve(P + P_amb)
+        _, dJ = objective(T.reshape(shape))
+        lam = lu.solve(dJ.ravel().astype(T.dtype), trans="T")
+        return T, lam
+
+def conductance_gradient(K, dx, dz, T, lam, symmetric=False):
+    """
+    dJ/dK (internal units) = -sum over rows i of lam_i * d(G T - P_amb)_i / dK.
+    Nodal K: a link's conductance seen from row i depends only on K_i (linearly),
+    and so does the ambient sink, so every term is its row flux divided by K_i.
+    Symmetric: g = 1 / (r_lo + r_hi) with half-cell resistances r ~ 1/K, so
+    dg/dK_i = g^2 r_i / K_i, and each link feeds both of its cells.
+    """
+    if symmetric:
+        dK = np.zeros_like(T)
+        for axis, r_lo, r_hi in link_resistances(K, dx, dz):
+            lo, hi = _link_slices(axis)
+            g = 1.0 / (r_lo + r_hi)
+            w = -(lam[lo] - lam[hi]) * (T[lo] - T[hi]) * g**2
+            dK[lo] += w * r_lo / K[lo]
+            dK[hi] += w * r_hi / K[hi]
+        dK[-1] -= lam[-1] * ambient_conductance(K, dx, dz) * (T[-1] - T_AMB) / K[-1]
+        return dK
+
+    flux = np.zeros_like(T)
+    for axis, g_lo, g_hi in stencil_links(K, dx, dz):
+        lo, hi = _link_slices(axis)
+        flux[lo] += g_lo * (T[lo] - T[hi])
+        flux[hi] += g_hi * (T[hi] - T[lo])
+    flux[-1] += ambient_conductance(K, dx, dz) * (T[-1] - T_AMB)
+    return -lam * flux / K
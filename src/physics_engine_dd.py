@@ -0,0 +1,230 @@
+import multiprocessing as mp
+import weakref
+from collections import OrderedDict
+from multiprocessing import shared_memory
+import numpy as np
+from scipy.sparse import linalg
+from src.physics_engine import FactorizationCache, StencilOperator, assemble_conductance, conductivity_volume
+from src.physics_engine_multigrid import krylov_solve
+
+class DomainDecompositionSolver:
+    """
+    Overlapping Schwarz solve of the voxel thermal problem on lateral tiles.
+    The (L, N, N) volume is cut into tiles (all layers, a lateral window plus
+    `overlap` halo cells). Worker processes factor their tiles' local
+    Dirichlet problems and apply them every iteration. This is a restricted
+    additive Schwarz preconditioner for a global BiCGSTAB on the matrix-free
+    operator. K, residual and correction live in shared memory, so only short
+    control messages cross process boundaries.
+
+    The workers and buffers are started on the first solve and kept until
+    close(); each worker keeps the tile factors of the last max_stacks
+    stacks, so repeated solves on one stack factor nothing. Also reachable
+    as VoxelThermalSolver3D(backend="dd").
+
+    Tiles are chosen so one tile (with halo) holds at most max_tile_voxels.
+    """
+    def __init__(self, size=64, layers=5, pitch_um=31.25, z_pitch_um=20, workers=None,
+                 max_tile_voxels=200000, overlap=4, tol=1e-8, maxiter=200, symmetric=False, max_stacks=2):
+        self.N = size
+        self.L = layers
+        self.dx = pitch_um
+        self.dz = z_pitch_um
+        self.workers = workers or mp.cpu_count()
+        self.max_tile_voxels = max_tile_voxels
+        self.overlap = overlap
+        self.tol = tol
+        self.maxiter = maxiter
+        self.symmetric = symmetric
+        self.max_stacks = max_stacks
+        self._pool = None
+        self.last_info = {}
+
+    def tiling(self):
+        """Returns [(own, ext)] lateral windows as ((r0, r1), (c0, c1)) pairs."""
+        N, L, ov = self.N, self.L, self.overlap
+        # Tiles narrower than the overlap stop paying off, so that caps the split
+        n_max = max(1, N // max(ov, 1))
+        n = 1
+        while L * (-(-N // n) + 2 * ov) ** 2 > self.max_tile_voxels and n < n_max:
+            n += 1
+        n = max(n, int(np.ceil(np.sqrt(self.workers))) if self.workers > 1 else 1)
+        edges = np.linspace(0, N, n + 1).astype(int)
+        tiles = []
+        for r0, r1 in zip(edges[:-1], edges[1:]):
+            for c0, c1 in zip(edges[:-1], edges[1:]):
+                ext = ((max(0, r0 - ov), min(N, r1 + ov)), (max(0, c0 - ov), min(N, c1 + ov)))
+                tiles.append((((r0, r1), (c0, c1)), ext))
+        return tiles
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = SchwarzPool((self.L, self.N, self.N), self.dx, self.dz, self.tiling(), self.workers,
+                                     self.symmetric, self.max_stacks)
+        return self._pool
+
+    def preconditioner(self, K):
+        """SchwarzPreconditioner of a (L, N, N) conductivity volume in mW/(um*K)."""
+        key = FactorizationCache.make_key(K, self.dx, self.dz, self.symmetric)
+        return SchwarzPreconditioner(self, key, K)
+
+    def solve(self, power_vol, k_vol, x0=None):
+        """
+        power_vol: (L, N, N) Power Map
+        k_vol: (L, N, N) Conductivity Map (or per-layer list)
+        x0: optional (L, N, N) initial guess
+        """
+        shape = (self.L, self.N, self.N)
+        K = conductivity_volume(k_vol, self.L, self.N)
+        G = StencilOperator(K, self.dx, self.dz, symmetric=self.symmetric)
+        b = np.asarray(power_vol, dtype=float).ravel() + G.P_amb.ravel()
+        M = self.preconditioner(K).as_preconditioner()
+        T, info = krylov_solve(G, b, M=M, x0=None if x0 is None else np.ravel(x0), tol=self.tol,
+                               maxiter=self.maxiter)
+        self.last_info = dict(info, tiles=len(self.pool.tiles), workers=len(self.pool.conns))
+        return T.reshape(shape)
+
+    def close(self):
+        """Stops the workers and frees the shared buffers and tile factors."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+
+class SchwarzPool:
+    """
+    Worker processes for one tiling: shared K / residual / correction
+    buffers, and per worker the tile factors of up to max_stacks stacks
+    (least recently used dropped first), keyed like FactorizationCache.
+    """
+    def __init__(self, shape, dx, dz, tiles, workers, symmetric=False, max_stacks=2):
+        self.shape = shape
+        self.tiles = tiles
+        self.max_stacks = max_stacks
+        self.resident = OrderedDict() # stack keys the workers hold factors for
+        self.shms = [shared_memory.SharedMemory(create=True, size=int(np.prod(shape)) * 8) for _ in range(3)]
+        self.K, self.r, self.z = [np.ndarray(shape, dtype=float, buffer=shm.buf) for shm in self.shms]
+        self.conns, self.procs = [], []
+        n_workers = min(workers, len(tiles))
+        # Stops the workers even if close() is never called
+        self._finalizer = weakref.finalize(self, _shutdown, self.conns, self.procs, self.shms)
+        for w in range(n_workers):
+            parent, child = mp.Pipe()
+            p = mp.Process(target=_tile_worker, daemon=True,
+                           args=(child, [shm.name for shm in self.shms], shape, dx, dz, symmetric,
+                                 tiles[w::n_workers]))
+            p.start()
+            self.procs.append(p)
+            self.conns.append(parent)
+
+    def _broadcast(self, message):
+        for conn in self.conns:
+            conn.send(message)
+        errors = [reply for reply in (conn.recv() for conn in self.conns) if reply is not True]
+        if errors:
+            raise RuntimeError(f"Tile worker failed: {errors[0]}")
+
+    def factor(self, key, K):
+        """Makes the workers hold the tile factors of stack K (no-op when already resident)."""
+        if key in self.resident:
+            self.resident.move_to_end(key)
+            return
+        evict = self.resident.popitem(last=False)[0] if len(self.resident) >= self.max_stacks else None
+        self.K[:] = K
+        self._broadcast(("factor", key, evict))
+        self.resident[key] = True
+
+    def apply(self, key, r):
+        self.r[:] = r.reshape(self.shape)
+        self._broadcast(("apply", key))
+        return self.z.ravel().copy()
+
+    def close(self):
+        self.resident.clear()
+        # Views of the shared buffers must not outlive their unmapping
+        self.K = self.r = self.z = None
+        self._finalizer()
+
+class SchwarzPreconditioner:
+    """
+    Restricted additive Schwarz application of one stack through the pool of
+    a DomainDecompositionSolver (restarted there if it was closed meanwhile).
+    """
+    def __init__(self, owner, key, K):
+        self.owner = owner
+        self.key = key
+        self.K = K # kept to refactor if the workers have dropped this stack
+        owner.pool.factor(key, K)
+
+    @property
+    def nbytes(self):
+        return self.K.nbytes
+
+    def apply(self, r):
+        pool = self.owner.pool
+        pool.factor(self.key, self.K)
+        return pool.apply(self.key, r)
+
+    def as_preconditioner(self):
+        n = self.K.size
+        return linalg.LinearOperator((n, n), matvec=self.apply, dtype=float)
+
+def _shutdown(conns, procs, shms):
+    for conn in conns:
+        try:
+            conn.send(None)
+        except (BrokenPipeError, EOFError, OSError):
+            pass # worker already gone
+    for p in procs:
+        p.join(timeout=5)
+        if p.is_alive():
+            p.terminate()
+    for shm in shms:
+        shm.close()
+        shm.unlink()
+
+def _factor_tiles(K, dx, dz, symmetric, tiles):
+    L, N, _ = K.shape
+    local = []
+    for (own_r, own_c), (ext_r, ext_c) in tiles:
+        # Assemble on the tile plus a one-cell halo, then keep only the tile rows/cols:
+        # this is exactly the global submatrix (zero Dirichlet on the tile boundary)
+        hr = (max(0, ext_r[0] - 1), min(N, ext_r[1] + 1))
+        hc = (max(0, ext_c[0] - 1), min(N, ext_c[1] + 1))
+        G_halo = assemble_conductance(np.ascontiguousarray(K[:, hr[0]:hr[1], hc[0]:hc[1]]), dx, dz, symmetric)[0]
+        idx = np.arange(L * (hr[1] - hr[0]) * (hc[1] - hc[0])).reshape((L, hr[1] - hr[0], hc[1] - hc[0]))
+        keep = idx[:, ext_r[0] - hr[0]:ext_r[1] - hr[0], ext_c[0] - hc[0]:ext_c[1] - hc[0]].ravel()
+        lu = linalg.splu(G_halo[keep][:, keep].tocsc())
+        ext = (slice(None), slice(*ext_r), slice(*ext_c))
+        own = (slice(None), slice(*own_r), slice(*own_c))
+        own_local = (slice(None), slice(own_r[0] - ext_r[0], own_r[1] - ext_r[0]),
+                     slice(own_c[0] - ext_c[0], own_c[1] - ext_c[0]))
+        local.append((lu, ext, own, own_local, (L, ext_r[1] - ext_r[0], ext_c[1] - ext_c[0])))
+    return local
+
+def _tile_worker(conn, shm_names, shape, dx, dz, symmetric, tiles):
+    shms = [shared_memory.SharedMemory(name=name) for name in shm_names]
+    K, r, z = [np.ndarray(shape, dtype=float, buffer=shm.buf) for shm in shms]
+    stacks = {} # stack key -> factored tiles
+
+    message = conn.recv()
+    while message is not None:
+        try:
+            if message[0] == "factor":
+                _, key, evict = message
+                stacks.pop(evict, None)
+                if key not in stacks:
+                    stacks[key] = _factor_tiles(K, dx, dz, symmetric, tiles)
+            else:
+                for lu, ext, own, own_local, ext_shape in stacks[message[1]]:
+                    # Restricted update: each tile writes only the cells it owns
+                    z[own] = lu.solve(r[ext].ravel()).reshape(ext_shape)[own_local]
+            conn.send(True)
+        except (RuntimeError, KeyError, np.linalg.LinAlgError) as e:
+            conn.send(repr(e))
+        message = conn.recv()
+
+    del K, r, z
+    stacks.clear()
+    for shm in shms:
+        shm.close()
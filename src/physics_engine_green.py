@@ -0,0 +1,144 @@
+import hashlib
+import os
+import numpy as np
+from scipy import fft
+from src.physics_engine import T_AMB, VoxelThermalSolver3D
+from src.physics_engine_spectral import is_layer_uniform, layer_values
+
+class ThermalKernel:
+    """
+    Unit-impulse response of one material stack.
+    H[l] is the response of layer l to power injected in `source_layer`,
+    expressed per DCT-II mode. Multiplying in the DCT domain is the FFT
+    convolution of the mirror-image (adiabatic edge) extension of the power map
+    with the free kernel, so die edges are handled exactly.
+    """
+    def __init__(self, H, source_layer=0):
+        self.H = H
+        self.source_layer = source_layer
+
+    def evaluate(self, power_map, layers=None):
+        """
+        power_map: (N, N) or (B, N, N) power on the source layer (mW)
+        Returns temperatures (L, N, N) / (B, L, N, N), or only `layers` if given.
+        """
+        H = self.H if layers is None else self.H[layers]
+        p_hat = fft.dctn(np.asarray(power_map, dtype=float), type=2, axes=(-2, -1), norm="ortho")
+        T_hat = p_hat[..., None, :, :] * H if np.ndim(H) == 3 else p_hat * H
+        return T_AMB + fft.idctn(T_hat, type=2, axes=(-2, -1), norm="ortho")
+
+    def spatial_kernel(self, layer=0):
+        """Free-space impulse response on the 2N x 2N image torus, centred at (0, 0)."""
+        return np.real(fft.ifft2(self._torus_transfer(self.H[layer])))
+
+    @staticmethod
+    def _torus_transfer(H):
+        """(..., 2N, 2N) FFT of the free kernel from the DCT-domain H (..., N, N)."""
+        N = H.shape[-1]
+        # DCT-II mode k <-> FFT bins k and 2N-k of the mirrored sequence; bin N is empty
+        H_ext = np.zeros(H.shape[:-2] + (2 * N, 2 * N))
+        H_ext[..., :N, :N] = H
+        H_ext[..., N + 1:, :N] = H[..., :0:-1, :]
+        H_ext[..., :N, N + 1:] = H[..., :, :0:-1]
+        H_ext[..., N + 1:, N + 1:] = H[..., :0:-1, :0:-1]
+        return H_ext
+
+    def stamp_response(self, stamp, layers=None):
+        """
+        Torus response (..., 2N, 2N) of a power stamp (n, w) with its top-left
+        cell at (0, 0); superpose() places it at any offset on the die.
+        """
+        H = self.H if layers is None else self.H[layers]
+        N = H.shape[-1]
+        padded = np.zeros((2 * N, 2 * N))
+        padded[:stamp.shape[0], :stamp.shape[1]] = stamp
+        return np.real(fft.ifft2(fft.fft2(padded) * self._torus_transfer(H)))
+
+    def superpose(self, placements):
+        """
+        Temperature rise (..., N, N) of stamps on the die. placements are
+        (response, row, col) with response from stamp_response. Each one adds
+        its response and its three mirror images across the adiabatic edges,
+        read off the torus, so only the first response per master costs an FFT.
+        """
+        rise = None
+        for R, r, c in placements:
+            two_n = R.shape[-1]
+            n = np.arange(two_n // 2)
+            rows = ((n - r) % two_n, (-n - r - 1) % two_n)
+            cols = ((n - c) % two_n, (-n - c - 1) % two_n)
+            for ri in rows:
+                for ci in cols:
+                    image = R[..., ri[:, None], ci[None, :]]
+                    rise = image if rise is None else rise + image
+        return rise
+
+    def evaluate_instances(self, residual_map, placed, layers=None):
+        """
+        Same field as evaluate() on the full power map, for a design split by
+        InstanceTable.stamps into a residual raster and placed instances.
+        Every distinct master stamp is transformed once, however many lanes
+        share it.
+        """
+        responses = {}
+        placements = []
+        for key, stamp, r, c in placed:
+            if key not in responses:
+                responses[key] = self.stamp_response(stamp, layers)
+            placements.append((responses[key], r, c))
+        T = self.evaluate(residual_map, layers)
+        return T + self.superpose(placements) if placements else T
+
+class ThermalKernelLibrary:
+    """
+    Computes, persists and serves ThermalKernels per stack.
+    Each kernel costs one VoxelThermalSolver3D solve (a corner impulse); after
+    that any power map on the stack is a DCT multiply (exact, no FNO trust zone).
+    Only layer-uniform stacks are translation invariant, others are rejected.
+    """
+    def __init__(self, size=64, layers=5, pitch_um=31.25, z_pitch_um=20, cache_dir="data/kernels"):
+        self.solver = VoxelThermalSolver3D(size=size, layers=layers, pitch_um=pitch_um, z_pitch_um=z_pitch_um)
+        self.cache_dir = cache_dir
+        self.kernels = {}
+
+    def _key(self, k_layers, source_layer):
+        s = self.solver
+        dz = tuple(np.ravel(s.dz).tolist()) if np.ndim(s.dz) else float(s.dz)
+        desc = repr((tuple(float(k) for k in k_layers), s.N, s.L, float(s.dx), dz, source_layer))
+        return hashlib.sha1(desc.encode()).hexdigest()
+
+    def kernel(self, k_vol, source_layer=0):
+        if not is_layer_uniform(k_vol):
+            raise ValueError("Kernel library needs a layer-uniform stack (one K per layer).")
+        k_layers = layer_values(k_vol)
+        key = self._key(k_layers, source_layer)
+        if key in self.kernels:
+            return self.kernels[key]
+
+        path = os.path.join(self.cache_dir, f"{key}.npz") if self.cache_dir else None
+        if path and os.path.exists(path):
+            kernel = ThermalKernel(np.load(path)["H"], source_layer)
+        else:
+            kernel = ThermalKernel(self._compute_transfer(k_layers, source_layer), source_layer)
+            if path:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                np.savez(path, H=kernel.H, k_layers=k_layers)
+        self.kernels[key] = kernel
+        return kernel
+
+    def _compute_transfer(self, k_layers, source_layer):
+        N, L = self.solver.N, self.solver.L
+        # Unit impulse in the corner cell: its DCT-II is non-zero in every mode
+        impulse = np.zeros((N, N))
+        impulse[0, 0] = 1.0
+        p_vol = np.zeros((L, N, N))
+        p_vol[source_layer] = impulse
+        response = self.solver.solve(p_vol, k_layers) - T_AMB
+
+        impulse_hat = fft.dctn(impulse, type=2, norm="ortho")
+        response_hat = fft.dctn(response, type=2, axes=(-2, -1), norm="ortho")
+        return response_hat / impulse_hat
+
+    def evaluate(self, power_map, k_vol, layers=None, source_layer=0):
+        """Temperature for power on `source_layer` of the given stack."""
+        return self.kernel(k_vol, source_layer).evaluate(power_map, layers)
@@ -0,0 +1,127 @@
+import numpy as np
+from scipy import linalg as dense
+from scipy.sparse import diags, linalg
+from src.physics_engine import T_AMB, conductivity_volume
+from src.power_schedule import PowerSchedule
+
+class ModalThermalModel:
+    """
+    Closed-form transient response of one stack to piecewise-constant power.
+    With u = T - T_amb the RC network is C u' = P - G u. Scaling rows by the
+    nodal K makes it symmetric: S = G / K and M = C / K, so the modes of
+    S phi = lambda M phi (computed once) are M-orthonormal and each decays on
+    its own: over a segment of constant power
+    q(t) = e^(-lambda tau) q0 + (1 - e^(-lambda tau)) / lambda * Phi^T P / K.
+    No time stepping: any output times, any number of schedules.
+
+    Up to max_dense voxels the full eigenbasis is used and the response is
+    exact. Larger stacks (or an explicit `modes`) keep the slowest modes
+    (shift-invert eigsh) and add the truncated fast modes quasi-statically
+    (one LU solve per distinct power map): steady states stay exact, and the
+    truncation error dies out within a few cutoff_ms of each power edge.
+    """
+    def __init__(self, solver, k_layers, cv_layers, modes=None, max_dense=4096):
+        G = solver._build_conductance_matrix(k_layers).astype(float)
+        K = conductivity_volume(k_layers[:solver.L], solver.L, solver.N).ravel()
+        M = solver._capacitance(cv_layers) / K
+        S = diags(1.0 / K) @ G
+        if abs(S - S.T).max() > 1e-9 * abs(S).max():
+            raise ValueError("Modal model needs a conductance matrix that is symmetric after K scaling.")
+        S = (S + S.T) / 2
+        n = G.shape[0]
+        self.truncated = modes is not None and modes < n or modes is None and n > max_dense
+        if self.truncated:
+            lam, phi = linalg.eigsh(S.tocsc(), k=min(modes or 256, n - 2), M=diags(M).tocsc(), sigma=0, which="LM")
+            order = np.argsort(lam)
+            lam, phi = lam[order], phi[:, order]
+            self.lu = linalg.splu(G.tocsc())
+        else:
+            # M is diagonal: the symmetric standard problem of M^-1/2 S M^-1/2
+            m = 1.0 / np.sqrt(M)
+            lam, w = dense.eigh(m[:, None] * S.toarray() * m[None, :])
+            phi = m[:, None] * w
+            self.lu = None
+        self.lam, self.phi = lam, phi # lambda in 1/s, phi M-orthonormal
+        self.K = K
+        self.shape = (solver.L, solver.N, solver.N)
+        self.cutoff_ms = 1e3 / lam[-1] # slowest truncated mode decays faster than this
+
+    def project(self, maps):
+        """
+        Modal forcing (J, r) and static correction (J, n) of the power maps
+        (J, L, N, N): the part of G^-1 P that the kept modes do not carry.
+        """
+        P = np.asarray(maps, dtype=float).reshape(len(maps), -1)
+        f = (P / self.K) @ self.phi
+        if self.lu is None:
+            return f, np.zeros_like(P)
+        return f, self.lu.solve(P.T).T - (f / self.lam) @ self.phi.T
+
+    def modal_states(self, t_starts_ms, forcing, times_ms):
+        """
+        Modal coordinates (n_t, r) at times_ms and the index of the active
+        segment per time (-1 before the first). Power is zero before
+        t_starts_ms[0] and forcing[s] from t_starts_ms[s] on.
+        """
+        lam = self.lam
+        t_seg = np.asarray(t_starts_ms, dtype=float) * 1e-3
+        times = np.asarray(times_ms, dtype=float) * 1e-3
+        # Each segment relaxes from its start state towards its own steady state q_ss
+        q_ss = forcing / lam
+        q_start = np.zeros((len(t_seg), len(lam)))
+        for s in range(1, len(t_seg)):
+            e = np.exp(-lam * (t_seg[s] - t_seg[s - 1]))
+            q_start[s] = q_ss[s - 1] + e * (q_start[s - 1] - q_ss[s - 1])
+        seg = np.searchsorted(t_seg, times, side="right") - 1
+        active = seg >= 0
+        q = np.zeros((len(times), len(lam)))
+        s = seg[active]
+        q[active] = q_ss[s] + np.exp(-lam * (times[active] - t_seg[s])[:, None]) * (q_start - q_ss)[s]
+        return q, seg
+
+    def evaluate(self, segments, times_ms):
+        """
+        segments: PowerSchedule, or [(t_start_ms, power_vol (L, N, N))] each
+        held until the next. Returns temperatures (n_t, L, N, N) at times_ms.
+        """
+        if isinstance(segments, PowerSchedule):
+            # Distinct power vectors are projected once, however many segments reuse them
+            t_starts, index, vectors = segments.compile()
+            f, static = self.project(vectors)
+            f, static = f[index], static[index]
+        else:
+            t_starts = [t for t, _ in segments]
+            f, static = self.project([p for _, p in segments])
+        q, seg = self.modal_states(t_starts, f, times_ms)
+        u = q @ self.phi.T + np.vstack([static, np.zeros(static.shape[1])])[seg]
+        return T_AMB + u.reshape((len(u),) + self.shape)
+
+    def sweep(self, maps, schedules, times_ms, probes=None):
+        """
+        Many schedules over one set of power maps (J, L, N, N).
+        schedules: [(t_starts_ms (S,), weights (S, J) or map index (S,))].
+        probes: {name: (L, N, N) bool mask}, reduced to the mean temperature.
+        Returns {"peak": (B, n_t) peak die (layer 0) temperature, name: (B, n_t)}.
+        Only the die rows and probe means of the basis are expanded per schedule.
+        """
+        f_maps, static_maps = self.project(maps)
+        probes = probes or {}
+        n_die = self.shape[1] * self.shape[2]
+        weights_probe = np.array([np.asarray(m, dtype=float).ravel() / np.sum(m)
+                                  for m in probes.values()]).reshape(len(probes), len(self.K))
+        # Observation rows: die voxels, then one row per probe
+        obs_phi = np.vstack([self.phi[:n_die], weights_probe @ self.phi])
+        obs_static = np.hstack([static_maps[:, :n_die], static_maps @ weights_probe.T])
+
+        out = {name: np.zeros((len(schedules), len(times_ms))) for name in ["peak"] + list(probes)}
+        for b, (t_starts, weights) in enumerate(schedules):
+            weights = np.asarray(weights)
+            if weights.ndim == 1:
+                weights = np.eye(len(maps))[weights]
+            q, seg = self.modal_states(t_starts, weights @ f_maps, times_ms)
+            static = np.vstack([weights @ obs_static, np.zeros(obs_static.shape[1])])
+            u = T_AMB + q @ obs_phi.T + static[seg]
+            out["peak"][b] = u[:, :n_die].max(axis=1)
+            for i, name in enumerate(probes):
+                out[name][b] = u[:, n_die + i]
+        return out
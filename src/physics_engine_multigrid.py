@@ -0,0 +1,172 @@
+import numpy as np
+from scipy.sparse import csr_matrix, diags, linalg
+from src.physics_engine import StencilOperator, assemble_conductance
+
+class GeometricMultigrid:
+    """
+    V-cycle preconditioner for the (L, N, N) voxel conductance operator.
+    Coarsens laterally only (2x2 columns -> 1) and keeps every layer, since the
+    stack is thin and the vertical links dominate once dx grows.
+    Smoother is z-line Jacobi (one tridiagonal solve per column), coarse levels
+    are rediscretized from the averaged K, coarsest level is solved directly.
+    matrix_free=True applies every non-coarsest level with a StencilOperator
+    (A may then be the caller's fine-level StencilOperator).
+    symmetric rediscretizes the coarse levels with harmonic-mean links; the
+    V-cycle is then symmetric too (same pre/post smoothing, R = P^T), so it
+    can precondition CG.
+    """
+    def __init__(self, K, dx, dz, A=None, shift=None, min_size=8, smooth_steps=2, omega=0.8,
+                 matrix_free=False, symmetric=False):
+        self.smooth_steps = smooth_steps
+        self.omega = omega
+        self.levels = []
+
+        L, N, _ = K.shape
+        if shift is not None:
+            shift = np.broadcast_to(shift, K.shape)
+
+        while True:
+            coarsest = N <= min_size or N % 2 == 1
+            if coarsest and isinstance(A, StencilOperator):
+                A = None # The coarsest level is factored, so it needs the assembled matrix
+            if A is None:
+                if matrix_free and not coarsest:
+                    A = StencilOperator(K, dx, dz, shift, symmetric)
+                else:
+                    A = assemble_conductance(K, dx, dz, symmetric)[0]
+                    if shift is not None:
+                        A = A + diags(shift.ravel().astype(K.dtype))
+            if isinstance(A, StencilOperator):
+                self.levels.append(self._make_stencil_level(A, L, N))
+            else:
+                self.levels.append(self._make_level(A, L, N))
+            if coarsest:
+                break
+            K = _coarsen(K, np.mean)
+            dx, N, A = dx * 2, N // 2, None
+            if shift is not None:
+                # Capacitive shift scales with cell volume -> sum over the 2x2 children
+                shift = _coarsen(shift, np.sum)
+
+        self.coarse_lu = linalg.splu(self.levels[-1]["A"].tocsc())
+
+    @staticmethod
+    def _make_level(A, L, N):
+        n = A.shape[0] // L
+        A = csr_matrix(A)
+        diag = A.diagonal().reshape((L, n))
+        # Vertical couplings of each column: row l -> l-1 (lower) and l -> l+1 (upper)
+        lower = np.zeros((L, n), dtype=A.dtype)
+        upper = np.zeros((L, n), dtype=A.dtype)
+        if L > 1:
+            lower[1:] = A.diagonal(-n).reshape((L - 1, n))
+            upper[:-1] = A.diagonal(n).reshape((L - 1, n))
+        return {"A": A, "L": L, "N": N, "diag": diag, "lower": lower, "upper": upper}
+
+    @staticmethod
+    def _make_stencil_level(op, L, N):
+        diag, lower, upper = op.vertical_bands()
+        return {"A": op, "L": L, "N": N, "diag": diag, "lower": lower, "upper": upper}
+
+    @property
+    def nbytes(self):
+        total = 0
+        for lvl in self.levels:
+            A = lvl["A"]
+            if isinstance(A, StencilOperator):
+                total += A.diag.nbytes * 4 # diag + lateral/vertical link arrays
+            else:
+                total += A.data.nbytes + A.indices.nbytes
+            total += lvl["diag"].nbytes * 3
+        return total + self.coarse_lu.nnz * (self.levels[-1]["diag"].itemsize + 4)
+
+    def _line_solve(self, lvl, r):
+        """Batched Thomas algorithm over all (L,) columns: M_z x = r."""
+        a, b, c = lvl["lower"], lvl["diag"], lvl["upper"]
+        L = lvl["L"]
+        d = r.reshape((L, -1))
+        cp = np.empty_like(b)
+        dp = np.empty_like(d)
+        cp[0] = c[0] / b[0]
+        dp[0] = d[0] / b[0]
+        for l in range(1, L):
+            m = b[l] - a[l] * cp[l - 1]
+            cp[l] = c[l] / m
+            dp[l] = (d[l] - a[l] * dp[l - 1]) / m
+        x = np.empty_like(d)
+        x[-1] = dp[-1]
+        for l in range(L - 2, -1, -1):
+            x[l] = dp[l] - cp[l] * x[l + 1]
+        return x.ravel()
+
+    def _smooth(self, lvl, x, b):
+        for _ in range(self.smooth_steps):
+            x = x + self.omega * self._line_solve(lvl, b - lvl["A"] @ x)
+        return x
+
+    def vcycle(self, b, depth=0):
+        if depth == len(self.levels) - 1:
+            return self.coarse_lu.solve(b)
+        lvl = self.levels[depth]
+        shape = (lvl["L"], lvl["N"], lvl["N"])
+        x = self._smooth(lvl, np.zeros_like(b), b)
+        r_c = _restrict((b - lvl["A"] @ x).reshape(shape))
+        x = x + _prolong(self.vcycle(r_c.ravel(), depth + 1).reshape(r_c.shape)).ravel()
+        return self._smooth(lvl, x, b)
+
+    def as_preconditioner(self):
+        n = self.levels[0]["A"].shape[0]
+        return linalg.LinearOperator((n, n), matvec=self.vcycle, dtype=self.levels[0]["diag"].dtype)
+
+def _coarsen(arr, reduce):
+    """(L, N, N) -> (L, N/2, N/2) by reducing each 2x2 block."""
+    L, N, _ = arr.shape
+    return reduce(arr.reshape((L, N // 2, 2, N // 2, 2)), axis=(2, 4))
+
+def _prolong_axis(c, axis):
+    """Cell-centred linear interpolation along one axis (n -> 2n), 3/4-1/4 weights."""
+    c = np.moveaxis(c, axis, -1)
+    prev = np.concatenate([c[..., :1], c[..., :-1]], axis=-1)
+    nxt = np.concatenate([c[..., 1:], c[..., -1:]], axis=-1)
+    f = np.empty(c.shape[:-1] + (2 * c.shape[-1],), dtype=c.dtype)
+    f[..., 0::2] = 0.75 * c + 0.25 * prev
+    f[..., 1::2] = 0.75 * c + 0.25 * nxt
+    return np.moveaxis(f, -1, axis)
+
+def _restrict_axis(f, axis):
+    """Transpose of _prolong_axis (2n -> n)."""
+    f = np.moveaxis(f, axis, -1)
+    even, odd = f[..., 0::2], f[..., 1::2]
+    c = 0.75 * (even + odd)
+    c[..., 1:] += 0.25 * odd[..., :-1]
+    c[..., :-1] += 0.25 * even[..., 1:]
+    # Edge cells clamp to themselves in the prolongation
+    c[..., 0] += 0.25 * even[..., 0]
+    c[..., -1] += 0.25 * odd[..., -1]
+    return np.moveaxis(c, -1, axis)
+
+def _prolong(c):
+    return _prolong_axis(_prolong_axis(c, 1), 2)
+
+def _restrict(f):
+    return _restrict_axis(_restrict_axis(f, 1), 2)
+
+def krylov_solve(A, b, M=None, x0=None, tol=1e-8, maxiter=500, method="bicgstab"):
+    """
+    Runs a preconditioned Krylov solve and counts iterations.
+    Returns (x, info) with info = {"iterations", "residual", "converged"}.
+    """
+    counter = {"it": 0}
+    def callback(_):
+        counter["it"] += 1
+
+    solver = linalg.cg if method == "cg" else linalg.bicgstab
+    try:
+        x, code = solver(A, b, x0=x0, rtol=tol, atol=0.0, maxiter=maxiter, M=M, callback=callback)
+    except TypeError:
+        # SciPy < 1.12 names the relative tolerance `tol`
+        x, code = solver(A, b, x0=x0, tol=tol, atol=0.0, maxiter=maxiter, M=M, callback=callback)
+
+    b_norm = np.linalg.norm(b)
+    residual = np.linalg.norm(b - A @ x) / (b_norm if b_norm > 0 else 1.0)
+    return x, {"iterations": counter["it"], "residual": float(residual), "converged": code == 0}
@@ -0,0 +1,154 @@
+import time
+import numpy as np
+from scipy.sparse import coo_matrix, diags, linalg
+from src.physics_engine import (K_CONV, T_AMB, VoxelThermalSolver3D, _link_slices, ambient_conductance,
+                                assemble_conductance, conductivity_volume, link_resistances)
+from src.physics_engine_multigrid import krylov_solve
+
+def power_law_k(k_ref, exponent=-1.3, t_ref=T_AMB):
+    """
+    k(T) = k_ref * (T_K / T_ref_K)^exponent. Crystalline Si follows ~T^-1.3,
+    i.e. about 25-30% lower K at 100 C than at 25 C.
+    """
+    def k_of_t(T):
+        return k_ref * ((T + 273.15) / (t_ref + 273.15)) ** exponent
+    return k_of_t
+
+class NonlinearThermalSolver:
+    """
+    Steady state with temperature-dependent conductivity k_l(T) per layer.
+    k_models: one entry per layer, either a number (constant K) or a callable
+    T -> K (W/mK). method "newton" uses the exact Jacobian of the nodal stencil,
+    "picard" uses Anderson-accelerated fixed-point iterations.
+    Every linear step is a Krylov solve preconditioned by the cached LU of the
+    linear (25 C) operator, so nothing is refactored per iteration.
+    `history` holds per-iteration residual, update, Krylov iterations and time.
+    """
+    def __init__(self, solver=None, method="newton", tol=1e-3, max_iter=30, anderson_depth=5,
+                 krylov_tol=1e-10):
+        self.solver = solver or VoxelThermalSolver3D()
+        self.method = method
+        self.tol = tol # max |dT| (C) between iterations
+        self.max_iter = max_iter
+        self.anderson_depth = anderson_depth
+        self.krylov_tol = krylov_tol
+        self.history = []
+
+    def _k_volume(self, k_models, T):
+        L = self.solver.L
+        k = np.empty_like(T)
+        for l in range(L):
+            model = k_models[l]
+            k[l] = model(T[l]) if callable(model) else model
+        return k
+
+    def _dk_volume(self, k_models, T, h=1e-2):
+        dk = np.zeros_like(T)
+        for l, model in enumerate(k_models):
+            if callable(model):
+                dk[l] = (model(T[l] + h) - model(T[l] - h)) / (2 * h)
+        return dk
+
+    def solve(self, power_vol, k_models):
+        """
+        power_vol: (L, N, N) Power Map
+        k_models: per-layer K or k(T) callables
+        Returns the (L, N, N) temperature.
+        """
+        s = self.solver
+        L, N = s.L, s.N
+        shape = (L, N, N)
+        P = np.asarray(power_vol, dtype=float).ravel()
+
+        # Linear solution at the reference temperature: initial guess and preconditioner
+        k_ref = self._k_volume(k_models, np.full(shape, T_AMB))
+        lu, _ = s.factorize(k_ref)
+        M = linalg.LinearOperator((P.size, P.size), matvec=lu.solve, dtype=float)
+        T = s.solve(power_vol, k_ref).ravel()
+
+        self.history = []
+        if self.method == "picard":
+            T = self._picard(P, k_models, T, M, shape)
+        else:
+            T = self._newton(P, k_models, T, M, shape)
+        return T.reshape(shape)
+
+    def _operator(self, k_models, T, shape):
+        K = conductivity_volume(self._k_volume(k_models, T.reshape(shape)), *shape[:2])
+        G, P_amb = assemble_conductance(K, self.solver.dx, self.solver.dz, self.solver.symmetric)
+        return K, G, P_amb
+
+    def _link_jacobian(self, K, dK, T):
+        """
+        d(G(K(T)) T)/dT - G for the symmetric assembly, where every link
+        conductance depends on the K of both its cells (dg/dK_i = g^2 r_i / K_i).
+        """
+        s = self.solver
+        idx = np.arange(K.size).reshape(K.shape)
+        rows, cols, vals = [], [], []
+        for axis, r_lo, r_hi in link_resistances(K, s.dx, s.dz):
+            lo, hi = _link_slices(axis)
+            w = (T[lo] - T[hi]) / (r_lo + r_hi)**2
+            i, j = idx[lo].ravel(), idx[hi].ravel()
+            a_i = (w * r_lo / K[lo] * dK[lo]).ravel()
+            a_j = (w * r_hi / K[hi] * dK[hi]).ravel()
+            rows += [i, j, i, j]
+            cols += [i, i, j, j]
+            vals += [a_i, -a_i, a_j, -a_j]
+        # Ambient sink stays row-local
+        rows.append(idx[-1].ravel())
+        cols.append(idx[-1].ravel())
+        vals.append((ambient_conductance(K, s.dx, s.dz) * (T[-1] - T_AMB) / K[-1] * dK[-1]).ravel())
+        n = K.size
+        return coo_matrix((np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))), shape=(n, n)).tocsr()
+
+    def _record(self, it, residual, update, krylov_its, t0):
+        self.history.append({"iteration": it, "residual": residual, "update": update,
+                             "krylov_iterations": krylov_its, "time_s": time.perf_counter() - t0})
+
+    def _newton(self, P, k_models, T, M, shape):
+        for it in range(1, self.max_iter + 1):
+            t0 = time.perf_counter()
+            K, G, P_amb = self._operator(k_models, T, shape)
+            R = G @ T - P - P_amb
+            dK = self._dk_volume(k_models, T.reshape(shape)) * K_CONV
+            if self.solver.symmetric:
+                J = G + self._link_jacobian(K, dK, T.reshape(shape))
+            else:
+                # Row i of [G T - P_amb] is linear in K_i -> d/dT_i adds K_i'(T_i) * row / K_i
+                J = G + diags(dK.ravel() * (G @ T - P_amb) / K.ravel())
+            dT, info = krylov_solve(J, -R, M=M, tol=self.krylov_tol)
+            T = T + dT
+            update = np.abs(dT).max()
+            self._record(it, float(np.linalg.norm(R) / np.linalg.norm(P + P_amb)), update, info["iterations"], t0)
+            if update < self.tol:
+                break
+        return T
+
+    def _picard(self, P, k_models, T, M, shape):
+        dF, dG = [], []
+        F_prev = g_prev = None
+        for it in range(1, self.max_iter + 1):
+            t0 = time.perf_counter()
+            K, G, P_amb = self._operator(k_models, T, shape)
+            b = P + P_amb
+            residual = float(np.linalg.norm(G @ T - b) / np.linalg.norm(b))
+            g, info = krylov_solve(G, b, M=M, x0=T, tol=self.krylov_tol, method=self.solver.krylov_method)
+            F = g - T
+            if F_prev is not None:
+                dF.append(F - F_prev)
+                dG.append(g - g_prev)
+                dF, dG = dF[-self.anderson_depth:], dG[-self.anderson_depth:]
+            F_prev, g_prev = F, g
+
+            T_new = g
+            if dF:
+                # Anderson mixing: minimise the linearised residual over the history
+                gamma = np.linalg.lstsq(np.array(dF).T, F, rcond=None)[0]
+                T_new = g - np.array(dG).T @ gamma
+            update = np.abs(T_new - T).max()
+            T = T_new
+            self._record(it, residual, update, info["iterations"], t0)
+            if update < self.tol:
+                break
+        return T
@@ -0,0 +1,164 @@
+import time
+import numpy as np
+from scipy.sparse import linalg
+from src.physics_engine import T_AMB, assemble_conductance, conductivity_volume
+
+class ReducedThermalModel:
+    """
+    Parametric reduced-order model of VoxelThermalSolver3D over per-layer K.
+    The operator is affine in the layer conductivities, G(k) = sum_q theta_q(k) G_q,
+    so after a greedy/POD basis V is built the reduced terms V^T G_q V are fixed
+    and an online solve is one small dense (r x r) system.
+
+    solver: the truth solver (float64; the estimate cannot resolve below its error).
+    load_cases: (M, L, N, N) power volumes; online power is any weighted sum of them.
+    k_bounds: (L, 2) per-layer (min, max) K in W/mK (min == max keeps a layer fixed).
+    k_pattern: optional (L, N, N) relative K inside each layer (default uniform).
+    Snapshots are added where the residual-based error estimate is largest over
+    a random training set, until it drops below tol (relative, 2-norm).
+    Only the default nodal-K assembly is affine. There G = diag(K) G_unit,
+    so with power on one layer the field depends on that layer's K alone
+    and the basis stays rank 1: only k_pattern / multi-layer power cases are
+    worth reducing.
+    """
+    def __init__(self, solver, load_cases, k_bounds, k_pattern=None, tol=1e-3, max_snapshots=20,
+                 n_train=200, seed=0):
+        self.solver = solver
+        L, N = solver.L, solver.N
+        self.load_cases = np.asarray(load_cases, dtype=float).reshape((-1, L, N, N))
+        self.k_bounds = np.asarray(k_bounds, dtype=float)
+        self.k_pattern = None if k_pattern is None else np.asarray(k_pattern, dtype=float)
+        self.tol = tol
+        self.max_snapshots = max_snapshots
+        self.n_train = n_train
+        self.seed = seed
+        self.info = {}
+        self.last_error = None
+        self.build()
+
+    def k_volume(self, k_layers):
+        k_layers = np.asarray(k_layers, dtype=float)
+        if self.k_pattern is None:
+            return k_layers # per-layer list, keeps the solver's spectral path
+        return k_layers[:, None, None] * self.k_pattern
+
+    def affine_terms(self):
+        """
+        Returns [G_q] with theta_q(k) = k_q. With nodal K every row of G carries
+        its own voxel's K, so G_q is the assembly with K only in layer q.
+        """
+        s = self.solver
+        if s.symmetric:
+            raise ValueError("Harmonic-mean (symmetric) links are not affine in the layer K; "
+                             "build the ROM on a nodal-K solver.")
+        L, N = s.L, s.N
+        pattern = np.ones((L, N, N)) if self.k_pattern is None else self.k_pattern
+        terms = []
+        for q in range(L):
+            K = np.zeros((L, N, N))
+            K[q] = pattern[q]
+            terms.append(assemble_conductance(conductivity_volume(K, L, N), s.dx, s.dz)[0])
+        return terms
+
+    def theta(self, k_layers):
+        return np.asarray(k_layers, dtype=float)
+
+    def _stability_factor(self, k_ref, iters=30):
+        """Smallest singular value of G(k_ref), by inverse power iteration on G^T G."""
+        G = sum(t * G_q for t, G_q in zip(self.theta(k_ref), self.terms))
+        lu = linalg.splu(G.tocsc())
+        x = np.random.default_rng(self.seed).random(G.shape[0])
+        lam = 1.0
+        for _ in range(iters):
+            y = lu.solve(lu.solve(x, trans="T"))
+            lam = np.linalg.norm(y)
+            x = y / lam
+        return 1.0 / np.sqrt(lam)
+
+    def _full_solve(self, k_layers):
+        """Temperature rise of every load case for one stack (the expensive truth solve)."""
+        T = self.solver.solve_batch(self.load_cases, self.k_volume(k_layers))
+        return (np.asarray(T, dtype=float) - T_AMB).reshape((len(self.load_cases), -1))
+
+    def _set_basis(self, snapshots, rel_cut=1e-10):
+        """POD of the snapshot set, then the precomputed reduced/affine pieces."""
+        U, sv, _ = np.linalg.svd(snapshots, full_matrices=False)
+        V = U[:, sv > rel_cut * sv[0]]
+        P = self.load_cases.reshape((len(self.load_cases), -1)).T
+        GV = [G_q @ V for G_q in self.terms]
+        self.V = V
+        self.G_r = np.array([V.T @ g for g in GV])              # (Q, r, r)
+        self.P_r = V.T @ P                                      # (r, M)
+        # Residual norm pieces: |sum_q theta_q G_q V a - P w|^2
+        self.R_GG = np.array([[a.T @ b for b in GV] for a in GV]).reshape((len(GV)**2, -1)) # (Q*Q, r*r)
+        self.R_GP = np.array([g.T @ P for g in GV])             # (Q, r, M)
+        self.R_PP = P.T @ P                                     # (M, M)
+
+    def reduced_solve(self, k_layers, weights=None):
+        """
+        Online stage: reduced coefficients a (r,) or (r, M) and the error estimate.
+        weights: (M,) load-case weights; None solves every load case separately.
+        """
+        theta = self.theta(k_layers)
+        w = np.eye(len(self.load_cases)) if weights is None else np.asarray(weights, dtype=float)
+        a = np.linalg.solve(np.tensordot(theta, self.G_r, axes=1), self.P_r @ w)
+        r = len(a)
+
+        # a-posteriori estimate |e| <= |r| / sigma_min(G(k)), with the min-theta bound
+        # sigma_min(G(k)) >= min_q(theta_q / theta_q_ref) * sigma_min(G(k_ref))
+        GG = (np.outer(theta, theta).ravel() @ self.R_GG).reshape((r, r))
+        GP = np.tensordot(theta, self.R_GP, axes=1) @ w
+        PP = w.T @ self.R_PP @ w
+        if a.ndim == 1:
+            res2 = a @ GG @ a - 2 * a @ GP + PP
+        else:
+            res2 = np.einsum("im,ij,jm->m", a, GG, a) - 2 * np.einsum("im,im->m", a, GP) + np.diag(PP)
+        sigma = np.min(theta / self.theta_ref) * self.sigma_ref
+        err = np.sqrt(np.maximum(res2, 0.0)) / sigma
+        self.last_error = err / np.maximum(np.linalg.norm(a, axis=0), 1e-30)
+        return a, err
+
+    def evaluate(self, k_layers, weights=None, layers=None):
+        """
+        Temperature (L, N, N) for power sum_m weights[m] * load_cases[m] on stack
+        k_layers; `layers` restricts the lift to the requested layers.
+        last_error holds the relative error estimate.
+        """
+        L, N = self.solver.L, self.solver.N
+        w = np.ones(len(self.load_cases)) if weights is None else weights
+        a, _ = self.reduced_solve(k_layers, w)
+        V = self.V.reshape((L, N * N, -1))
+        if layers is not None:
+            V = V[layers]
+        return T_AMB + (V @ a).reshape(V.shape[:-2] + (N, N))
+
+    def build(self):
+        """Offline stage: greedy snapshot selection over the K box with POD compression."""
+        t0 = time.perf_counter()
+        L = self.solver.L
+        lo, hi = self.k_bounds[:, 0], self.k_bounds[:, 1]
+        train = lo + (hi - lo) * np.random.default_rng(self.seed).random((self.n_train, L))
+
+        self.terms = self.affine_terms()
+        k = 0.5 * (lo + hi)
+        self.theta_ref = self.theta(k)
+        self.sigma_ref = self._stability_factor(k)
+
+        snapshots, chosen = [], []
+        worst = np.inf
+        while len(chosen) < self.max_snapshots:
+            chosen.append(k)
+            snapshots.append(self._full_solve(k))
+            self._set_basis(np.concatenate(snapshots).T)
+            errors = []
+            for k_train in train:
+                self.reduced_solve(k_train)
+                errors.append(self.last_error.max())
+            worst = float(max(errors))
+            if worst < self.tol:
+                break
+            k = train[int(np.argmax(errors))]
+
+        self.info = {"snapshots": len(chosen), "basis": self.V.shape[1], "max_error_estimate": worst,
+                     "offline_s": time.perf_counter() - t0}
+        return self
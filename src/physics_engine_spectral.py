@@ -0,0 +1,131 @@
+import numpy as np
+from scipy import fft
+from scipy.sparse import linalg
+from src.physics_engine import (K_CONV, T_AMB, ambient_conductance, conductivity_volume,
+                                stencil_links)
+
+class SpectralThermalSolver:
+    """
+    Fast solver for layer-homogeneous stacks (one K per layer).
+    The lateral operator of each layer is a scaled Neumann Laplacian, which a
+    2D DCT-II diagonalizes; what remains per lateral mode is an (L x L)
+    tridiagonal system in z, solved for all modes at once (Thomas).
+    Same discretization as VoxelThermalSolver3D, O(L * N^2 log N) work.
+    dtype sets the working precision (float32 halves DCT memory and traffic).
+    symmetric selects the harmonic-mean links of the SPD assembly.
+    """
+    def __init__(self, size=64, layers=5, pitch_um=31.25, z_pitch_um=20, dtype=float, symmetric=False):
+        self.N = size
+        self.L = layers
+        self.dx = pitch_um
+        self.dz = z_pitch_um
+        self.dtype = np.dtype(dtype)
+        self.symmetric = symmetric
+
+    def layer_coefficients(self, k_layers):
+        """
+        Per-layer stencil coefficients, taken from the same link definitions as
+        the voxel assembly: lateral g, vertical (lower, upper) g and ambient g.
+        """
+        L = self.L
+        K = conductivity_volume(k_layers, L, 2)
+        links = {axis: (g_lo, g_hi) for axis, g_lo, g_hi in stencil_links(K, self.dx, self.dz, self.symmetric)}
+        g_lat = links[1][0][:, 0, 0]
+        lower = np.zeros(L) # row l -> l-1
+        upper = np.zeros(L) # row l -> l+1
+        upper[:-1] = links[0][0][:, 0, 0]
+        lower[1:] = links[0][1][:, 0, 0]
+        g_amb = np.zeros(L)
+        g_amb[-1] = ambient_conductance(K, self.dx, self.dz)[0, 0]
+        return tuple(g.astype(self.dtype) for g in (g_lat, lower, upper, g_amb))
+
+    def mode_eigenvalues(self):
+        """Eigenvalues of the (N, N) Neumann Laplacian in DCT-II ordering."""
+        lam = 2.0 - 2.0 * np.cos(np.pi * np.arange(self.N) / self.N)
+        return (lam[:, None] + lam[None, :]).astype(self.dtype)
+
+    def solve(self, power_vol, k_layers, t_amb=T_AMB):
+        """
+        power_vol: (L, N, N) Power Map, or (B, L, N, N) for a batch
+        k_layers: per-layer K (list / 1D array)
+        t_amb: sink temperature (0 gives the plain linear solve G^-1 P)
+        """
+        g_lat, lower, upper, g_amb = self.layer_coefficients(k_layers)
+        mu = self.mode_eigenvalues()
+
+        # Diagonal of every mode's z-system: lateral eigenvalue + vertical + ambient
+        diag = g_lat[:, None, None] * mu + (lower + upper + g_amb)[:, None, None]
+
+        rhs = np.array(power_vol, dtype=self.dtype)
+        rhs[..., -1, :, :] += g_amb[-1] * t_amb
+        rhs_hat = fft.dctn(rhs, type=2, axes=(-2, -1), norm="ortho")
+
+        T_hat = _thomas(-lower, diag, -upper, rhs_hat)
+        return fft.idctn(T_hat, type=2, axes=(-2, -1), norm="ortho")
+
+class LayeredPreconditioner:
+    """
+    Preconditioner for heterogeneous stacks of any depth: the spectral solve
+    of the layer-mean stack, applied after scaling each row by K_mean / K.
+    One application is O(L * N^2 log N). Exact for nodal-K rows
+    (G = diag(K / K_mean) G_mean): the Krylov solve converges at once and
+    stays linear in the number of layers.
+    For the symmetric assembly the scaling is split sqrt(K_mean / K) on both
+    sides, which keeps it SPD for CG, but harmonic-mean links do not factor
+    that way: it is then only a general preconditioner, and the CG iteration
+    count grows with the in-layer K contrast and the depth (64 iterations at
+    32x32x10, 217 at 32x32x40 with K varying +-70% within each layer).
+    """
+    def __init__(self, K, dx, dz, dtype=float, symmetric=False):
+        L, N, _ = K.shape
+        self.k_mean = K.mean(axis=(1, 2))
+        self.symmetric = symmetric
+        scale = self.k_mean[:, None, None] / K
+        self.scale = (np.sqrt(scale) if symmetric else scale).astype(dtype)
+        self.spectral = SpectralThermalSolver(N, L, dx, dz, dtype=dtype, symmetric=symmetric)
+
+    @property
+    def nbytes(self):
+        return self.scale.nbytes
+
+    def apply(self, r):
+        r = r.reshape(self.scale.shape) * self.scale
+        # k_mean is in mW/(um*K) already; solve() expects W/mK
+        x = self.spectral.solve(r, self.k_mean / K_CONV, t_amb=0.0)
+        return (x * self.scale if self.symmetric else x).ravel()
+
+    def as_preconditioner(self):
+        n = self.scale.size
+        return linalg.LinearOperator((n, n), matvec=self.apply, dtype=self.scale.dtype)
+
+def _thomas(a, b, c, d):
+    """
+    Tridiagonal solve along axis -3 of d (the layer axis).
+    a, c: (L,) sub/super diagonals; b: (L, N, N) diagonal per mode.
+    """
+    L = b.shape[0]
+    cp = np.empty_like(b)
+    dp = np.empty_like(d)
+    cp[0] = c[0] / b[0]
+    dp[..., 0, :, :] = d[..., 0, :, :] / b[0]
+    for l in range(1, L):
+        m = b[l] - a[l] * cp[l - 1]
+        cp[l] = c[l] / m
+        dp[..., l, :, :] = (d[..., l, :, :] - a[l] * dp[..., l - 1, :, :]) / m
+    x = np.empty_like(d)
+    x[..., -1, :, :] = dp[..., -1, :, :]
+    for l in range(L - 2, -1, -1):
+        x[..., l, :, :] = dp[..., l, :, :] - cp[l] * x[..., l + 1, :, :]
+    return x
+
+def is_layer_uniform(k_vol):
+    """True if K is given per layer, or the volume is constant within every layer."""
+    k_arr = np.asarray(k_vol, dtype=float)
+    if k_arr.ndim == 1:
+        return True
+    return bool(np.all(k_arr == k_arr[:, :1, :1]))
+
+def layer_values(k_vol):
+    """Per-layer K of a layer-uniform conductivity (list or volume)."""
+    k_arr = np.asarray(k_vol, dtype=float)
+    return k_arr if k_arr.ndim == 1 else k_arr[:, 0, 0]
@@ -1,126 +1,293 @@
+import hashlib
 import numpy as np
-from scipy.sparse import lil_matrix, eye, kron, csr_matrix
+from scipy.sparse import diags, linalg
+from src.physics_engine import (T_AMB, FactorizationCache, assemble_conductance,
+                                conductivity_volume)
+from src.power_schedule import power_source
+
+IMPLICIT_METHODS = ("backward_euler", "crank_nicolson", "tr_bdf2")
+TR_BDF2_GAMMA = 2.0 - np.sqrt(2.0) # both TR-BDF2 stages then share C + (gamma/2) dt G
 
 class TransientThermalSolver:
-    def __init__(self, size=16, layers=5, pitch_um=50, z_pitch_um=20, dt_ms=0.001):
+    """
+    precision: "float64", "float32" (G, C and T in single precision) or
+    "mixed" (float32 G matvec, float64 temperature accumulation so that
+    small per-step increments are not rounded away).
+    method: "explicit" (forward Euler; dt must stay below the smallest cell
+    time constant C/G, ~1 us here) or one of the implicit integrators
+    "backward_euler" (1st order), "crank_nicolson" (2nd order) and "tr_bdf2"
+    (2nd order and L-stable, so no ringing after power steps). Implicit steps
+    solve with C + a G, factored once per stack and step size and kept in a
+    FactorizationCache, so each step is one substitution and dt is set by
+    accuracy alone (100-1000x the explicit limit).
+    """
+    def __init__(self, size=16, layers=5, pitch_um=50, z_pitch_um=20, dt_ms=0.001, precision="float64",
+                 method="explicit"):
         self.N = size
         self.L = layers
         self.dx = pitch_um
         self.dz = z_pitch_um
         self.dt = dt_ms * 1e-3 # Seconds
-        
-    def solve_transient(self, power_vol_func, k_layers, cv_layers, duration_ms=100):
+        self.precision = precision
+        self.method = method
+        self.cache = FactorizationCache()
+
+    def solve_transient(self, power_vol_func, k_layers, cv_layers, duration_ms=100, record_every=None,
+                        recorder=None):
         """
         Solves Time-Dependent Heat Equation.
-        power_vol_func: Function(time_ms) -> (L, N, N) Power Map.
+        power_vol_func: PowerSchedule, or Function(time_ms) -> (L, N, N) Power Map.
         cv_layers: Heat Capacity (J/m^3K) per layer.
+        record_every: steps between recorded peak temperatures
+        (default 10 for explicit, every step for implicit methods).
+        recorder: TransientRecorder that streams probes and snapshots of every
+        step to disk; (times, history) are then its memory-mapped t_ms / peak traces.
         """
+        if self.method in IMPLICIT_METHODS:
+            return self._solve_implicit(power_vol_func, k_layers, cv_layers, duration_ms, record_every or 1,
+                                        recorder)
+        if self.method != "explicit":
+            raise ValueError(f"Unknown transient method '{self.method}'.")
+        record_every = record_every or 10
         N, L = self.N, self.L
         num_voxels = L * N * N
-        
+
         # 1. Build Conductance Matrix (G) - Same as Steady State
         # We reuse the logic but kept optimized for update loop
         G = self._build_conductance_matrix(k_layers)
-        
+        work = np.float64 if self.precision == "float64" else np.float32
+        state = np.float32 if self.precision == "float32" else np.float64
+        G = G.astype(work)
+
         # 2. Build Capacitance Matrix (C)
-        # C_node = Vol * Cv = (dx*dx*dz) * Cv (units?)
-        # Unit check: Power in mW. G in mW/K. 
-        # Heat Cap in J/K? 
-        # J = W*s = mW * ms? No, J = W*s.
-        # Cv (J/m^3K). Vol (um^3).
-        # Cap_J = Cv * Vol * 1e-18.
-        # Cap_mWs = Cap_J * 1000.
-        
-        vol_m3 = (self.dx * 1e-6)**2 * (self.dz * 1e-6)
-        C_vec = np.zeros(num_voxels)
-        
-        for l in range(L):
-            cv = cv_layers[l]
-            cap_val = cv * vol_m3 * 1000.0 # mWs/K (mJ/K)
-            idx_start = l * N * N
-            idx_end = (l+1) * N * N
-            C_vec[idx_start:idx_end] = cap_val
-            
+        # C_node = Vol * Cv = (dx*dx*dz) * Cv
+        # Cap_J = Cv * Vol * 1e-18, Cap_mWs = Cap_J * 1000 (Power in mW, G in mW/K)
+        C_vec = self._capacitance(cv_layers).astype(state)
+
         # 3. Time Stepping (Explicit Euler)
         # T_new = T_old + (dt/C) * (P_in - G*T_old)
-        
-        T = np.full(num_voxels, 25.0) # Initial Condition
-        
-        steps = int(duration_ms / (self.dt * 1000))
+
+        T = np.full(num_voxels, T_AMB, dtype=state) # Initial Condition
+        # Flow to ambient is G*(T - Tamb) = G*T - G_amb*Tamb, so the sink
+        # enters as a constant injection: Heat_In = (P_source + P_amb) - G*T
+        P_amb = self.P_amb_offset.astype(state)
+        power = power_source(power_vol_func, state)
+
+        steps = int(round(duration_ms / (self.dt * 1000)))
         history = []
         times = []
-        
-        # Pre-compute Ambient flux vector (constant part of G*T)
-        # Actually G includes G_amb. P_in should include G_amb*T_amb?
-        # In my G matrix, I usually put G_amb in diagonal. 
-        # Net Flow = P_in - G*T.
-        # If G*T accounts for flow TO ambient, P_in must NOT include it?
-        # Wait, Flow = G*(T - Tamb). = G*T - G*Tamb.
-        # So Heat_In = P_source - (G*T - G*Tamb) = (P_source + G*Tamb) - G*T.
-        # Let's verify _build_G handles G_amb.
-        
+        if recorder is not None:
+            recorder.open((L, N, N))
+
         print(f"⏱️ Simulating {duration_ms}ms in {steps} steps...")
-        
+
         for step in range(steps):
             t_ms = step * self.dt * 1000
-            
+
             # Get Instantaneous Power
-            P_source = power_vol_func(t_ms).flatten()
-            
-            # Add Ambient Injection (G_amb * 25.0)
-            # We need the G_amb vector from build_G
-            # For simplicity, let's assume _build_G returns the full G matrix 
-            # and we calculate flow G*T.
-            # But we need the offset vector.
-            
-            # Refined update: T += (dt/C) * (P_source + P_amb_offset - G @ T)
-            
-            flux = P_source + self.P_amb_offset - (G @ T)
+            P_source = power(t_ms)
+
+            # T += (dt/C) * (P_source + P_amb_offset - G @ T)
+            flux = P_source + P_amb - (G @ T.astype(work))
             T = T + (self.dt / C_vec) * flux
-            
+
             # Record Peak Temp
-            if step % 10 == 0:
+            if recorder is not None:
+                recorder.record(t_ms + self.dt * 1000, T)
+            elif step % record_every == 0:
                 history.append(T.max())
-                times.append(t_ms)
-                
-        return times, history
+                times.append(t_ms + self.dt * 1000)
 
-    def _build_conductance_matrix(self, k_layers):
+        return self._results(recorder, times, history)
+
+    def _solve_implicit(self, power_vol_func, k_layers, cv_layers, duration_ms, record_every, recorder):
+        """
+        Implicit stepping in increment form, (C + a G) dT = dt * (net heat flow),
+        which keeps the float32 factor of "mixed" precision out of the absolute
+        temperature. Power is sampled at both ends of a step (and at the
+        TR-BDF2 stage point); the end sample is reused as the next start.
+        """
+        G, C_vec, P_amb, state = self._system(k_layers, cv_layers)
+        work = G.dtype
+        dt = self.dt
+        dt_ms = dt * 1000
+
+        def heat_in(P, T):
+            return P + P_amb - (G @ T.astype(work))
+
+        power = power_source(power_vol_func, state)
+
+        gamma = TR_BDF2_GAMMA
+        theta = {"backward_euler": 1.0, "crank_nicolson": 0.5, "tr_bdf2": gamma / 2}[self.method]
+        lu = self.step_factor(G, C_vec, k_layers, cv_layers, theta * dt)
+
+        T = np.full(G.shape[0], T_AMB, dtype=state)
+        steps = int(round(duration_ms / dt_ms))
+        history = []
+        times = []
+        if recorder is not None:
+            recorder.open((self.L, self.N, self.N))
+        print(f"⏱️ Simulating {duration_ms}ms in {steps} {self.method} steps of {dt_ms:g}ms...")
+
+        P_start = power(0.0)
+        for step in range(steps):
+            t_ms = step * dt_ms
+            P_end = power(t_ms + dt_ms)
+            if self.method == "tr_bdf2":
+                P_mid = power(t_ms + gamma * dt_ms)
+                T, _ = _tr_bdf2_step(lu, G, C_vec, P_amb, T, (P_start, P_mid, P_end), dt)
+            else:
+                P_theta = theta * P_end + (1 - theta) * P_start
+                T = T + lu.solve((dt * heat_in(P_theta, T)).astype(work))
+            P_start = P_end
+
+            if recorder is not None:
+                recorder.record(t_ms + dt_ms, T)
+            elif step % record_every == 0:
+                history.append(T.max())
+                times.append(t_ms + dt_ms)
+
+        return self._results(recorder, times, history)
+
+    def solve_adaptive(self, power_vol_func, k_layers, cv_layers, duration_ms=100, rtol=1e-3, atol=1e-2,
+                       breakpoints=None, dt_min_ms=0.001, dt_max_ms=None, recorder=None):
+        """
+        TR-BDF2 with local error control. Each step's embedded error estimate
+        (filtered through the step factor) must stay below atol + rtol * rise
+        above ambient, in K, at every voxel; otherwise the step is redone smaller.
+        Step sizes are dt_min_ms * 2^k, so only a handful of factors are ever
+        built, and steps land exactly on the breakpoints (ms, default
+        power_vol_func.breakpoints): the power edges of the schedule, which are
+        then sampled from the correct side. The first step is self.dt.
+        Returns (times, peak history) at every accepted step; last_info counts
+        accepted / rejected steps. A recorder's snapshot times are breakpoints too.
+        """
+        G, C_vec, P_amb, state = self._system(k_layers, cv_layers)
+        tick_ms = dt_min_ms
+        end = int(round(duration_ms / tick_ms))
+        if breakpoints is None:
+            breakpoints = getattr(power_vol_func, "breakpoints", ())
+        if recorder is not None:
+            breakpoints = list(breakpoints) + recorder.breakpoints
+            recorder.open((self.L, self.N, self.N))
+        stops = sorted({int(round(b / tick_ms)) for b in breakpoints if 0 < b < duration_ms} | {end})
+        max_ticks = end if dt_max_ms is None else max(1, int(dt_max_ms / tick_ms))
+        eps = 1e-6 * tick_ms # samples a step's power from inside the step
+
+        power = power_source(power_vol_func, state)
+
+        gamma = TR_BDF2_GAMMA
+        level = max(0, int(np.floor(np.log2(max(1.0, self.dt * 1000 / tick_ms)))))
+        T = np.full(G.shape[0], T_AMB, dtype=state)
+        t = 0
+        accepted = rejected = 0
+        used = set()
+        history = []
+        times = []
+        P_start = power(eps)
+        next_stop = 0
+        while t < end:
+            while stops[next_stop] <= t:
+                next_stop += 1
+            ticks = min(1 << level, stops[next_stop] - t, max_ticks)
+            ticks = 1 << (ticks.bit_length() - 1)
+            clipped = ticks < (1 << level)
+            dt = ticks * tick_ms * 1e-3
+            t_ms, dt_ms = t * tick_ms, ticks * tick_ms
+            lu = self.step_factor(G, C_vec, k_layers, cv_layers, gamma / 2 * dt)
+            used.add(ticks)
+
+            P_mid = power(t_ms + gamma * dt_ms)
+            P_end = power(t_ms + dt_ms - eps)
+            T_new, err = _tr_bdf2_step(lu, G, C_vec, P_amb, T, (P_start, P_mid, P_end), dt, estimate=True)
+            ratio = float(np.max(np.abs(err) / (atol + rtol * np.abs(T_new - T_AMB))))
+            # Second-order method: error ~ dt^3
+            factor = min(4.0, max(0.125, 0.9 * ratio**(-1.0 / 3) if ratio > 0 else 4.0))
+            proposal = max(0, ticks.bit_length() - 1 + int(np.floor(np.log2(factor))))
+
+            if ratio <= 1.0 or ticks == 1:
+                accepted += 1
+                t += ticks
+                T = T_new
+                P_start = power(t * tick_ms + eps) if t in stops else P_end
+                if recorder is not None:
+                    recorder.record(t * tick_ms, T)
+                else:
+                    history.append(T.max())
+                    times.append(t * tick_ms)
+                # A step cut short by a breakpoint says nothing against the planned size
+                level = max(level, proposal) if clipped else proposal
+            else:
+                rejected += 1
+                level = min(proposal, ticks.bit_length() - 2)
+
+        self.last_info = {"accepted": accepted, "rejected": rejected, "factorizations": len(used),
+                          "step_sizes_ms": sorted(k * tick_ms for k in used)}
+        print(f"⏱️ Simulated {duration_ms}ms in {accepted} adaptive steps ({rejected} rejected, "
+              f"{len(used)} step sizes)")
+        return self._results(recorder, times, history)
+
+    def step_factor(self, G, C_vec, k_layers, cv_layers, a):
+        """LU of C + a G (a = theta * dt in seconds), cached per stack, precision and a."""
+        desc = repr((tuple(float(k) for k in k_layers), tuple(float(c) for c in cv_layers),
+                     self.N, self.L, float(self.dx), float(self.dz), G.dtype.str, float(a)))
+        key = hashlib.sha1(desc.encode()).hexdigest()
+        entry = self.cache.get(key)
+        if entry is not None:
+            return entry[0]
+        A = (diags(C_vec.astype(G.dtype)) + a * G).tocsc()
+        lu = linalg.splu(A)
+        self.cache.put(key, lu, None)
+        return lu
+
+    @staticmethod
+    def _results(recorder, times, history):
+        if recorder is None:
+            return times, history
+        recorder.close()
+        return recorder.trace("t_ms"), recorder.trace("peak")
+
+    def _system(self, k_layers, cv_layers):
+        """(G, C, P_amb, state dtype); G in the working precision, the rest in the state's."""
+        work = np.float64 if self.precision == "float64" else np.float32
+        state = np.float32 if self.precision == "float32" else np.float64
+        G = self._build_conductance_matrix(k_layers).astype(work)
+        return G, self._capacitance(cv_layers).astype(state), self.P_amb_offset.astype(state), state
+
+    def _capacitance(self, cv_layers):
+        """Per-voxel heat capacity in mWs/K (mJ/K)."""
         N, L = self.N, self.L
-        num_voxels = L * N * N
-        G = lil_matrix((num_voxels, num_voxels))
-        k_conv = 1e-3
-        self.P_amb_offset = np.zeros(num_voxels)
-        
-        for l in range(L):
-            k = k_layers[l] * k_conv
-            g_lat = k * self.dz
-            g_vert = k * (self.dx**2) / self.dz
-            
-            for r in range(N):
-                for c in range(N):
-                    idx = (l * N * N) + (r * N) + c
-                    diag_val = 0.0
-                    
-                    # Neighbors logic (simplified for brevity, assume same as before)
-                    # For Transient, G matrix is just conductance.
-                    
-                    # Lat
-                    if r>0: G[idx, idx-N] = -g_lat; diag_val += g_lat
-                    if r<N-1: G[idx, idx+N] = -g_lat; diag_val += g_lat
-                    if c>0: G[idx, idx-1] = -g_lat; diag_val += g_lat
-                    if c<N-1: G[idx, idx+1] = -g_lat; diag_val += g_lat
-                    
-                    # Vert
-                    if l>0: G[idx, idx-N*N] = -g_vert; diag_val += g_vert
-                    if l<L-1: G[idx, idx+N*N] = -g_vert; diag_val += g_vert
-                    
-                    # Ambient
-                    if l==L-1:
-                        g_amb = g_vert * 10.0
-                        diag_val += g_amb
-                        self.P_amb_offset[idx] = g_amb * 25.0
-                        
-                    G[idx, idx] = diag_val
-                    
-        return G.tocsr()
+        vol_m3 = (self.dx * 1e-6)**2 * (self.dz * 1e-6)
+        cv = np.asarray(cv_layers, dtype=float)[:L]
+        return np.repeat(cv * vol_m3 * 1000.0, N * N)
+
+    def _build_conductance_matrix(self, k_layers):
+        """Same stencil as the steady-state solver (nodal K, sink on the top layer)."""
+        G, self.P_amb_offset = assemble_conductance(conductivity_volume(k_layers[:self.L], self.L, self.N),
+                                                    self.dx, self.dz)
+        return G
+
+def _tr_bdf2_step(lu, G, C_vec, P_amb, T, powers, dt, estimate=False):
+    """
+    One TR-BDF2 step in increment form: a trapezoidal stage to t + gamma*dt,
+    then BDF2 through (t, T), (t + gamma*dt, T_mid). lu factors C + (gamma/2) dt G.
+    powers: power at t, t + gamma*dt and t + dt. With estimate, also returns
+    the embedded local error estimate (Hosea & Shampine), else None.
+    """
+    gamma = TR_BDF2_GAMMA
+    work = G.dtype
+    P_start, P_mid, P_end = powers
+    flow_start = P_start + P_amb - (G @ T.astype(work))
+    rhs = gamma * dt * (flow_start + 0.5 * (P_mid - P_start))
+    T_mid = T + lu.solve(rhs.astype(work))
+    G_mid = G @ T_mid.astype(work)
+    c = (1 - gamma)**2 / (gamma * (2 - gamma))
+    rhs = c * C_vec * (T_mid - T) + gamma / 2 * dt * (P_end + P_amb - G_mid)
+    T_new = T_mid + lu.solve(rhs.astype(work))
+    if not estimate:
+        return T_new, None
+    flow_mid = P_mid + P_amb - G_mid
+    flow_end = P_end + P_amb - (G @ T_new.astype(work))
+    k = (-3 * gamma**2 + 4 * gamma - 2) / (12 * (2 - gamma))
+    est = 2 * k * dt * (flow_start / gamma - flow_mid / (gamma * (1 - gamma)) + flow_end / (1 - gamma))
+    return T_new, lu.solve(est.astype(work))
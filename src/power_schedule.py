@@ -0,0 +1,141 @@
+import bisect
+import hashlib
+import numpy as np
+
+class PowerSchedule:
+    """
+    Declarative piecewise-constant power for the transient solvers.
+    Power at any time is a base map plus a scale per named block map:
+    at(t_ms, power=..., dsp=...) changes them from t_ms on, and trace()
+    adds a sampled activity trace of one block, stored run-length encoded
+    (only its changes). Power is zero until the first change.
+    The schedule compiles once to change times, an index per interval and
+    the distinct power vectors (D, L*N*N), so a solver's hot loop looks up a
+    row instead of building a map. Calling the schedule like the old
+    power_vol_func(t_ms) callback returns a view of that row.
+    """
+    def __init__(self, blocks=None):
+        self.blocks = {name: np.asarray(m, dtype=float) for name, m in (blocks or {}).items()}
+        self.shape = next(iter(self.blocks.values())).shape if self.blocks else None
+        self._events = [] # (t_ms, "power" / block name, base map / scale)
+        self._compiled = None
+
+    @classmethod
+    def from_segments(cls, segments):
+        """[(t_start_ms, power_vol (L, N, N))], each held until the next."""
+        schedule = cls()
+        for t_ms, power_vol in segments:
+            schedule.at(t_ms, power=power_vol)
+        return schedule
+
+    def at(self, t_ms, power=None, **scales):
+        if power is not None:
+            power = np.asarray(power, dtype=float)
+            self.shape = self.shape or power.shape
+            self._events.append((float(t_ms), "power", power))
+        for name, scale in scales.items():
+            if name not in self.blocks:
+                raise ValueError(f"Unknown block '{name}' (schedule blocks: {list(self.blocks)}).")
+            self._events.append((float(t_ms), name, float(scale)))
+        self._compiled = None
+        return self
+
+    def trace(self, name, levels, dt_ms, t0_ms=0.0):
+        """Activity of block `name` sampled every dt_ms from t0_ms; the last level is held."""
+        levels = np.asarray(levels, dtype=float)
+        changes = np.flatnonzero(np.diff(levels)) + 1
+        for i in np.concatenate([[0], changes]):
+            self.at(t0_ms + i * dt_ms, **{name: levels[i]})
+        return self
+
+    def compile(self):
+        """(times (K,), index (K,), vectors (D, n)): vectors[index[k]] holds from times[k]."""
+        if self._compiled is not None:
+            return self._compiled
+        if self.shape is None:
+            raise ValueError("Power schedule has neither block maps nor power maps.")
+        events = sorted(self._events, key=lambda e: e[0]) # stable: same-time events apply in order
+        names = list(self.blocks)
+        base_maps = {} # content hash -> (index, map)
+        state = {"power": -1}
+        state.update({name: 0.0 for name in names})
+        keys = {}
+        times, index = [], []
+
+        def close(t_ms):
+            key = (state["power"],) + tuple(state[name] for name in names)
+            i = keys.setdefault(key, len(keys))
+            if times and times[-1] == t_ms:
+                times.pop()
+                index.pop()
+            if not index or index[-1] != i:
+                times.append(t_ms)
+                index.append(i)
+
+        close(min(0.0, events[0][0]) if events else 0.0)
+        for e, (t_ms, kind, value) in enumerate(events):
+            if kind == "power":
+                digest = hashlib.sha1(np.ascontiguousarray(value)).hexdigest()
+                state["power"] = base_maps.setdefault(digest, (len(base_maps), value))[0]
+            else:
+                state[kind] = value
+            if e + 1 == len(events) or events[e + 1][0] != t_ms:
+                close(t_ms)
+
+        # Keep only the states that survived same-time merging, renumbered densely
+        used = {i: j for j, i in enumerate(sorted(set(index)))}
+        keys = {key: used[i] for key, i in keys.items() if i in used}
+        index = [used[i] for i in index]
+        maps = [m for _, m in sorted(base_maps.values(), key=lambda e: e[0])]
+        vectors = np.zeros((len(keys), int(np.prod(self.shape))))
+        for key, i in keys.items():
+            if key[0] >= 0:
+                vectors[i] += maps[key[0]].ravel()
+            for name, scale in zip(names, key[1:]):
+                if scale:
+                    vectors[i] += scale * self.blocks[name].ravel()
+        self._compiled = (times, np.array(index), vectors)
+        return self._compiled
+
+    @property
+    def times(self):
+        return np.array(self.compile()[0])
+
+    @property
+    def index(self):
+        return self.compile()[1]
+
+    @property
+    def vectors(self):
+        return self.compile()[2]
+
+    @property
+    def breakpoints(self):
+        """Power edges (ms), for TransientThermalSolver.solve_adaptive."""
+        return self.compile()[0][1:]
+
+    def index_at(self, t_ms):
+        times, index, _ = self.compile()
+        return index[max(0, bisect.bisect_right(times, t_ms) - 1)]
+
+    def __call__(self, t_ms):
+        """Callback form: the (L, N, N) power at t_ms, a view into the compiled vectors."""
+        return self.vectors[self.index_at(t_ms)].reshape(self.shape)
+
+    def segments(self):
+        """[(t_start_ms, power_vol)] of the compiled schedule."""
+        times, index, vectors = self.compile()
+        return [(t, vectors[i].reshape(self.shape)) for t, i in zip(times, index)]
+
+def power_source(power_vol_func, dtype=float):
+    """
+    t_ms -> flat power vector in dtype. A PowerSchedule is converted once and
+    then served as rows of its compiled vectors (no allocation per call);
+    any other callable is the per-call fallback.
+    """
+    if isinstance(power_vol_func, PowerSchedule):
+        times, index, vectors = power_vol_func.compile()
+        vectors = vectors.astype(dtype)
+        index = index.tolist()
+        return lambda t_ms: vectors[index[max(0, bisect.bisect_right(times, t_ms) - 1)]]
+    return lambda t_ms: np.asarray(power_vol_func(t_ms), dtype=dtype).ravel()
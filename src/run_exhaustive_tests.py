@@ -2,10 +2,25 @@ import numpy as np
 import torch
 import os
 import sys
+import json
+import tempfile
+import shutil
 from src.physics_engine import VoxelThermalSolver3D, generate_spatial_layout
+from src.physics_engine import G_AMB_FACTOR, K_CONV, assemble_conductance, FactorizationCache, StencilOperator
 from src.physics_engine_ir import IRDropSolver
 from src.physics_engine_transient import TransientThermalSolver
 from src.design_loader import DesignLoader
+from src.physics_engine_green import ThermalKernelLibrary
+from src.physics_engine_adaptive import AdaptiveThermalSolver
+from src.physics_engine_nonlinear import NonlinearThermalSolver, power_law_k
+from src.thermal_sweep import SweepContext
+from src.physics_engine_rom import ReducedThermalModel
+from src.physics_engine_adjoint import AdjointThermalSolver, MaskMean, SoftMaxTemperature
+from src.design_raster import BlockTable, InstanceTable
+from src.artifact_cache import ArtifactCache
+from src.physics_engine_modal import ModalThermalModel
+from src.power_schedule import PowerSchedule
+from src.transient_output import TransientRecorder
 
 def test_3d_thermal_64x64():
     print("🧪 TEST 1: 3D Thermal Solver (64x64)...")
@@ -79,8 +94,577 @@ def test_design_loader():
     except Exception as e:
         print(f"   ❌ FAIL (Crash: {e})")
 
+def _hetero_case(N=16, L=5, seed=0):
+    """Small stack whose K varies inside every layer, with two hotspots on the die."""
+    rng = np.random.default_rng(seed)
+    k_vol = np.array([150.0, 400.0, 60.0, 10.0, 0.5, 120.0, 30.0, 5.0, 80.0])[:L, None, None] * rng.uniform(0.5, 1.5, (L, N, N))
+    p_vol = np.zeros((L, N, N))
+    p_vol[0, 3:7, 2:9] = 2.0
+    p_vol[0, N - 6:N - 3, N - 6:N - 2] = 5.0
+    return p_vol, k_vol
+
+def _report(label, err, tol):
+    print(f"   -> {label}: {err:.2e}")
+    if err < tol:
+        print("   ✅ PASS")
+    else:
+        print(f"   ❌ FAIL (above {tol:g})")
+
+def test_assembly_reference():
+    print("\n🧪 TEST 5: Vectorized Assembly vs Per-Voxel Loop...")
+    try:
+        L, N, dx, dz = 3, 6, 31.25, 20.0
+        _, k_vol = _hetero_case(N, L)
+        K = k_vol * K_CONV
+        err = 0.0
+        for symmetric in (False, True):
+            G, _ = assemble_conductance(K, dx, dz, symmetric)
+            ref = np.zeros((L * N * N, L * N * N))
+            for l in range(L):
+                for r in range(N):
+                    for c in range(N):
+                        i = (l * N + r) * N + c
+                        for dl, dr, dc in ((1, 0, 0), (-1, 0, 0), (0, 1, 0), (0, -1, 0), (0, 0, 1), (0, 0, -1)):
+                            ln, rn, cn = l + dl, r + dr, c + dc
+                            if not (0 <= ln < L and 0 <= rn < N and 0 <= cn < N):
+                                continue
+                            geo = dx**2 / dz if dl else dz # face area / centre distance
+                            if symmetric: # half cells in series
+                                g = geo / (0.5 / K[l, r, c] + 0.5 / K[ln, rn, cn])
+                            else: # nodal: the row's own K
+                                g = geo * K[l, r, c]
+                            ref[i, i] += g
+                            ref[i, (ln * N + rn) * N + cn] -= g
+                        if l == L - 1:
+                            ref[i, i] += K[l, r, c] * dx**2 / dz * G_AMB_FACTOR
+            err = max(err, np.abs(G.toarray() - ref).max() / np.abs(ref).max())
+        _report("Max relative entry error (nodal + symmetric)", err, 1e-12)
+    except Exception as e:
+        print(f"   ❌ FAIL (Crash: {e})")
+
+def test_factorization_cache():
+    print("\n🧪 TEST 6: LU Factorization Cache...")
+    try:
+        p_vol, k_vol = _hetero_case()
+        cache = FactorizationCache()
+        solver = VoxelThermalSolver3D(size=16, layers=5, cache=cache)
+        solver.solve(p_vol, k_vol)
+        t_cached = solver.solve(2 * p_vol, k_vol)
+        t_fresh = VoxelThermalSolver3D(size=16, layers=5).solve(2 * p_vol, k_vol)
+        print(f"   -> Cache: {cache.info()}")
+        if cache.info()["hits"] < 1:
+            print("   ❌ FAIL (Second solve on the same stack refactored)")
+        else:
+            _report("Max error vs fresh factorization", np.abs(t_cached - t_fresh).max(), 1e-10)
+    except Exception as e:
+        print(f"   ❌ FAIL (Crash: {e})")
+
+def test_solve_batch():
+    print("\n🧪 TEST 7: Batched Multi-RHS Solve...")
+    try:
+        p_vol, k_vol = _hetero_case()
+        p_vols = np.stack([p_vol, 0.5 * p_vol[:, ::-1], np.roll(p_vol, 3, axis=2)])
+        solver = VoxelThermalSolver3D(size=16, layers=5)
+        t_batch = solver.solve_batch(p_vols, k_vol)
+        t_single = np.stack([solver.solve(p, k_vol) for p in p_vols])
+        _report("Max error vs one solve per map", np.abs(t_batch - t_single).max(), 1e-10)
+    except Exception as e:
+        print(f"   ❌ FAIL (Crash: {e})")
+
+def test_iterative_backend():
+    print("\n🧪 TEST 8: Multigrid-Preconditioned Iterative Backend...")
+    try:
+        p_vol, k_vol = _hetero_case(N=32)
+        t_direct = VoxelThermalSolver3D(size=32, layers=5).solve(p_vol, k_vol)
+        solver = VoxelThermalSolver3D(size=32, layers=5, backend="iterative", tol=1e-10)
+        t_iter = solver.solve(p_vol, k_vol)
+        print(f"   -> {solver.last_info['iterations']} iterations")
+        _report("Max error vs direct", np.abs(t_iter - t_direct).max(), 1e-5)
+    except Exception as e:
+        print(f"   ❌ FAIL (Crash: {e})")
+
+def test_matrix_free_backend():
+    print("\n🧪 TEST 9: Matrix-Free Stencil Operator and Backend...")
+    try:
+        p_vol, k_vol = _hetero_case()
+        K = k_vol * K_CONV
+        x = np.random.default_rng(1).random(K.size)
+        G, _ = assemble_conductance(K, 31.25, 20)
+        op_err = np.abs(StencilOperator(K, 31.25, 20) @ x - G @ x).max() / np.abs(G @ x).max()
+        t_direct = VoxelThermalSolver3D(size=16, layers=5).solve(p_vol, k_vol)
+        t_mf = VoxelThermalSolver3D(size=16, layers=5, backend="matrix_free", tol=1e-10).solve(p_vol, k_vol)
+        print(f"   -> Operator relative error: {op_err:.2e}")
+        _report("Max solve error vs direct", max(np.abs(t_mf - t_direct).max(), op_err), 1e-5)
+    except Exception as e:
+        print(f"   ❌ FAIL (Crash: {e})")
+
+def test_spectral_solver():
+    print("\n🧪 TEST 10: DCT Spectral Solver (Layer-Uniform Stack)...")
+    try:
+        p_vol, _ = _hetero_case(N=32)
+        k_stack = [150.0, 400.0, 60.0, 10.0, 0.5]
+        t_direct = VoxelThermalSolver3D(size=32, layers=5, spectral=False).solve(p_vol, k_stack)
+        solver = VoxelThermalSolver3D(size=32, layers=5)
+        t_spec = solver.solve(p_vol, k_stack)
+        if solver.last_info.get("backend") != "spectral":
+            print(f"   ❌ FAIL (Routed to {solver.last_info.get('backend')})")
+        else:
+            _report("Max error vs direct", np.abs(t_spec - t_direct).max(), 1e-8)
+    except Exception as e:
+        print(f"   ❌ FAIL (Crash: {e})")
+
+def test_green_kernel():
+    print("\n🧪 TEST 11: Green's-Function Kernel vs Direct Solve...")
+    try:
+        k_stack = [150.0, 400.0, 60.0, 10.0, 0.5]
+        library = ThermalKernelLibrary(size=16, layers=5, cache_dir=None)
+        power = np.random.default_rng(2).random((16, 16)) * (np.arange(16) < 5)[:, None] # edge-hugging blocks
+        p_vol = np.zeros((5, 16, 16))
+        p_vol[0] = power
+        t_ref = VoxelThermalSolver3D(size=16, layers=5, spectral=False).solve(p_vol, k_stack)
+        t_kernel = library.evaluate(power, k_stack)
+        _report("Max error vs direct (all layers)", np.abs(t_kernel - t_ref).max(), 1e-8)
+    except Exception as e:
+        print(f"   ❌ FAIL (Crash: {e})")
+
+def test_adaptive_quadtree():
+    print("\n🧪 TEST 12: Adaptive Quadtree vs Uniform Voxel Solve...")
+    try:
+        M = 64
+        k_stack = [150.0, 400.0, 60.0, 10.0, 0.5]
+        power = np.zeros((M, M))
+        power[10:18, 6:30] = 0.5
+        power[40:44, 44:52] = 2.0
+        p_vol = np.zeros((5, M, M))
+        p_vol[0] = power
+        t_ref = VoxelThermalSolver3D(size=M, layers=5, pitch_um=31.25, spectral=False).solve(p_vol, k_stack)
+        solver = AdaptiveThermalSolver(die_um=M * 31.25, base_size=8, temp_tol=0.01) # 1% of the peak rise
+        mesh, t_leaves = solver.solve(power, k_stack)
+        t_fine = solver.to_uniform(mesh, t_leaves)
+        rise = t_ref.max() - 25.0
+        print(f"   -> {solver.last_info['leaves']} leaves for {M * M} pixels")
+        # Rectangular die: transposing the raster and the extents must transpose the field
+        wide = AdaptiveThermalSolver(die_um=(M * 40.0, M * 25.0), base_size=8)
+        tall = AdaptiveThermalSolver(die_um=(M * 25.0, M * 40.0), base_size=8)
+        t_wide = wide.to_uniform(*wide.solve(power, k_stack))
+        t_tall = tall.to_uniform(*tall.solve(power.T, k_stack))
+        print(f"   -> Rectangular transpose mismatch: {np.abs(t_wide - t_tall.transpose(0, 2, 1)).max():.2e}")
+        err = max(np.abs(t_fine[0] - t_ref[0]).max() / rise, np.abs(t_wide - t_tall.transpose(0, 2, 1)).max())
+        _report("Max die error / peak rise", err, 0.02)
+
+        # Real design at 512x512: the field error must shrink as temp_tol does
+        loader = DesignLoader(grid_size=512)
+        power, k_stack = loader.load("my_chip.json")
+        xmin, ymin, xmax, ymax = loader.extent
+        p_vol = np.zeros((len(k_stack), 512, 512))
+        p_vol[0] = power
+        t_ref = VoxelThermalSolver3D(size=512, layers=len(k_stack), pitch_um=(xmax - xmin) / 512).solve(p_vol, k_stack)
+        rise = t_ref[0].max() - 25.0
+        errors = []
+        for temp_tol in (0.1, 0.02):
+            solver = AdaptiveThermalSolver(die_um=(xmax - xmin, ymax - ymin), layers=len(k_stack), temp_tol=temp_tol)
+            t_fine = solver.to_uniform(*solver.solve(power, k_stack))
+            errors.append(np.abs(t_fine[0] - t_ref[0]).max() / rise)
+            print(f"   -> my_chip.json temp_tol={temp_tol}: {solver.last_info['leaves']} leaves, "
+                  f"error / rise {errors[-1]:.2e}")
+        if errors[1] >= errors[0]:
+            print("   ❌ FAIL (Error does not shrink with temp_tol)")
+            return
+        _report("my_chip.json error / peak rise at temp_tol=0.02", errors[1], 0.01)
+    except Exception as e:
+        print(f"   ❌ FAIL (Crash: {e})")
+
+def test_nonlinear_k():
+    print("\n🧪 TEST 13: Nonlinear K(T) Steady State...")
+    try:
+        p_vol, _ = _hetero_case()
+        p_vol *= 20.0 # hot enough for K(T) to matter
+        k_models = [power_law_k(150.0), 400.0, 60.0, 10.0, 0.5]
+        err = 0.0
+        for method in ("newton", "picard"):
+            nonlinear = NonlinearThermalSolver(VoxelThermalSolver3D(size=16, layers=5), method=method, tol=1e-6)
+            T = nonlinear.solve(p_vol, k_models)
+            # A converged field reproduces itself through a linear solve at K(T)
+            k_at_T = nonlinear._k_volume(k_models, T)
+            T_lin = VoxelThermalSolver3D(size=16, layers=5).solve(p_vol, k_at_T)
+            err = max(err, np.abs(T - T_lin).max())
+        linear = VoxelThermalSolver3D(size=16, layers=5).solve(p_vol, [150.0, 400.0, 60.0, 10.0, 0.5])
+        print(f"   -> Peak {T.max():.1f} C (constant-K peak {linear.max():.1f} C)")
+        _report("Max fixed-point error |T - solve(K(T))|", err, 1e-4)
+    except Exception as e:
+        print(f"   ❌ FAIL (Crash: {e})")
+
+def test_warm_start_sweep():
+    print("\n🧪 TEST 14: Warm-Started Sweep...")
+    try:
+        p_vol, _ = _hetero_case()
+        k_pkgs = np.linspace(1.0, 20.0, 8)
+        solver = VoxelThermalSolver3D(size=16, layers=5, backend="iterative", spectral=False,
+                                      symmetric=True, tol=1e-10)
+        sweep = SweepContext(k_pkgs)
+        warm = sweep.run(lambda pt, x0: solver.solve(p_vol, [150.0, 400.0, 60.0, pt[0], 0.5], x0=x0), solver)
+        stats = sweep.report()
+        direct = VoxelThermalSolver3D(size=16, layers=5, symmetric=True)
+        err = max(np.abs(w - direct.solve(p_vol, [150.0, 400.0, 60.0, k, 0.5])).max() for w, k in zip(warm, k_pkgs))
+        print(f"   -> {stats['iterations']} iterations, {stats['saved']} saved vs cold starts")
+        if stats["saved"] <= 0:
+            print("   ❌ FAIL (Warm starts saved no iterations)")
+        else:
+            _report("Max error vs direct", err, 1e-5)
+    except Exception as e:
+        print(f"   ❌ FAIL (Crash: {e})")
+
+def test_domain_decomposition():
+    print("\n🧪 TEST 15: Domain Decomposition Backend (Worker Pool)...")
+    try:
+        p_vol, k_vol = _hetero_case(N=32)
+        t_direct = VoxelThermalSolver3D(size=32, layers=5).solve(p_vol, k_vol)
+        solver = VoxelThermalSolver3D(size=32, layers=5, backend="dd", workers=2, tol=1e-10)
+        try:
+            t_dd = solver.solve(p_vol, k_vol)
+            t_again = solver.solve(2 * p_vol, k_vol) # same stack: resident tile factors
+            info = solver.last_info
+        finally:
+            solver.close()
+        t_direct2 = VoxelThermalSolver3D(size=32, layers=5).solve(2 * p_vol, k_vol)
+        print(f"   -> {info['iterations']} iterations")
+        _report("Max error vs direct", max(np.abs(t_dd - t_direct).max(), np.abs(t_again - t_direct2).max()), 1e-5)
+    except Exception as e:
+        print(f"   ❌ FAIL (Crash: {e})")
+
+def test_precision_modes():
+    print("\n🧪 TEST 16: float32 and Mixed Precision...")
+    try:
+        p_vol, k_vol = _hetero_case()
+        t_ref = VoxelThermalSolver3D(size=16, layers=5).solve(p_vol, k_vol)
+        rise = t_ref.max() - 25.0
+        t_f32 = VoxelThermalSolver3D(size=16, layers=5, precision="float32").solve(p_vol, k_vol)
+        t_mixed = VoxelThermalSolver3D(size=16, layers=5, precision="mixed", tol=1e-10).solve(p_vol, k_vol)
+        err_f32 = np.abs(t_f32.astype(float) - t_ref).max() / rise
+        err_mixed = np.abs(t_mixed - t_ref).max() / rise
+        print(f"   -> float32 error / rise: {err_f32:.2e}")
+        if err_f32 > 5e-3:
+            print("   ❌ FAIL (float32 error too large)")
+        else:
+            _report("Mixed error / rise", err_mixed, 1e-8)
+    except Exception as e:
+        print(f"   ❌ FAIL (Crash: {e})")
+
+def test_reduced_model():
+    print("\n🧪 TEST 17: Reduced-Order Model (Patterned Stack)...")
+    try:
+        p_vol, _ = _hetero_case()
+        p_vol[2, 6:10, 6:10] = 1.0 # buried source: more than K_die shapes the field
+        pattern = np.ones((5, 16, 16))
+        pattern[:, :, 8:] = 0.3
+        bounds = [(100.0, 200.0), (200.0, 400.0), (20.0, 80.0), (1.0, 20.0), (0.5, 0.5)]
+        solver = VoxelThermalSolver3D(size=16, layers=5)
+        rom = ReducedThermalModel(solver, p_vol[None], bounds, k_pattern=pattern, tol=1e-4)
+        rng = np.random.default_rng(3)
+        err = 0.0
+        for _ in range(5):
+            k = np.array([rng.uniform(lo, hi) for lo, hi in bounds])
+            t_ref = solver.solve(p_vol, k[:, None, None] * pattern)
+            err = max(err, np.abs(rom.evaluate(k) - t_ref).max() / (t_ref.max() - 25.0))
+        print(f"   -> {rom.info['basis']} modes")
+        _report("Max error / rise at random stacks", err, 1e-3)
+    except Exception as e:
+        print(f"   ❌ FAIL (Crash: {e})")
+
+def test_adjoint_gradients():
+    print("\n🧪 TEST 18: Adjoint Gradients vs Finite Differences...")
+    try:
+        p_vol, k_vol = _hetero_case()
+        mask = np.zeros((16, 16), dtype=bool)
+        mask[11:13, 11:14] = True
+        err = 0.0
+        for symmetric in (False, True):
+            for backend in ("direct", "iterative"):
+                solver = VoxelThermalSolver3D(size=16, layers=5, backend=backend, symmetric=symmetric, tol=1e-12)
+                for objective in (MaskMean(mask), SoftMaxTemperature(beta=2.0)):
+                    J, grads = AdjointThermalSolver(solver).gradient(p_vol, k_vol, objective)
+                    f = lambda p, k: objective(VoxelThermalSolver3D(size=16, layers=5, symmetric=symmetric).solve(p, k))[0]
+                    h = 1e-3
+                    dp = np.zeros_like(p_vol)
+                    dp[0, 4, 4] = h
+                    fd_p = (f(p_vol + dp, k_vol) - f(p_vol - dp, k_vol)) / (2 * h)
+                    dk = 1e-3 * k_vol # whole stack: under nodal K only K_die moves layer-0 temperatures
+                    fd_k = (f(p_vol, k_vol + dk) - f(p_vol, k_vol - dk)) / 2
+                    err = max(err, abs(grads["dP"][0, 4, 4] - fd_p) / abs(fd_p),
+                              abs(np.sum(grads["dK"] * dk) - fd_k) / abs(fd_k))
+        _report("Max relative error (dP and dK; nodal/symmetric, direct/iterative)", err, 1e-4)
+    except Exception as e:
+        print(f"   ❌ FAIL (Crash: {e})")
+
+def test_rasterizer():
+    print("\n🧪 TEST 19: Area-Weighted Rasterizer vs Exact Overlaps...")
+    try:
+        rng = np.random.default_rng(4)
+        x0, y0 = rng.uniform(-100, 950, 40), rng.uniform(-100, 950, 40)
+        x1, y1 = x0 + rng.uniform(0.5, 300, 40), y0 + rng.uniform(0.5, 300, 40)
+        power = rng.uniform(1, 50, 40)
+        N, bounds = 12, (0.0, 0.0, 1000.0, 1000.0)
+        grid = BlockTable(x0, y0, x1, y1, power).rasterize(N, bounds)
+        ref = np.zeros((N, N))
+        edges = np.linspace(0, 1000, N + 1)
+        for b in range(40):
+            density = power[b] / ((x1[b] - x0[b]) * (y1[b] - y0[b]))
+            for r in range(N):
+                for c in range(N):
+                    w = max(0.0, min(x1[b], edges[c + 1]) - max(x0[b], edges[c]))
+                    h = max(0.0, min(y1[b], edges[r + 1]) - max(y0[b], edges[r]))
+                    ref[r, c] += density * w * h
+        _report("Max cell error vs exact overlap areas (mW)", np.abs(grid - ref).max(), 1e-9)
+    except Exception as e:
+        print(f"   ❌ FAIL (Crash: {e})")
+
+def _write_hierarchical_design(path):
+    lane = {"w": 120, "h": 60, "power_mw": 4.0,
+            "sub_blocks": [{"x": 5 + 25 * i, "y": 10, "w": 20, "h": 30, "power_mw": 1.5} for i in range(4)]}
+    blocks = [dict(lane, x=40 + 150 * i, y=50, name=f"lane{i}") for i in range(5)]
+    blocks.append({"x": 300, "y": 600, "w": 250, "h": 200, "power_mw": 80.0, "name": "dsp"})
+    with open(path, "w") as f:
+        json.dump({"blocks": blocks, "die_width_um": 1000, "die_height_um": 1000}, f)
+
+def test_streaming_reader():
+    print("\n🧪 TEST 20: Streaming JSON Reader and Columnar Form...")
+    tmp = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp, "chip.json")
+        _write_hierarchical_design(path)
+        p_mem, _ = DesignLoader(grid_size=32).load(path)
+        p_stream, _ = DesignLoader(grid_size=32, stream_threshold_mb=0).load(path)
+        columnar = os.path.join(tmp, "chip.npz")
+        DesignLoader().convert_to_columnar(path, columnar)
+        p_col, _ = DesignLoader(grid_size=32).load(columnar)
+        err = max(np.abs(p_stream - p_mem).max(), np.abs(p_col - p_mem).max())
+        _report("Max error vs in-memory load (streamed, columnar)", err, 1e-10)
+    except Exception as e:
+        print(f"   ❌ FAIL (Crash: {e})")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+def test_instance_masters():
+    print("\n🧪 TEST 21: Repeated-Master Rasterization and Kernel Superposition...")
+    tmp = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp, "chip.json")
+        _write_hierarchical_design(path)
+        with open(path) as f:
+            blocks = json.load(f)["blocks"]
+        bounds = (0.0, 0.0, 1000.0, 1000.0)
+        instances = InstanceTable.from_blocks(blocks)
+        flat = BlockTable.from_blocks(blocks).rasterize(16, bounds)
+        err_raster = np.abs(instances.rasterize(16, bounds) - flat).max()
+        kernel = ThermalKernelLibrary(size=16, layers=5, cache_dir=None).kernel([150.0, 400.0, 60.0, 10.0, 0.5])
+        residual, placed = instances.stamps(16, bounds)
+        err_kernel = np.abs(kernel.evaluate_instances(residual, placed) - kernel.evaluate(flat)).max()
+        print(f"   -> {len(instances.masters)} masters, raster error {err_raster:.2e}")
+        _report("Max error vs flat table (raster, superposed field)", max(err_raster, err_kernel), 1e-9)
+    except Exception as e:
+        print(f"   ❌ FAIL (Crash: {e})")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+def test_artifact_cache():
+    print("\n🧪 TEST 22: On-Disk Artifact Cache...")
+    tmp = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp, "chip.json")
+        _write_hierarchical_design(path)
+        artifacts = ArtifactCache(root=os.path.join(tmp, "artifacts"), store_factors=True)
+        first = DesignLoader(grid_size=32, artifacts=artifacts)
+        p_first, _ = first.load(path)
+        second = DesignLoader(grid_size=32, artifacts=artifacts)
+        p_hit, _ = second.load(path)
+        ok = artifacts.hits == 1 and second.instances is not None and len(second.instances) == len(first.instances)
+
+        p_vol, k_vol = _hetero_case()
+        VoxelThermalSolver3D(size=16, layers=5, artifacts=artifacts).solve(p_vol, k_vol)
+        reloaded = VoxelThermalSolver3D(size=16, layers=5, artifacts=artifacts).solve(p_vol, k_vol) # stored LU
+        t_ref = VoxelThermalSolver3D(size=16, layers=5).solve(p_vol, k_vol)
+        if not ok:
+            print(f"   ❌ FAIL (Cache hit lost data: hits={artifacts.hits}, instances={second.instances})")
+        else:
+            _report("Max error of cached grid and stored-LU solve", max(np.abs(p_hit - p_first).max(),
+                                                                        np.abs(reloaded - t_ref).max()), 1e-9)
+    except Exception as e:
+        print(f"   ❌ FAIL (Crash: {e})")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+def test_full_stack_layered():
+    print("\n🧪 TEST 23: Full 9-Layer Stack (Layered Backend, Per-Layer Thickness)...")
+    try:
+        thickness = [50.0, 5.0, 8.0, 30.0, 12.0, 20.0, 100.0, 200.0, 40.0]
+        p_vol, k_vol = _hetero_case(L=9)
+        direct = VoxelThermalSolver3D(size=16, layers=9, z_pitch_um=thickness)
+        t_direct = direct.solve(p_vol, k_vol)
+        layered = VoxelThermalSolver3D(size=16, layers=9, z_pitch_um=thickness, backend="layered", tol=1e-10)
+        t_layered = layered.solve(p_vol, k_vol)
+        k_layers = k_vol.mean(axis=(1, 2))
+        t_spectral = VoxelThermalSolver3D(size=16, layers=9, z_pitch_um=thickness).solve(p_vol, k_layers)
+        t_uniform = VoxelThermalSolver3D(size=16, layers=9, z_pitch_um=thickness, spectral=False).solve(p_vol, k_layers)
+        adaptive = AdaptiveThermalSolver(die_um=16 * 31.25, layers=9, z_pitch_um=thickness, base_size=16, power_tol=-1.0)
+        t_adaptive = adaptive.to_uniform(*adaptive.solve(p_vol[0], k_layers))
+        print(f"   -> Layered: {layered.last_info['iterations']} iterations")
+        err = max(np.abs(t_layered - t_direct).max(), np.abs(t_spectral - t_uniform).max(),
+                  np.abs(t_adaptive - t_uniform).max())
+        _report("Max error vs direct (layered, spectral, adaptive)", err, 1e-6)
+    except Exception as e:
+        print(f"   ❌ FAIL (Crash: {e})")
+
+def test_symmetric_assembly():
+    print("\n🧪 TEST 24: Symmetric Harmonic-Mean Assembly (Cholesky / CG)...")
+    try:
+        p_vol, k_vol = _hetero_case()
+        G, _ = assemble_conductance(k_vol * K_CONV, 31.25, 20, symmetric=True)
+        asym = abs(G - G.T).max() / abs(G).max()
+        t_direct = VoxelThermalSolver3D(size=16, layers=5, symmetric=True).solve(p_vol, k_vol)
+        err = asym
+        for backend in ("iterative", "matrix_free", "layered"):
+            solver = VoxelThermalSolver3D(size=16, layers=5, symmetric=True, backend=backend, tol=1e-10)
+            err = max(err, np.abs(solver.solve(p_vol, k_vol) - t_direct).max())
+        k_stack = [150.0, 400.0, 60.0, 10.0, 0.5]
+        t_spec = VoxelThermalSolver3D(size=16, layers=5, symmetric=True).solve(p_vol, k_stack)
+        t_chol = VoxelThermalSolver3D(size=16, layers=5, symmetric=True, spectral=False).solve(p_vol, k_stack)
+        err = max(err, np.abs(t_spec - t_chol).max())
+        print(f"   -> G asymmetry: {asym:.1e}")
+        _report("Max error vs Cholesky (CG backends, spectral)", err, 1e-5)
+    except Exception as e:
+        print(f"   ❌ FAIL (Crash: {e})")
+
+def _burst_case(N=8):
+    k_stack = [150.0, 400.0, 60.0, 10.0, 0.5]
+    cv_stack = [1.6e6, 3.4e6, 2e6, 2e6, 2e6]
+    p_on = np.zeros((5, N, N))
+    p_on[0, 2:5, 1:6] = 20.0
+    return k_stack, cv_stack, p_on
+
+def test_implicit_integrators():
+    print("\n🧪 TEST 25: Implicit Transient Integrators vs Explicit Reference...")
+    try:
+        k_stack, cv_stack, p_on = _burst_case()
+        power = lambda t: p_on * np.sin(np.pi * t)**2 # smooth 1 ms pulses: no edge to smear
+        reference = TransientThermalSolver(size=8, dt_ms=0.0005)
+        t_ref, peak_ref = reference.solve_transient(power, k_stack, cv_stack, duration_ms=2.0, record_every=1)
+        t_ref, peak_ref = np.asarray(t_ref), np.asarray(peak_ref)
+        rise = peak_ref.max() - 25.0
+        errors = {}
+        for method in ("backward_euler", "crank_nicolson", "tr_bdf2"):
+            solver = TransientThermalSolver(size=8, dt_ms=0.01, method=method)
+            times, peaks = solver.solve_transient(power, k_stack, cv_stack, duration_ms=2.0)
+            errors[method] = np.abs(np.asarray(peaks) - np.interp(times, t_ref, peak_ref)).max() / rise
+        print("   -> Peak error / rise: " + ", ".join(f"{m} {e:.1e}" for m, e in errors.items()))
+        _report("Max error / rise", max(errors.values()), 5e-3)
+    except Exception as e:
+        print(f"   ❌ FAIL (Crash: {e})")
+
+def test_adaptive_stepping():
+    print("\n🧪 TEST 26: Error-Controlled Adaptive TR-BDF2...")
+    try:
+        k_stack, cv_stack, p_on = _burst_case()
+        power = lambda t: p_on if 0.5 <= t < 3.0 else 0.1 * p_on
+        power.breakpoints = [0.5, 3.0]
+        # Explicit steps sample power at their start, so they see the edges from the correct side
+        reference = TransientThermalSolver(size=8, dt_ms=0.0005)
+        t_ref, peak_ref = reference.solve_transient(power, k_stack, cv_stack, duration_ms=6.0, record_every=1)
+        solver = TransientThermalSolver(size=8, dt_ms=0.001, method="tr_bdf2")
+        times, peaks = solver.solve_adaptive(power, k_stack, cv_stack, duration_ms=6.0, rtol=1e-3, atol=1e-3)
+        rise = max(peak_ref) - 25.0
+        err = np.abs(np.asarray(peaks) - np.interp(times, t_ref, peak_ref)).max() / rise
+        print(f"   -> {solver.last_info['accepted']} adaptive steps vs {len(t_ref)} explicit")
+        _report("Max peak error / rise", err, 1e-2)
+    except Exception as e:
+        print(f"   ❌ FAIL (Crash: {e})")
+
+def test_modal_model():
+    print("\n🧪 TEST 27: Modal Closed-Form Transient vs Time Stepping...")
+    try:
+        k_stack, cv_stack, p_on = _burst_case()
+        segments = [(0.0, p_on), (1.5, 0.3 * p_on)]
+        power = lambda t: p_on if t < 1.5 else 0.3 * p_on
+        power.breakpoints = [1.5]
+        # Tight adaptive TR-BDF2: steps land on the power edge and sample it from the correct side
+        stepper = TransientThermalSolver(size=8, dt_ms=0.001, method="tr_bdf2")
+        t_ref, peak_ref = stepper.solve_adaptive(power, k_stack, cv_stack, duration_ms=3.0, rtol=1e-5, atol=1e-5)
+        model = ModalThermalModel(stepper, k_stack, cv_stack)
+        t_modal = model.evaluate(segments, t_ref)
+        rise = max(peak_ref) - 25.0
+        err = np.abs(t_modal.reshape(len(t_ref), -1).max(axis=1) - np.asarray(peak_ref)).max() / rise
+        _report("Max peak error / rise", err, 1e-3)
+    except Exception as e:
+        print(f"   ❌ FAIL (Crash: {e})")
+
+def test_power_schedule():
+    print("\n🧪 TEST 28: Declarative Power Schedule vs Callback...")
+    try:
+        k_stack, cv_stack, p_on = _burst_case()
+        block_map = (p_on > 0) * 1.0
+        schedule = PowerSchedule({"dsp": block_map}).at(0.0, dsp=20.0).at(0.4, dsp=5.0)
+        schedule.trace("dsp", [20.0, 20.0, 8.0, 8.0, 0.0], dt_ms=0.2, t0_ms=0.6)
+        def callback(t):
+            level = 20.0 if t < 0.4 else 5.0 if t < 0.6 else [20.0, 20.0, 8.0, 8.0, 0.0][min(4, int((t - 0.6) / 0.2 + 1e-9))]
+            return level * block_map
+        solver = TransientThermalSolver(size=8, dt_ms=0.01, method="tr_bdf2")
+        _, peaks_cb = solver.solve_transient(callback, k_stack, cv_stack, duration_ms=2.0)
+        _, peaks_sched = solver.solve_transient(schedule, k_stack, cv_stack, duration_ms=2.0)
+        print(f"   -> {len(schedule.vectors)} distinct power vectors for {len(schedule.times)} segments")
+        _report("Max peak difference (C)", np.abs(np.asarray(peaks_cb) - np.asarray(peaks_sched)).max(), 1e-9)
+    except Exception as e:
+        print(f"   ❌ FAIL (Crash: {e})")
+
+def test_transient_recorder():
+    print("\n🧪 TEST 29: Streamed Transient Probes and Snapshots...")
+    tmp = tempfile.mkdtemp()
+    try:
+        k_stack, cv_stack, p_on = _burst_case()
+        power = lambda t: p_on if t < 1.0 else 0.2 * p_on
+        probe = np.zeros((5, 8, 8), dtype=bool)
+        probe[0, 2:5, 1:6] = True
+        solver = TransientThermalSolver(size=8, dt_ms=0.01, method="tr_bdf2")
+        times, peaks = solver.solve_transient(power, k_stack, cv_stack, duration_ms=2.0)
+        recorder = TransientRecorder(tmp, probes={"hot": probe}, snapshot_times_ms=[1.0], chunk_mb=0.001)
+        rec_times, rec_peaks = solver.solve_transient(power, k_stack, cv_stack, duration_ms=2.0, recorder=recorder)
+        snap_times, fields = recorder.fields()
+        at_snap = np.searchsorted(rec_times, 1.0 - 1e-9)
+        err = max(np.abs(np.asarray(rec_peaks) - np.asarray(peaks)).max(),
+                  abs(float(fields[0][probe].max()) - recorder.trace("hot_max")[at_snap]),
+                  abs(snap_times[0] - 1.0))
+        print(f"   -> {len(rec_times)} streamed rows, {len(snap_times)} snapshot(s)")
+        _report("Max mismatch vs in-memory run and snapshot", err, 1e-5)
+    except Exception as e:
+        print(f"   ❌ FAIL (Crash: {e})")
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
 if __name__ == "__main__":
     test_3d_thermal_64x64()
     test_ir_drop()
     test_transient()
     test_design_loader()
+    test_assembly_reference()
+    test_factorization_cache()
+    test_solve_batch()
+    test_iterative_backend()
+    test_matrix_free_backend()
+    test_spectral_solver()
+    test_green_kernel()
+    test_adaptive_quadtree()
+    test_nonlinear_k()
+    test_warm_start_sweep()
+    test_domain_decomposition()
+    test_precision_modes()
+    test_reduced_model()
+    test_adjoint_gradients()
+    test_rasterizer()
+    test_streaming_reader()
+    test_instance_masters()
+    test_artifact_cache()
+    test_full_stack_layered()
+    test_symmetric_assembly()
+    test_implicit_integrators()
+    test_adaptive_stepping()
+    test_modal_model()
+    test_power_schedule()
+    test_transient_recorder()
@@ -0,0 +1,71 @@
+import numpy as np
+
+class SweepContext:
+    """
+    Runs a parameter sweep of thermal solves in an order that keeps consecutive
+    points close, seeding each solve with the previous solution (or a linear
+    extrapolation from the last two). Only iterative backends benefit; direct
+    and spectral solves ignore the seed.
+
+    points: (S, D) sweep parameters. scales: per-dimension normalisation used
+    for distances (defaults to each dimension's range).
+    """
+    def __init__(self, points, scales=None, extrapolate=True):
+        self.points = np.atleast_2d(np.asarray(points, dtype=float))
+        if self.points.shape[0] == 1 and np.ndim(points) == 1:
+            self.points = self.points.T
+        if scales is None:
+            span = np.ptp(self.points, axis=0)
+            scales = np.where(span > 0, span, 1.0)
+        self.scaled = self.points / np.asarray(scales, dtype=float)
+        self.extrapolate = extrapolate
+        self.iterations = []
+
+    def order(self):
+        """Greedy nearest-neighbour path through the sweep points."""
+        remaining = list(range(len(self.scaled)))
+        path = [remaining.pop(0)]
+        while remaining:
+            d = np.linalg.norm(self.scaled[remaining] - self.scaled[path[-1]], axis=1)
+            path.append(remaining.pop(int(np.argmin(d))))
+        return path
+
+    def _seed(self, idx, history):
+        if not history:
+            return None
+        i1, T1 = history[-1]
+        if not self.extrapolate or len(history) < 2:
+            return T1
+        i2, T2 = history[-2]
+        step = np.linalg.norm(self.scaled[i1] - self.scaled[i2])
+        if step == 0:
+            return T1
+        ratio = np.linalg.norm(self.scaled[idx] - self.scaled[i1]) / step
+        return T1 + ratio * (T1 - T2)
+
+    def run(self, solve_fn, solver=None):
+        """
+        solve_fn(point, x0) -> temperature volume, called once per point.
+        solver: the VoxelThermalSolver3D used inside solve_fn; its last_info
+        supplies the per-point iteration counts for the report.
+        Returns the results in the original point order.
+        """
+        results = [None] * len(self.points)
+        history = []
+        self.iterations = []
+        for idx in self.order():
+            T = solve_fn(self.points[idx], self._seed(idx, history))
+            results[idx] = T
+            history = (history + [(idx, T)])[-2:]
+            if solver is not None and "iterations" in solver.last_info:
+                self.iterations.append(solver.last_info["iterations"])
+        return results
+
+    def report(self):
+        """Iterations per point and the saving against the (cold) first point."""
+        if not self.iterations:
+            return {"points": len(self.points), "iterations": 0, "saved": 0}
+        cold = self.iterations[0]
+        total = sum(self.iterations)
+        return {"points": len(self.points), "iterations": total,
+                "cold_iterations": cold, "saved": cold * len(self.iterations) - total}
@@ -0,0 +1,129 @@
+import json
+import os
+import numpy as np
+
+class ChunkedStream:
+    """
+    Append-only on-disk array. Rows collect in a fixed buffer (chunk_mb, at
+    most chunk_rows rows) that is appended to <path>.bin when full;
+    <path>.json holds dtype, row shape and row count, so open_stream() can
+    memory-map the file while it is still being written. Memory stays at one
+    chunk however many rows are written.
+    """
+    def __init__(self, path, row_shape, dtype=np.float64, chunk_mb=4, chunk_rows=4096, columns=None):
+        self.path = path
+        self.row_shape = tuple(row_shape)
+        self.dtype = np.dtype(dtype)
+        self.columns = columns
+        row_bytes = max(1, int(np.prod(self.row_shape)) * self.dtype.itemsize)
+        rows = max(1, min(chunk_rows, int(chunk_mb * 2**20) // row_bytes))
+        self.buffer = np.empty((rows,) + self.row_shape, dtype=self.dtype)
+        self.fill = 0
+        self.rows = 0
+        self.file = open(path + ".bin", "wb")
+        self._write_header()
+
+    def append(self, row):
+        self.buffer[self.fill] = row
+        self.fill += 1
+        if self.fill == len(self.buffer):
+            self.flush()
+
+    def flush(self):
+        if self.fill:
+            self.buffer[:self.fill].tofile(self.file)
+            self.file.flush()
+            self.rows += self.fill
+            self.fill = 0
+            self._write_header()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+    def _write_header(self):
+        with open(self.path + ".json", "w") as f:
+            json.dump({"dtype": self.dtype.str, "row_shape": list(self.row_shape), "rows": self.rows,
+                       "columns": self.columns}, f)
+
+def open_stream(path):
+    """Read-only memmap (rows, *row_shape) of a ChunkedStream written to path."""
+    with open(path + ".json") as f:
+        header = json.load(f)
+    shape = (header["rows"],) + tuple(header["row_shape"])
+    if header["rows"] == 0:
+        return np.zeros(shape, dtype=header["dtype"])
+    return np.memmap(path + ".bin", dtype=header["dtype"], mode="r", shape=shape)
+
+class TransientRecorder:
+    """
+    Outputs of a transient run, streamed to out_dir while the solver steps:
+    probes.bin: one row per step with t_ms, the peak and, per named probe
+    mask, the mean and max temperature; fields.bin: full (L, N, N)
+    snapshots at snapshot_times_ms (the first step reaching each time; the
+    adaptive stepper lands on them exactly) and/or every snapshot_every steps,
+    with their times in field_times.bin. Pass it as recorder= to
+    TransientThermalSolver.solve_transient / solve_adaptive.
+    out_dir defaults to data/transient; a run overwrites the outputs already there.
+    """
+    def __init__(self, out_dir="data/transient", probes=None, snapshot_times_ms=(), snapshot_every=None, chunk_mb=4,
+                 field_dtype=np.float32):
+        self.out_dir = out_dir
+        self.probes = {name: np.flatnonzero(np.ravel(mask)) for name, mask in (probes or {}).items()}
+        self.snapshot_times_ms = sorted(float(t) for t in snapshot_times_ms)
+        self.snapshot_every = snapshot_every
+        self.chunk_mb = chunk_mb
+        self.field_dtype = field_dtype
+        self.columns = ["t_ms", "peak"] + [f"{name}_{stat}" for name in self.probes for stat in ("mean", "max")]
+        self.streams = None
+
+    @property
+    def breakpoints(self):
+        return self.snapshot_times_ms
+
+    def open(self, shape):
+        os.makedirs(self.out_dir, exist_ok=True)
+        path = lambda name: os.path.join(self.out_dir, name)
+        self.streams = {
+            "probes": ChunkedStream(path("probes"), (len(self.columns),), chunk_mb=self.chunk_mb, columns=self.columns),
+            "fields": ChunkedStream(path("fields"), shape, self.field_dtype, chunk_mb=self.chunk_mb),
+            "field_times": ChunkedStream(path("field_times"), (), chunk_mb=self.chunk_mb),
+        }
+        self._row = np.empty(len(self.columns))
+        self._step = 0
+        self._next_snapshot = 0
+
+    def record(self, t_ms, T):
+        row = self._row
+        row[0] = t_ms
+        row[1] = T.max()
+        for i, idx in enumerate(self.probes.values()):
+            values = T[idx]
+            row[2 + 2 * i] = values.mean()
+            row[3 + 2 * i] = values.max()
+        self.streams["probes"].append(row)
+
+        self._step += 1
+        due = bool(self.snapshot_every) and self._step % self.snapshot_every == 0
+        # Tolerance: step ends accumulate rounding (t = k * dt)
+        while (self._next_snapshot < len(self.snapshot_times_ms)
+               and self.snapshot_times_ms[self._next_snapshot] <= t_ms + 1e-9):
+            self._next_snapshot += 1
+            due = True
+        if due:
+            self.streams["fields"].append(T.reshape(self.streams["fields"].row_shape))
+            self.streams["field_times"].append(t_ms)
+
+    def close(self):
+        for stream in (self.streams or {}).values():
+            stream.close()
+
+    def trace(self, column):
+        """Memory-mapped per-step trace: "t_ms", "peak" or "<probe>_mean" / "<probe>_max"."""
+        return open_stream(os.path.join(self.out_dir, "probes"))[:, self.columns.index(column)]
+
+    def fields(self):
+        """(times, memory-mapped fields (n, L, N, N)) of the snapshots."""
+        return (open_stream(os.path.join(self.out_dir, "field_times")),
+                open_stream(os.path.join(self.out_dir, "fields")))